@@ -0,0 +1,233 @@
+"""
+    Module containing the asyncio interface to PupDB, which runs the file
+    I/O and serialization of PupDB in an executor, off the event loop.
+
+    Requires Python 3.5+.
+"""
+
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+
+from pupdb.core import PupDB
+
+
+# pylint: disable=useless-object-inheritance
+class _Batcher(object):
+    """
+        Merges the requests made while a batch is running into the next
+        batch, which is run by a single call of run_batch(requests) in the
+        executor, returning one result (or exception) per request.
+    """
+
+    def __init__(self, run_batch, executor):
+        """ Initializes the batcher. """
+
+        self._run_batch = run_batch
+        self._executor = executor
+        self._pending = []
+        self._running = False
+
+    def submit(self, request):
+        """ Returns a future of the result of the request. """
+
+        loop = asyncio.get_event_loop()
+        future = loop.create_future()
+        self._pending.append((request, future))
+        if not self._running:
+            self._running = True
+            asyncio.ensure_future(self._run(loop))
+        return future
+
+    async def _run(self, loop):
+        """ Runs the batches until there are no pending requests. """
+
+        try:
+            while self._pending:
+                batch, self._pending = self._pending, []
+                try:
+                    results = await loop.run_in_executor(
+                        self._executor, self._run_batch,
+                        [request for request, _ in batch]
+                    )
+                except Exception as exc:  # pylint: disable=broad-except
+                    results = [exc] * len(batch)
+                for (_, future), result in zip(batch, results):
+                    if future.cancelled():
+                        continue
+                    if isinstance(result, Exception):
+                        future.set_exception(result)
+                    else:
+                        future.set_result(result)
+        finally:
+            self._running = False
+
+
+class AsyncPupDB(object):
+    """
+        This class represents a PupDB database used from asyncio code.
+
+        Its methods are coroutines with the arguments and results of the
+        PupDB methods. Reads and writes are run in an executor, so that
+        the file locks, file I/O and serialization don't block the event
+        loop. The reads requested while another read is running are
+        served together by a single read of the database, and the writes
+        requested while another write is running are written together
+        by a single write of the database.
+
+        An AsyncPupDB instance must be used from a single event loop.
+    """
+
+    def __init__(self, db_file_path, executor=None, **kwargs):
+        """
+            Initializes the database instance. The keyword arguments are
+            passed on to PupDB. The operations run in the executor if
+            given, and else in a thread pool of the instance, which is shut
+            down by close().
+        """
+
+        self.database = PupDB(db_file_path, **kwargs)
+        self._own_executor = executor is None
+        # A batch of reads and a batch of writes run at a time.
+        self.executor = executor or ThreadPoolExecutor(max_workers=2)
+        self._reads = _Batcher(self._read_batch, self.executor)
+        # pylint: disable=protected-access
+        self._writes = _Batcher(self.database._write_batch, self.executor)
+
+    async def __aenter__(self):
+        """ Returns the instance, closed when leaving the with block. """
+
+        return self
+
+    async def __aexit__(self, exc_type, exc_value, exc_traceback):
+        """ Closes the instance. """
+
+        self.close()
+
+    def close(self):
+        """ Shuts down the thread pool of the instance, if any. """
+
+        if self._own_executor:
+            self.executor.shutdown(wait=False)
+
+    def _read_batch(self, requests):
+        """
+            Serves the read requests, (operation, key or keys) pairs, with
+            a single read of the database. Runs in the executor.
+        """
+
+        database = self.database
+        snapshot = None
+        results = []
+        with database.read_lock:
+            for operation, key in requests:
+                if operation in ('get', 'get_many') and \
+                        database.value_cache is not None:
+                    results.append(
+                        database.get(key) if operation == 'get'
+                        else database.get_many(key)
+                    )
+                    continue
+                if snapshot is None:
+                    # pylint: disable=protected-access
+                    snapshot = database._get_database()
+                if operation == 'get':
+                    results.append(snapshot.get(str(key), None))
+                elif operation == 'get_many':
+                    results.append({
+                        str(item): snapshot.get(str(item), None)
+                        for item in key
+                    })
+                elif operation == 'len':
+                    results.append(len(snapshot))
+                elif operation == 'keys':
+                    results.append(list(snapshot.keys()))
+                elif operation == 'values':
+                    results.append(list(snapshot.values()))
+                else:
+                    results.append(list(snapshot.items()))
+        return results
+
+    async def get(self, key):
+        """
+            Gets the value of a key from the database.
+            Returns None if the key is not found in the database.
+        """
+
+        return await self._reads.submit(('get', key))
+
+    async def get_many(self, keys):
+        """
+            Gets the values of multiple keys from the database at once, see
+            PupDB.get_many().
+        """
+
+        return await self._reads.submit(('get_many', list(keys)))
+
+    async def length(self):
+        """ Returns the number of keys in the database. """
+
+        return await self._reads.submit(('len', None))
+
+    async def keys(self):
+        """ Returns a list of all the keys in the database. """
+
+        return await self._reads.submit(('keys', None))
+
+    async def values(self):
+        """ Returns a list of all the values in the database. """
+
+        return await self._reads.submit(('values', None))
+
+    async def items(self):
+        """ Returns a list of all the (key, value) pairs in the database. """
+
+        return await self._reads.submit(('items', None))
+
+    async def set(self, key, val, ttl=None):
+        """
+            Sets the value to a key in the database, see PupDB.set().
+        """
+
+        return await self.set_many({key: val}, ttl)
+
+    async def set_many(self, mapping, ttl=None):
+        """
+            Sets the values of multiple keys in the database at once, see
+            PupDB.set_many().
+        """
+
+        # pylint: disable=protected-access
+        return await self._writes.submit(
+            self.database._set_records(mapping, ttl)
+        )
+
+    async def remove(self, key):
+        """
+            Removes a key from the database.
+            Raises a KeyError if the key is not found in the database.
+        """
+
+        return await self.remove_many([key])
+
+    async def remove_many(self, keys):
+        """
+            Removes multiple keys from the database at once.
+            Raises a KeyError, without removing any key, if one of the keys
+            is not found in the database.
+        """
+
+        return await self._writes.submit(
+            [{'op': 'remove', 'key': str(key)} for key in keys]
+        )
+
+    async def run(self, function, *args):
+        """
+            Runs function(database, *args) in the executor, with the
+            PupDB instance of this instance, e.g. for the other methods of
+            PupDB. Returns its result.
+        """
+
+        loop = asyncio.get_event_loop()
+        return await loop.run_in_executor(
+            self.executor, function, self.database, *args
+        )
@@ -0,0 +1,459 @@
+"""
+    Module containing the asyncio client of the HTTP interface to PupDB,
+    with the interface of AsyncPupDB.
+
+    Requires Python 3.5+.
+"""
+
+import asyncio
+import json
+from urllib.parse import quote
+
+from pupdb.client import (
+    DEFAULT_URL, chunks, parse_url, query_path, read_error
+)
+from pupdb.http_utils import CONTENT_ENCODINGS, decompress
+
+
+async def _read_response(reader):
+    """
+        Reads an HTTP/1.1 response. Returns its status, headers (with
+        lowercase names) and body.
+    """
+
+    status_line = await reader.readline()
+    if not status_line:
+        raise ConnectionError('Connection closed by the server.')
+    version, status = status_line.decode('latin-1').split(None, 2)[:2]
+    headers = {}
+    while True:
+        line = await reader.readline()
+        if line in (b'\r\n', b'\n', b''):
+            break
+        name, _, value = line.decode('latin-1').partition(':')
+        headers[name.strip().lower()] = value.strip()
+    if version == 'HTTP/1.0' and \
+            headers.get('connection', '').lower() != 'keep-alive':
+        headers['connection'] = 'close'
+
+    if 'chunked' in headers.get('transfer-encoding', '').lower():
+        body = []
+        while True:
+            size = int((await reader.readline()).split(b';')[0], 16)
+            if not size:
+                # Skips the trailer.
+                while (await reader.readline()) not in (b'\r\n', b'\n', b''):
+                    pass
+                break
+            body.append(await reader.readexactly(size))
+            await reader.readexactly(2)
+        body = b''.join(body)
+    elif 'content-length' in headers:
+        body = await reader.readexactly(int(headers['content-length']))
+    else:
+        body = await reader.read()
+        headers['connection'] = 'close'
+    return int(status), headers, body
+
+
+# pylint: disable=useless-object-inheritance
+class AsyncPupDBClient(object):
+    """
+        This class represents a PupDB database served by the HTTP interface
+        of pupdb.rest or pupdb.asgi, used from asyncio code, with the
+        interface of AsyncPupDB.
+
+        At most pool_size requests are sent at a time, over connections
+        kept alive for the next requests. The get() and set() calls made
+        concurrently are sent together, as /mget and /mset requests.
+
+        An AsyncPupDBClient instance must be used from a single event loop.
+    """
+
+    def __init__(self, url=DEFAULT_URL, pool_size=4, timeout=30):
+        """
+            Initializes the client of the server at url, e.g.
+            http://127.0.0.1:4000, with requests timing out after timeout
+            seconds.
+        """
+
+        self.url = url
+        https, self.host, self.port = parse_url(url)
+        self._ssl = True if https else None
+        self.pool_size = pool_size
+        self.timeout = timeout
+        self._semaphore = None
+        self._idle = []
+        self._batch_endpoints = None
+        # Keys and (key, val) pairs (by ttl) of the get() and set() calls
+        # to send together, with their futures.
+        self._pending_gets = {}
+        self._pending_sets = {}
+        self._flush_scheduled = False
+
+    async def __aenter__(self):
+        """ Returns the client, closed when leaving the with block. """
+
+        return self
+
+    async def __aexit__(self, exc_type, exc_value, exc_traceback):
+        """ Closes the client. """
+
+        self.close()
+
+    def close(self):
+        """ Closes the idle connections. """
+
+        for _, writer in self._idle:
+            writer.close()
+        self._idle = []
+
+    async def request(self, method, path, payload=None):
+        """
+            Sends a request to the server, with the payload encoded in json
+            if given. Returns the status and the decoded json body of the
+            response (None if not json).
+        """
+
+        body = b'' if payload is None else json.dumps(payload).encode('utf-8')
+        head = [
+            '{} {} HTTP/1.1'.format(method, path),
+            'Host: {}:{}'.format(self.host, self.port),
+            'Content-Length: {}'.format(len(body)),
+            'Accept-Encoding: {}'.format(', '.join(CONTENT_ENCODINGS)),
+        ]
+        if payload is not None:
+            head.append('Content-Type: application/json')
+        message = ('\r\n'.join(head) + '\r\n\r\n').encode('latin-1') + body
+
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.pool_size)
+        async with self._semaphore:
+            while True:
+                idle = bool(self._idle)
+                if idle:
+                    reader, writer = self._idle.pop()
+                else:
+                    reader, writer = await asyncio.wait_for(
+                        asyncio.open_connection(
+                            self.host, self.port, ssl=self._ssl
+                        ), self.timeout
+                    )
+                try:
+                    writer.write(message)
+                    await writer.drain()
+                    status, headers, data = await asyncio.wait_for(
+                        _read_response(reader), self.timeout
+                    )
+                except (OSError, asyncio.IncompleteReadError):
+                    writer.close()
+                    # The server may have closed the idle connection.
+                    if idle:
+                        continue
+                    raise
+                if headers.get('connection', '').lower() == 'close':
+                    writer.close()
+                else:
+                    self._idle.append((reader, writer))
+                break
+
+        data = decompress(data, headers.get('content-encoding'))
+        if headers.get('content-type', '').startswith('application/json'):
+            return status, json.loads(data.decode('utf-8'))
+        return status, None
+
+    async def _read(self, path, payload=None, method='GET'):
+        """
+            Returns the json response of a read request. Raises a ValueError
+            for invalid requests, an IOError for server errors.
+        """
+
+        status, data = await self.request(method, path, payload)
+        if status == 200:
+            return data
+        if status == 400:
+            raise ValueError(read_error(status, data))
+        raise IOError(read_error(status, data))
+
+    async def _write(self, path, payload=None, method='POST'):
+        """
+            Sends a write request. Returns True if it succeeded, False if
+            the write failed. Raises a KeyError for missing keys.
+        """
+
+        status, data = await self.request(method, path, payload)
+        if status == 200:
+            return True
+        if status == 404 and isinstance(data, dict):
+            raise KeyError(read_error(status, data))
+        if status in (400, 422):
+            return False
+        raise IOError(read_error(status, data))
+
+    def _schedule_flush(self):
+        """ Sends the pending get() and set() calls once they are queued. """
+
+        if not self._flush_scheduled:
+            self._flush_scheduled = True
+            asyncio.get_event_loop().call_soon(
+                lambda: asyncio.ensure_future(self._flush())
+            )
+
+    async def _flush(self):
+        """ Sends the pending get() and set() calls. """
+
+        self._flush_scheduled = False
+        gets, self._pending_gets = self._pending_gets, {}
+        sets, self._pending_sets = self._pending_sets, {}
+        await asyncio.gather(
+            self._flush_gets(gets),
+            *[self._flush_sets(ttl, pending) for ttl, pending in sets.items()]
+        )
+
+    async def _flush_gets(self, gets):
+        """ Sends the pending get() calls, futures by key, together. """
+
+        if not gets:
+            return
+        try:
+            values = await self.get_many(list(gets))
+        except Exception as exc:  # pylint: disable=broad-except
+            values = exc
+        for key, futures in gets.items():
+            for future in futures:
+                if future.cancelled():
+                    continue
+                if isinstance(values, Exception):
+                    future.set_exception(values)
+                else:
+                    future.set_result(values[key])
+
+    async def _flush_sets(self, ttl, pending):
+        """ Sends the pending set() calls with the ttl together. """
+
+        try:
+            result = await self.set_many(
+                [(key, val) for key, val, _ in pending], ttl
+            )
+        except Exception as exc:  # pylint: disable=broad-except
+            result = exc
+        for _, _, future in pending:
+            if future.cancelled():
+                continue
+            if isinstance(result, Exception):
+                future.set_exception(result)
+            else:
+                future.set_result(result)
+
+    async def get(self, key):
+        """
+            Gets the value of a key from the database.
+            Returns None if the key is not found in the database.
+        """
+
+        future = asyncio.get_event_loop().create_future()
+        self._pending_gets.setdefault(str(key), []).append(future)
+        self._schedule_flush()
+        return await future
+
+    async def get_many(self, keys):
+        """
+            Gets the values of multiple keys from the database at once.
+            Returns a dict of the values by key, None for the keys not
+            found in the database.
+        """
+
+        keys = [str(key) for key in keys]
+        values = {}
+        for batch in chunks(keys):
+            if self._batch_endpoints is not False:
+                status, data = await self.request(
+                    'POST', '/mget', {'keys': batch}
+                )
+                self._batch_endpoints = status != 404
+                if self._batch_endpoints:
+                    if status != 200:
+                        raise ValueError(read_error(status, data))
+                    values.update(data['values'])
+                    continue
+            for key in batch:
+                values[key] = (await self._read(
+                    query_path('/get', {'key': key})
+                ))['value']
+        return values
+
+    async def set(self, key, val, ttl=None):
+        """
+            Sets the value to a key in the database.
+            Overwrites the value if the key already exists.
+            The key expires after ttl seconds if given.
+        """
+
+        future = asyncio.get_event_loop().create_future()
+        self._pending_sets.setdefault(ttl, []).append(
+            (str(key), val, future)
+        )
+        self._schedule_flush()
+        return await future
+
+    async def set_many(self, mapping, ttl=None):
+        """
+            Sets the values of multiple keys in the database at once.
+            Accepts a dict or an iterable of (key, val) pairs.
+            The keys expire after ttl seconds if given.
+        """
+
+        if isinstance(mapping, dict):
+            mapping = mapping.items()
+        items = [[str(key), val] for key, val in mapping]
+        result = True
+        for batch in chunks(items):
+            payload = {'items': batch}
+            if ttl is not None:
+                payload['ttl'] = ttl
+            if self._batch_endpoints is not False:
+                status, _ = await self.request('POST', '/mset', payload)
+                self._batch_endpoints = status != 404
+                if self._batch_endpoints:
+                    result = status == 200 and result
+                    continue
+            for key, val in batch:
+                payload = {'key': key, 'value': val}
+                if ttl is not None:
+                    payload['ttl'] = ttl
+                result = await self._write('/set', payload) and result
+        return result
+
+    async def remove(self, key):
+        """
+            Removes a key from the database.
+            Raises a KeyError if the key is not found in the database.
+        """
+
+        return await self.remove_many([key])
+
+    async def remove_many(self, keys):
+        """
+            Removes multiple keys from the database, with a single request
+            per MAX_BATCH_SIZE keys. Raises a KeyError if one of the keys
+            is not found, without removing the keys of its request.
+        """
+
+        keys = [str(key) for key in keys]
+        result = True
+        for batch in chunks(keys):
+            if self._batch_endpoints is not False:
+                status, data = await self.request(
+                    'POST', '/mremove', {'keys': batch}
+                )
+                if status == 404 and isinstance(data, dict):
+                    raise KeyError(read_error(status, data))
+                self._batch_endpoints = status != 404
+                if self._batch_endpoints:
+                    result = status == 200 and result
+                    continue
+            for key in batch:
+                result = await self._write(
+                    '/remove/' + quote(key, safe=''), method='DELETE'
+                ) and result
+        return result
+
+    async def _iterate(self, path, name, params):
+        """ Returns the list of elements of a listing endpoint. """
+
+        return (await self._read(query_path(path, params)))[name]
+
+    async def length(self):
+        """ Returns the number of keys in the database. """
+
+        return len(await self.keys())
+
+    async def keys(self):
+        """ Returns a list of all the keys in the database. """
+
+        return await self.iter_keys()
+
+    async def values(self):
+        """ Returns a list of all the values in the database. """
+
+        return await self.iter_values()
+
+    async def items(self):
+        """ Returns a list of all the (key, val) pairs in the database. """
+
+        return await self.iter_items()
+
+    async def iter_keys(self, prefix=None, start=None, stop=None):
+        """
+            Returns a list of the keys in the database sorted by key,
+            filtered like PupDB.iter_keys().
+        """
+
+        return await self._iterate(
+            '/keys', 'keys', {'prefix': prefix, 'start': start, 'stop': stop}
+        )
+
+    async def iter_values(self, prefix=None, start=None, stop=None):
+        """
+            Returns a list of the values in the database sorted by key,
+            filtered like PupDB.iter_keys().
+        """
+
+        return await self._iterate(
+            '/values', 'values',
+            {'prefix': prefix, 'start': start, 'stop': stop}
+        )
+
+    async def iter_items(self, prefix=None, start=None, stop=None):
+        """
+            Returns a list of the (key, val) pairs in the database sorted
+            by key, filtered like PupDB.iter_keys().
+        """
+
+        return [tuple(item) for item in await self._iterate(
+            '/items', 'items',
+            {'prefix': prefix, 'start': start, 'stop': stop}
+        )]
+
+    async def range(self, start=None, stop=None):
+        """
+            Returns a list of the (key, val) pairs with start <= key < stop,
+            sorted by key. Either bound can be None.
+        """
+
+        return [tuple(item) for item in await self._iterate(
+            '/range', 'items', {'start': start, 'stop': stop}
+        )]
+
+    async def prefix(self, prefix):
+        """
+            Returns a list of the (key, val) pairs whose key starts with
+            prefix, sorted by key.
+        """
+
+        return [tuple(item) for item in await self._iterate(
+            '/prefix', 'items', {'prefix': prefix}
+        )]
+
+    async def scan(self, cursor=None, limit=100, prefix=None):
+        """
+            Returns a page of at most limit (key, val) pairs and the cursor
+            of the next page, see PupDB.scan().
+        """
+
+        data = await self._read(query_path(
+            '/scan', {'cursor': cursor, 'limit': limit, 'prefix': prefix}
+        ))
+        return [tuple(item) for item in data['items']], data['cursor']
+
+    async def dumps(self):
+        """ Returns a string dump of the entire database sorted by key. """
+
+        return json.dumps(
+            (await self._read('/dumps'))['database'], sort_keys=True
+        )
+
+    async def truncate_db(self):
+        """ Truncates the entire database (makes it empty). """
+
+        return await self._write('/truncate-db')
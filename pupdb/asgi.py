@@ -0,0 +1,485 @@
+"""
+    This module represents the ASGI interface to PupDB, an alternative to
+    the Flask-based HTTP interface of pupdb.rest with the same endpoints,
+    served by an asyncio event loop.
+
+    Requires Python 3.5+, and an ASGI server such as uvicorn to run it,
+    see pupdb.server.start_asgi_server().
+"""
+
+import json
+import os
+import traceback
+from urllib.parse import parse_qs
+
+from pupdb.aio import AsyncPupDB
+from pupdb.core import PupDB
+from pupdb.http_utils import (
+    MAX_SCAN_LIMIT, ResponseCache, batch_items, batch_keys,
+    choose_encoding, compress_chunks, database_options, etag_matches,
+    iter_json_chunks, make_etag
+)
+
+
+# pylint: disable=useless-object-inheritance
+class PupDBApp(object):
+    """
+        ASGI application serving the HTTP endpoints of pupdb.rest.
+
+        Each process keeps one AsyncPupDB instance with the read cache,
+        so that reads of an unchanged database are served from memory, and
+        concurrent reads and writes are merged into single reads and
+        writes of the database, run one at a time off the event loop.
+    """
+
+    def __init__(self, db_file_path=None, **kwargs):
+        """
+            Initializes the application. The database file path defaults to
+            the PUPDB_FILE_PATH environment variable, or pupdb.json, and the
+            keyword arguments are passed on to AsyncPupDB, with the options
+            of pupdb.rest by default. The database is opened by the first
+            request.
+        """
+
+        self.db_file_path = db_file_path
+        self.options = kwargs
+        self.database = None
+        # Encoded responses of the listing endpoints, for the current
+        # version of the database.
+        self.responses = ResponseCache()
+        self._routes = {
+            '/get': ('GET', self.db_get),
+            '/set': ('POST', self.db_set),
+            '/mget': ('POST', self.db_mget),
+            '/mset': ('POST', self.db_mset),
+            '/mremove': ('POST', self.db_mremove),
+            '/keys': ('GET', self.db_keys),
+            '/values': ('GET', self.db_values),
+            '/items': ('GET', self.db_items),
+            '/dumps': ('GET', self.db_dumps),
+            '/range': ('GET', self.db_range),
+            '/prefix': ('GET', self.db_prefix),
+            '/scan': ('GET', self.db_scan),
+            '/truncate-db': ('POST', self.db_truncate),
+        }
+
+    def _get_database(self):
+        """ Returns the AsyncPupDB instance, opening it if needed. """
+
+        if self.database is None:
+            options = database_options()
+            options.update(self.options)
+            self.database = AsyncPupDB(
+                self.db_file_path or os.environ.get('PUPDB_FILE_PATH') or
+                'pupdb.json', **options
+            )
+        return self.database
+
+    async def __call__(self, scope, receive, send):
+        """ Handles an ASGI connection. """
+
+        if scope['type'] == 'lifespan':
+            await self._lifespan(receive, send)
+            return
+        if scope['type'] != 'http':
+            return
+
+        path = scope['path']
+        if path.startswith('/remove/'):
+            method, handler = 'DELETE', self.db_remove
+        elif path in self._routes:
+            method, handler = self._routes[path]
+        else:
+            await _send_json(send, {'error': 'Not Found'}, 404)
+            return
+        if scope['method'] != method:
+            await _send_json(send, {'error': 'Method Not Allowed'}, 405)
+            return
+
+        request = _Request(scope, receive)
+        response = await handler(request)
+        if isinstance(response, _Stream):
+            await self._send_stream(request, response, send)
+        else:
+            await _send_json(send, *response)
+
+    async def _send_stream(self, request, response, send):
+        """
+            Sends a streamed response, compressed with the preferred
+            content encoding accepted by the client, with the ETag of the
+            version of the database: a 304 Not Modified response is sent if
+            it matches the If-None-Match header, without reading the
+            database again, and the response is cached until the database
+            changes.
+        """
+
+        database = self._get_database()
+        version = await database.run(PupDB.version)
+        encoding = choose_encoding(request.headers.get('accept-encoding'))
+        etag = make_etag(version, encoding)
+        headers = [
+            (b'etag', etag.encode('ascii')), (b'vary', b'Accept-Encoding')
+        ]
+        if etag_matches(request.headers.get('if-none-match'), etag):
+            await send({
+                'type': 'http.response.start', 'status': 304,
+                'headers': headers,
+            })
+            await send({'type': 'http.response.body', 'body': b''})
+            return
+
+        if encoding:
+            headers.append((b'content-encoding', encoding.encode('ascii')))
+        cache_key = (request.path, request.query_string, encoding)
+        body = self.responses.get(version, cache_key)
+        if body is None:
+            await response.send(
+                send, database, headers,
+                lambda chunks: self.responses.cache_chunks(
+                    version, cache_key,
+                    compress_chunks(chunks, encoding) if encoding else chunks
+                )
+            )
+            return
+        await send({
+            'type': 'http.response.start', 'status': 200,
+            'headers': headers + [
+                (b'content-type', b'application/json'),
+                (b'content-length', str(len(body)).encode('ascii')),
+            ],
+        })
+        await send({'type': 'http.response.body', 'body': body})
+
+    async def _lifespan(self, receive, send):
+        """ Handles the startup/shutdown events of the ASGI server. """
+
+        while True:
+            message = await receive()
+            if message['type'] == 'lifespan.startup':
+                self._get_database()
+                await send({'type': 'lifespan.startup.complete'})
+            elif message['type'] == 'lifespan.shutdown':
+                if self.database is not None:
+                    self.database.close()
+                    self.database = None
+                await send({'type': 'lifespan.shutdown.complete'})
+                return
+
+    async def db_get(self, request):
+        """ Endpoint Function to interact with PupDB's get() method. """
+
+        key = request.args.get('key')
+        if not key:
+            return {'error': 'Missing parameter \'key\''}, 400
+        value = await self._get_database().get(key)
+        return {'key': key, 'value': value}, 200
+
+    async def db_set(self, request):
+        """ Endpoint Function to interact with PupDB's set() method. """
+
+        try:
+            payload = json.loads((await request.body()).decode('utf-8'))
+            key = payload.get('key')
+            value = payload.get('value')
+            if not key:
+                return {'error': 'Missing parameter \'key\''}, 400
+            if not value:
+                return {'error': 'Missing parameter \'value\''}, 400
+
+            result = await self._get_database().set(
+                key, value, payload.get('ttl')
+            )
+
+            if result:
+                return {
+                    'message':
+                    'Key \'{}\' set to Value \'{}\''.format(key, value)
+                }, 200
+            return {
+                'error':
+                'There was a problem saving ({}, {}) to the DB.'.format(
+                    key, value
+                )
+            }, 400
+        except Exception:  # pylint: disable=broad-except
+            return {'error': 'Unable to process this request.'}, 422
+
+    async def db_remove(self, request):
+        """ Endpoint Function to interact with PupDB's remove() method. """
+
+        try:
+            # ASGI servers give the path already percent-decoded.
+            key = request.path[len('/remove/'):]
+            if not key:
+                return {'error': 'Missing parameter \'key\''}, 400
+
+            try:
+                result = await self._get_database().remove(key)
+            except KeyError as key_err:
+                return {'error': str(key_err)[1:-1]}, 404
+
+            if result:
+                return {
+                    'message': 'Key \'{}\' removed from DB.'.format(key)
+                }, 200
+
+            return {
+                'error':
+                'There was a problem removing Key \'{}\' from the DB.'.format(
+                    key
+                )
+            }, 400
+        except Exception:  # pylint: disable=broad-except
+            return {
+                'error':
+                    'Unable to process this request. Details: %s' %
+                    traceback.format_exc(),
+            }, 422
+
+    async def db_mget(self, request):
+        """ Endpoint Function to interact with PupDB's get_many() method. """
+
+        try:
+            keys = batch_keys(await request.json())
+        except ValueError as val_err:
+            return {'error': str(val_err)}, 400
+        return {'values': await self._get_database().get_many(keys)}, 200
+
+    async def db_mset(self, request):
+        """ Endpoint Function to interact with PupDB's set_many() method. """
+
+        try:
+            payload = await request.json()
+            try:
+                items = batch_items(payload)
+            except ValueError as val_err:
+                return {'error': str(val_err)}, 400
+
+            if await self._get_database().set_many(
+                    items, payload.get('ttl')):
+                return {'message': '{} keys set.'.format(len(items))}, 200
+            return {
+                'error': 'There was a problem saving the keys to the DB.'
+            }, 400
+        except Exception:  # pylint: disable=broad-except
+            return {'error': 'Unable to process this request.'}, 422
+
+    async def db_mremove(self, request):
+        """
+            Endpoint Function to interact with PupDB's remove_many() method.
+        """
+
+        try:
+            keys = batch_keys(await request.json())
+        except ValueError as val_err:
+            return {'error': str(val_err)}, 400
+
+        try:
+            result = await self._get_database().remove_many(keys)
+        except KeyError as key_err:
+            return {'error': str(key_err)[1:-1]}, 404
+
+        if result:
+            return {
+                'message': '{} keys removed from DB.'.format(len(keys))
+            }, 200
+        return {
+            'error': 'There was a problem removing the keys from the DB.'
+        }, 400
+
+    async def db_keys(self, request):
+        """ Endpoint Function to interact with PupDB's iter_keys() method. """
+
+        return _Stream('keys', PupDB.iter_keys, kwargs=request.iter_args())
+
+    async def db_values(self, request):
+        """
+            Endpoint Function to interact with PupDB's iter_values() method.
+        """
+
+        return _Stream(
+            'values', PupDB.iter_values, kwargs=request.iter_args()
+        )
+
+    async def db_items(self, request):
+        """ Endpoint Function to interact with PupDB's iter_items() method. """
+
+        return _Stream('items', PupDB.iter_items, kwargs=request.iter_args())
+
+    # pylint: disable=unused-argument
+    async def db_dumps(self, request):
+        """
+            Endpoint Function to dump the database like PupDB's dumps()
+            method, streamed from PupDB's iter_items() method.
+        """
+
+        return _Stream('database', PupDB.iter_items, is_object=True)
+
+    async def db_range(self, request):
+        """ Endpoint Function to interact with PupDB's range() method. """
+
+        return _Stream(
+            'items', PupDB.range,
+            (request.args.get('start'), request.args.get('stop'))
+        )
+
+    async def db_prefix(self, request):
+        """ Endpoint Function to interact with PupDB's prefix() method. """
+
+        prefix = request.args.get('prefix')
+        if prefix is None:
+            return {'error': 'Missing parameter \'prefix\''}, 400
+        return _Stream('items', PupDB.prefix, (prefix,))
+
+    async def db_scan(self, request):
+        """ Endpoint Function to interact with PupDB's scan() method. """
+
+        try:
+            limit = int(request.args.get('limit', 100))
+            if limit > MAX_SCAN_LIMIT:
+                return {
+                    'error': 'Parameter \'limit\' must be at most {}'.format(
+                        MAX_SCAN_LIMIT
+                    )
+                }, 400
+            items, cursor = await self._get_database().run(
+                PupDB.scan, request.args.get('cursor') or None, limit,
+                request.args.get('prefix')
+            )
+        except ValueError as val_err:
+            return {'error': str(val_err)}, 400
+        return {
+            'items': [list(item) for item in items], 'cursor': cursor
+        }, 200
+
+    # pylint: disable=unused-argument
+    async def db_truncate(self, request):
+        """
+            Endpoint Function to interact with PupDB's truncate_db() method.
+        """
+
+        result = await self._get_database().run(PupDB.truncate_db)
+
+        if result:
+            return {
+                'message': 'DB has been truncated successfully.'
+            }, 200
+
+        return {
+            'error': 'There was a problem truncating the DB.'
+        }, 400
+
+
+class _Request(object):
+    """ HTTP request of an ASGI connection. """
+
+    def __init__(self, scope, receive):
+        """ Initializes the request from the ASGI scope. """
+
+        self.path = scope['path']
+        self.query_string = scope.get('query_string', b'').decode('utf-8')
+        self.args = {
+            name: values[-1] for name, values in parse_qs(
+                self.query_string, keep_blank_values=True
+            ).items()
+        }
+        self.headers = {
+            name.decode('latin-1').lower(): value.decode('latin-1')
+            for name, value in scope.get('headers', [])
+        }
+        self._receive = receive
+
+    def iter_args(self):
+        """ Returns the prefix/start/stop filters of the request. """
+
+        return {
+            name: self.args.get(name) for name in ('prefix', 'start', 'stop')
+        }
+
+    async def json(self):
+        """ Returns the json body of the request, or None if invalid. """
+
+        try:
+            return json.loads((await self.body()).decode('utf-8'))
+        except ValueError:
+            return None
+
+    async def body(self):
+        """ Returns the body of the request. """
+
+        chunks = []
+        while True:
+            message = await self._receive()
+            chunks.append(message.get('body', b''))
+            if not message.get('more_body'):
+                return b''.join(chunks)
+
+
+class _Stream(object):
+    """
+        Response streaming {name: [...]} in chunks, encoding the elements
+        iterated by function(database, *args, **kwargs), see
+        pupdb.http_utils.iter_json_chunks().
+    """
+
+    # pylint: disable=too-many-arguments
+    def __init__(self, name, function, args=(), kwargs=None, is_object=False):
+        """ Initializes the response. """
+
+        self.name = name
+        self.function = function
+        self.args = args
+        self.kwargs = kwargs or {}
+        self.is_object = is_object
+
+    async def send(self, send, database, headers=(), wrap_chunks=None):
+        """
+            Sends the response with the headers, encoding each chunk in the
+            executor of the AsyncPupDB instance database. The iterator over
+            the chunks is wrapped by wrap_chunks(chunks) if given.
+        """
+
+        def iter_chunks(pupdb):
+            """ Returns the iterator over the encoded chunks. """
+
+            chunks = iter_json_chunks(
+                self.name, self.function(pupdb, *self.args, **self.kwargs),
+                self.is_object
+            )
+            return wrap_chunks(chunks) if wrap_chunks else chunks
+
+        chunks = await database.run(iter_chunks)
+        await send({
+            'type': 'http.response.start', 'status': 200,
+            'headers': list(headers) + [
+                (b'content-type', b'application/json')
+            ],
+        })
+        while True:
+            chunk = await database.run(lambda _: next(chunks, None))
+            if chunk is None:
+                break
+            if not isinstance(chunk, bytes):
+                chunk = chunk.encode('utf-8')
+            await send({
+                'type': 'http.response.body', 'body': chunk,
+                'more_body': True,
+            })
+        await send({'type': 'http.response.body', 'body': b''})
+
+
+async def _send_json(send, payload, status):
+    """ Sends a json response. """
+
+    body = json.dumps(payload, sort_keys=True).encode('utf-8') + b'\n'
+    await send({
+        'type': 'http.response.start', 'status': status,
+        'headers': [
+            (b'content-type', b'application/json'),
+            (b'content-length', str(len(body)).encode('ascii')),
+        ],
+    })
+    await send({'type': 'http.response.body', 'body': body})
+
+
+APP = PupDBApp()
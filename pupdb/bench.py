@@ -0,0 +1,397 @@
+"""
+    Benchmarks of the throughput and latency of PupDB, and of its HTTP
+    interface, printed in json to compare storage modes and to catch
+    performance regressions. e.g.:
+
+        python -m pupdb.bench --sizes 1000,100000 --threads 1,4 \\
+            --options '{}' --options '{"append_log": true}' --rest
+
+    Run python -m pupdb.bench --help for all the options.
+"""
+
+import argparse
+import json
+import logging
+import multiprocessing
+import os
+import platform
+import random
+import shutil
+import sys
+import tempfile
+import threading
+import time
+
+from pupdb.core import PupDB, encode_cursor
+
+# Timer of the latencies.
+_timer = getattr(time, 'perf_counter', time.time)
+
+OPERATIONS = ('get', 'set', 'remove', 'scan')
+
+# Number of (key, val) pairs of a scan page.
+SCAN_LIMIT = 100
+
+# Number of keys written at once when populating the databases.
+POPULATE_BATCH_SIZE = 100000
+
+
+def make_key(index):
+    """ Returns the key of the index-th key of the benchmark databases. """
+
+    return 'key{:08d}'.format(index)
+
+
+def percentile(latencies, fraction):
+    """ Returns the fraction percentile of the sorted latencies. """
+
+    if not latencies:
+        return None
+    return latencies[min(int(fraction * len(latencies)), len(latencies) - 1)]
+
+
+def populate(db_file_path, size, value_size, options):
+    """
+        Creates the database at db_file_path, with the options, holding
+        size keys whose values are strings of value_size characters.
+    """
+
+    database = PupDB(db_file_path, **options)
+    value = 'x' * value_size
+    for start in range(0, size, POPULATE_BATCH_SIZE):
+        database.set_many(
+            (make_key(index), value)
+            for index in range(start, min(start + POPULATE_BATCH_SIZE, size))
+        )
+
+
+def _open(target):
+    """
+        Returns the database of a target: ('core', db_file_path, options)
+        or ('rest', url, pool_size).
+    """
+
+    if target[0] == 'rest':
+        # pylint: disable=import-outside-toplevel
+        from pupdb.client import PupDBClient
+        return PupDBClient(target[1], pool_size=target[2])
+    return PupDB(target[1], **target[2])
+
+
+def _run_thread(database, task, thread_index, keys, results):
+    """
+        Runs count operations of the task on the database, appending their
+        latencies and the start and end times to results.
+    """
+
+    operation, size, value = task['operation'], task['size'], task['value']
+    rand = random.Random(task['seed'] + thread_index)
+    latencies = []
+    start = time.time()
+    for index in range(task['count']):
+        if operation == 'remove':
+            key = keys[index]
+        else:
+            key = make_key(rand.randrange(size))
+        begin = _timer()
+        if operation == 'get':
+            database.get(key)
+        elif operation == 'set':
+            database.set(key, value)
+        elif operation == 'remove':
+            database.remove(key)
+        else:
+            database.scan(encode_cursor(key), SCAN_LIMIT)
+        latencies.append(_timer() - begin)
+    results.append((latencies, start, time.time()))
+
+
+def run_worker(task):
+    """
+        Runs the task of a benchmark process: task['threads'] threads each
+        running task['count'] operations on the database of task['target'].
+        Returns the list of latencies, start and end times of each thread.
+    """
+
+    database = _open(task['target'])
+    threads = task['threads']
+    keys = [[] for _ in range(threads)]
+    if task['operation'] == 'remove':
+        # The keys to remove are added beforehand.
+        for thread_index in range(threads):
+            keys[thread_index] = [
+                'remove:{}:{}:{}'.format(os.getpid(), thread_index, index)
+                for index in range(task['count'])
+            ]
+        database.set_many(
+            (key, task['value']) for thread_keys in keys
+            for key in thread_keys
+        )
+
+    results = []
+    workers = [
+        threading.Thread(
+            target=_run_thread,
+            args=(database, task, thread_index, keys[thread_index], results)
+        )
+        for thread_index in range(threads)
+    ]
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+    if hasattr(database, 'close'):
+        database.close()
+    return results
+
+
+def summarize(results):
+    """
+        Returns the number of operations, the duration, the throughput and
+        the latency statistics (in microseconds) of the thread results.
+    """
+
+    latencies = sorted(
+        latency for thread_latencies, _, _ in results
+        for latency in thread_latencies
+    )
+    seconds = max(end for _, _, end in results) - \
+        min(start for _, start, _ in results)
+    return {
+        'ops': len(latencies),
+        'seconds': round(seconds, 6),
+        'throughput': round(len(latencies) / seconds, 1) if seconds else None,
+        'mean_us': round(sum(latencies) / len(latencies) * 1e6, 1),
+        'p50_us': round(percentile(latencies, 0.5) * 1e6, 1),
+        'p99_us': round(percentile(latencies, 0.99) * 1e6, 1),
+        'max_us': round(latencies[-1] * 1e6, 1),
+    }
+
+
+def _serve_rest(db_file_path, options):
+    """
+        Serves pupdb.rest on a local port, with the database at
+        db_file_path opened with the options of the HTTP interfaces and
+        options. Returns the url, and the function stopping the server.
+    """
+
+    # pylint: disable=import-outside-toplevel
+    from werkzeug.serving import make_server
+    from pupdb.http_utils import ResponseCache, database_options
+    # The database of pupdb.rest is opened when it is first imported.
+    file_path = os.environ.get('PUPDB_FILE_PATH')
+    os.environ['PUPDB_FILE_PATH'] = db_file_path
+    try:
+        from pupdb import rest
+    finally:
+        if file_path is None:
+            del os.environ['PUPDB_FILE_PATH']
+        else:
+            os.environ['PUPDB_FILE_PATH'] = file_path
+
+    rest_options = database_options()
+    rest_options.update(options)
+    database, responses = rest.DB, rest.RESPONSES
+    rest.DB = PupDB(db_file_path, **rest_options)
+    rest.RESPONSES = ResponseCache()
+    server = make_server('127.0.0.1', 0, rest.APP, threaded=True)
+    thread = threading.Thread(target=server.serve_forever)
+    thread.start()
+
+    def stop():
+        """ Stops the server, and restores the database of pupdb.rest. """
+
+        server.shutdown()
+        thread.join()
+        server.server_close()
+        rest.DB, rest.RESPONSES = database, responses
+
+    return 'http://127.0.0.1:{}'.format(server.server_port), stop
+
+
+# pylint: disable=too-many-arguments,too-many-locals
+def run_benchmarks(sizes=(1000,), value_sizes=(100,), threads=(1,),
+                   processes=(1,), operations=OPERATIONS, options=({},),
+                   count=1000, rest=False, seed=0, log=None):
+    """
+        Runs the benchmarks of every combination of the arguments, on
+        databases of each size, value size and PupDB options, with count
+        operations per thread. With rest, the operations are also run
+        through the HTTP interface of pupdb.rest, served on a local port
+        by the werkzeug development server. Returns the list of results.
+    """
+
+    results = []
+    for db_options in options:
+        for size in sizes:
+            for value_size in value_sizes:
+                directory = tempfile.mkdtemp(prefix='pupdb-bench-')
+                db_file_path = os.path.join(directory, 'bench.json')
+                try:
+                    populate(db_file_path, size, value_size, db_options)
+                    targets = [('core', ('core', db_file_path, db_options))]
+                    stop = None
+                    if rest:
+                        url, stop = _serve_rest(db_file_path, db_options)
+                        targets.append(('rest', url))
+                    try:
+                        for target in targets:
+                            results.extend(_run_target(
+                                target, db_options, size, value_size,
+                                threads, processes, operations, count, seed,
+                                log
+                            ))
+                    finally:
+                        if stop is not None:
+                            stop()
+                finally:
+                    shutil.rmtree(directory, ignore_errors=True)
+    return results
+
+
+def _run_target(target, db_options, size, value_size, threads, processes,
+                operations, count, seed, log):
+    """ Runs the benchmarks of a target, see run_benchmarks(). """
+
+    results = []
+    for operation in operations:
+        for thread_count in threads:
+            for process_count in processes:
+                if target[0] == 'rest':
+                    task_target = ('rest', target[1], thread_count)
+                else:
+                    task_target = target[1]
+                tasks = [{
+                    'target': task_target, 'operation': operation,
+                    'size': size, 'value': 'x' * value_size,
+                    'threads': thread_count, 'count': count,
+                    'seed': seed + 1000 * index,
+                } for index in range(process_count)]
+                if process_count == 1:
+                    thread_results = run_worker(tasks[0])
+                else:
+                    pool = multiprocessing.Pool(process_count)
+                    try:
+                        thread_results = [
+                            result for worker_results in
+                            pool.map(run_worker, tasks)
+                            for result in worker_results
+                        ]
+                    finally:
+                        pool.close()
+                        pool.join()
+                result = {
+                    'target': target[0], 'operation': operation,
+                    'size': size, 'value_size': value_size,
+                    'threads': thread_count, 'processes': process_count,
+                    'options': db_options,
+                }
+                result.update(summarize(thread_results))
+                if log is not None:
+                    log(result)
+                results.append(result)
+    return results
+
+
+def _int_list(value):
+    """ Parses a comma-separated list of integers. """
+
+    return [int(element) for element in value.split(',') if element]
+
+
+def parse_args(argv=None):
+    """ Parses the command line arguments of the benchmarks. """
+
+    parser = argparse.ArgumentParser(
+        prog='python -m pupdb.bench',
+        description='Benchmarks the throughput and latency of PupDB.'
+    )
+    parser.add_argument(
+        '--sizes', type=_int_list, default=[1000, 10000],
+        help='comma-separated numbers of keys of the databases'
+    )
+    parser.add_argument(
+        '--value-sizes', type=_int_list, default=[100],
+        help='comma-separated sizes of the values, in characters'
+    )
+    parser.add_argument(
+        '--threads', type=_int_list, default=[1],
+        help='comma-separated numbers of threads per process'
+    )
+    parser.add_argument(
+        '--processes', type=_int_list, default=[1],
+        help='comma-separated numbers of processes'
+    )
+    parser.add_argument(
+        '--operations', type=lambda value: value.split(','),
+        default=list(OPERATIONS),
+        help='comma-separated operations, among {}'.format(
+            ', '.join(OPERATIONS)
+        )
+    )
+    parser.add_argument(
+        '--options', type=json.loads, action='append',
+        help='json object of PupDB options, e.g. \'{"append_log": true}\', '
+        'may be given several times to compare them (default: {})'
+    )
+    parser.add_argument(
+        '--count', type=int, default=1000,
+        help='number of operations per thread'
+    )
+    parser.add_argument(
+        '--rest', action='store_true',
+        help='also benchmark the HTTP interface, served locally'
+    )
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument(
+        '--output', help='file to write the json results to (default: '
+        'standard output)'
+    )
+    args = parser.parse_args(argv)
+    unknown = set(args.operations) - set(OPERATIONS)
+    if unknown:
+        parser.error('unknown operations: {}'.format(
+            ', '.join(sorted(unknown))
+        ))
+    if args.options is None:
+        args.options = [{}]
+    return args
+
+
+def main(argv=None):
+    """ Runs the benchmarks of the command line arguments. """
+
+    args = parse_args(argv)
+    logging.getLogger('werkzeug').setLevel(logging.ERROR)
+
+    def log(result):
+        """ Reports the progress on the standard error. """
+
+        sys.stderr.write(
+            '{target} {operation} size={size} value_size={value_size} '
+            'threads={threads} processes={processes} options={options}: '
+            '{throughput} ops/s, p50 {p50_us} us, p99 {p99_us} us\n'.format(
+                **result
+            )
+        )
+
+    results = run_benchmarks(
+        args.sizes, args.value_sizes, args.threads, args.processes,
+        args.operations, args.options, args.count, args.rest, args.seed, log
+    )
+    report = json.dumps({
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'cpus': multiprocessing.cpu_count(),
+        'count': args.count,
+        'results': results,
+    }, indent=2, sort_keys=True)
+    if args.output:
+        with open(args.output, 'w') as output_file:
+            output_file.write(report + '\n')
+    else:
+        sys.stdout.write(report + '\n')
+
+
+if __name__ == '__main__':
+    main()
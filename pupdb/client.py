@@ -0,0 +1,493 @@
+"""
+    Module containing the client of the HTTP interface to PupDB, with the
+    interface of PupDB.
+"""
+
+import json
+import socket
+
+try:
+    import http.client as httplib
+    import queue
+    from urllib.parse import quote, urlencode, urlparse
+except ImportError:
+    # Python 2.
+    import httplib
+    import Queue as queue
+    from urllib import quote, urlencode
+    from urlparse import urlparse
+
+from pupdb.http_utils import CONTENT_ENCODINGS, MAX_BATCH_SIZE, decompress
+
+DEFAULT_URL = 'http://127.0.0.1:4000'
+
+
+def chunks(elements, size=MAX_BATCH_SIZE):
+    """ Splits the list of elements into lists of at most size elements. """
+
+    return [
+        elements[start:start + size] for start in range(0, len(elements), size)
+    ]
+
+
+def parse_url(url):
+    """ Returns the (https, host, port) of the URL of a PupDB server. """
+
+    parsed = urlparse(url)
+    https = parsed.scheme == 'https'
+    return https, parsed.hostname, parsed.port or (443 if https else 80)
+
+
+def query_path(path, params):
+    """ Returns the path with the query string of the params not None. """
+
+    params = [
+        (param, value) for param, value in sorted(params.items())
+        if value is not None
+    ]
+    if params:
+        path += '?' + urlencode(params)
+    return path
+
+
+def read_error(status, data):
+    """ Returns the error message of an error response. """
+
+    if isinstance(data, dict) and 'error' in data:
+        return data['error']
+    return 'HTTP {}'.format(status)
+
+
+# pylint: disable=useless-object-inheritance
+class PupDBClient(object):
+    """
+        This class represents a PupDB database served by the HTTP interface
+        of pupdb.rest or pupdb.asgi, with the interface of PupDB.
+
+        Connections to the server are kept alive, and reused by the
+        following requests, up to pool_size idle connections. Operations
+        on multiple keys are sent as single /mget, /mset and /mremove
+        requests of at most MAX_BATCH_SIZE keys, or as one request per key
+        to servers without them. A client can be shared by threads.
+    """
+
+    def __init__(self, url=DEFAULT_URL, pool_size=4, timeout=30):
+        """
+            Initializes the client of the server at url, e.g.
+            http://127.0.0.1:4000, with requests timing out after timeout
+            seconds.
+        """
+
+        self.url = url
+        https, self.host, self.port = parse_url(url)
+        self._connection_class = httplib.HTTPSConnection if https \
+            else httplib.HTTPConnection
+        self.timeout = timeout
+        self._pool = queue.LifoQueue(pool_size)
+        # Whether the server has the multi-key endpoints, until known.
+        self._batch_endpoints = None
+
+    def __repr__(self):
+        """ String representation of this class instance. """
+
+        return 'PupDBClient({!r})'.format(self.url)
+
+    def __len__(self):
+        """ Function to return the size of iterable. """
+
+        return len(self.keys())
+
+    def close(self):
+        """ Closes the idle connections. """
+
+        while True:
+            try:
+                self._pool.get_nowait().close()
+            except queue.Empty:
+                return
+
+    def _acquire(self):
+        """
+            Returns an idle connection, or a new one, and whether it is an
+            idle one.
+        """
+
+        try:
+            return self._pool.get_nowait(), True
+        except queue.Empty:
+            return self._connection_class(
+                self.host, self.port, timeout=self.timeout
+            ), False
+
+    def _release(self, connection):
+        """ Keeps the connection for the next requests, if there is room. """
+
+        try:
+            self._pool.put_nowait(connection)
+        except queue.Full:
+            connection.close()
+
+    def request(self, method, path, payload=None):
+        """
+            Sends a request to the server, with the payload encoded in json
+            if given. Returns the status and the decoded json body of the
+            response (None if not json).
+        """
+
+        body = None
+        headers = {'Accept-Encoding': ', '.join(CONTENT_ENCODINGS)}
+        if payload is not None:
+            body = json.dumps(payload)
+            headers['Content-Type'] = 'application/json'
+
+        while True:
+            connection, idle = self._acquire()
+            try:
+                connection.request(method, path, body, headers)
+                response = connection.getresponse()
+                data = response.read()
+            except (httplib.HTTPException, socket.error):
+                connection.close()
+                # The server may have closed the idle connection.
+                if idle:
+                    continue
+                raise
+            if response.will_close:
+                connection.close()
+            else:
+                self._release(connection)
+            break
+
+        data = decompress(data, response.getheader('Content-Encoding'))
+        content_type = response.getheader('Content-Type') or ''
+        if content_type.startswith('application/json'):
+            return response.status, json.loads(data.decode('utf-8'))
+        return response.status, None
+
+    def _read(self, path, payload=None, method='GET'):
+        """
+            Returns the json response of a read request. Raises a ValueError
+            for invalid requests, an IOError for server errors.
+        """
+
+        status, data = self.request(method, path, payload)
+        if status == 200:
+            return data
+        if status == 400:
+            raise ValueError(read_error(status, data))
+        raise IOError(read_error(status, data))
+
+    def _write(self, path, payload=None, method='POST'):
+        """
+            Sends a write request. Returns True if it succeeded, False if
+            the write failed. Raises a KeyError for missing keys.
+        """
+
+        status, data = self.request(method, path, payload)
+        if status == 200:
+            return True
+        if status == 404 and isinstance(data, dict):
+            raise KeyError(read_error(status, data))
+        if status in (400, 422):
+            return False
+        raise IOError(read_error(status, data))
+
+    def _has_batch_endpoints(self, status):
+        """
+            Records whether the server has the multi-key endpoints, from
+            the status of a request to one of them. Returns it.
+        """
+
+        self._batch_endpoints = status != 404
+        return self._batch_endpoints
+
+    def get(self, key):
+        """
+            Gets the value of a key from the database.
+            Returns None if the key is not found in the database.
+        """
+
+        return self._read(query_path('/get', {'key': str(key)}))['value']
+
+    def get_many(self, keys):
+        """
+            Gets the values of multiple keys from the database at once.
+            Returns a dict of the values by key, None for the keys not
+            found in the database.
+        """
+
+        keys = [str(key) for key in keys]
+        values = {}
+        for batch in chunks(keys):
+            if self._batch_endpoints is not False:
+                status, data = self.request('POST', '/mget', {'keys': batch})
+                if self._has_batch_endpoints(status):
+                    if status != 200:
+                        raise ValueError(read_error(status, data))
+                    values.update(data['values'])
+                    continue
+            for key in batch:
+                values[key] = self.get(key)
+        return values
+
+    def set(self, key, val, ttl=None):
+        """
+            Sets the value to a key in the database.
+            Overwrites the value if the key already exists.
+            The key expires after ttl seconds if given.
+        """
+
+        return self.set_many([(key, val)], ttl)
+
+    def set_many(self, mapping, ttl=None):
+        """
+            Sets the values of multiple keys in the database at once.
+            Accepts a dict or an iterable of (key, val) pairs.
+            The keys expire after ttl seconds if given.
+        """
+
+        if isinstance(mapping, dict):
+            mapping = mapping.items()
+        items = [[str(key), val] for key, val in mapping]
+        result = True
+        for batch in chunks(items):
+            payload = {'items': batch}
+            if ttl is not None:
+                payload['ttl'] = ttl
+            if self._batch_endpoints is not False:
+                status, _ = self.request('POST', '/mset', payload)
+                if self._has_batch_endpoints(status):
+                    result = status == 200 and result
+                    continue
+            for key, val in batch:
+                payload = {'key': key, 'value': val}
+                if ttl is not None:
+                    payload['ttl'] = ttl
+                result = self._write('/set', payload) and result
+        return result
+
+    def update(self, *args, **kwargs):
+        """
+            Updates the database with the key/value pairs from a dict or an
+            iterable of (key, val) pairs and/or keyword arguments,
+            like dict.update().
+        """
+
+        return self.set_many(dict(*args, **kwargs))
+
+    def remove(self, key):
+        """
+            Removes a key from the database.
+            Raises a KeyError if the key is not found in the database.
+        """
+
+        return self.remove_many([key])
+
+    def remove_many(self, keys):
+        """
+            Removes multiple keys from the database, with a single request
+            per MAX_BATCH_SIZE keys. Raises a KeyError if one of the keys
+            is not found, without removing the keys of its request.
+        """
+
+        keys = [str(key) for key in keys]
+        result = True
+        for batch in chunks(keys):
+            if self._batch_endpoints is not False:
+                status, data = self.request(
+                    'POST', '/mremove', {'keys': batch}
+                )
+                if status == 404 and isinstance(data, dict):
+                    self._batch_endpoints = True
+                    raise KeyError(read_error(status, data))
+                if self._has_batch_endpoints(status):
+                    result = status == 200 and result
+                    continue
+            for key in batch:
+                result = self._write(
+                    '/remove/' + quote(key, safe=''), method='DELETE'
+                ) and result
+        return result
+
+    def _iterate(self, path, name, params):
+        """ Returns the list of elements of a listing endpoint. """
+
+        return self._read(query_path(path, params))[name]
+
+    def keys(self):
+        """ Returns a list of all the keys in the database. """
+
+        return self.iter_keys()
+
+    def values(self):
+        """ Returns a list of all the values in the database. """
+
+        return self.iter_values()
+
+    def items(self):
+        """ Returns a list of all the (key, val) pairs in the database. """
+
+        return self.iter_items()
+
+    def iter_keys(self, prefix=None, start=None, stop=None):
+        """
+            Returns a list of the keys in the database sorted by key,
+            filtered like PupDB.iter_keys().
+        """
+
+        return self._iterate(
+            '/keys', 'keys', {'prefix': prefix, 'start': start, 'stop': stop}
+        )
+
+    def iter_values(self, prefix=None, start=None, stop=None):
+        """
+            Returns a list of the values in the database sorted by key,
+            filtered like PupDB.iter_keys().
+        """
+
+        return self._iterate(
+            '/values', 'values',
+            {'prefix': prefix, 'start': start, 'stop': stop}
+        )
+
+    def iter_items(self, prefix=None, start=None, stop=None):
+        """
+            Returns a list of the (key, val) pairs in the database sorted
+            by key, filtered like PupDB.iter_keys().
+        """
+
+        return [tuple(item) for item in self._iterate(
+            '/items', 'items',
+            {'prefix': prefix, 'start': start, 'stop': stop}
+        )]
+
+    def range(self, start=None, stop=None):
+        """
+            Returns a list of the (key, val) pairs with start <= key < stop,
+            sorted by key. Either bound can be None.
+        """
+
+        return [tuple(item) for item in self._iterate(
+            '/range', 'items', {'start': start, 'stop': stop}
+        )]
+
+    def prefix(self, prefix):
+        """
+            Returns a list of the (key, val) pairs whose key starts with
+            prefix, sorted by key.
+        """
+
+        return [tuple(item) for item in self._iterate(
+            '/prefix', 'items', {'prefix': prefix}
+        )]
+
+    def scan(self, cursor=None, limit=100, prefix=None):
+        """
+            Returns a page of at most limit (key, val) pairs and the cursor
+            of the next page, see PupDB.scan().
+        """
+
+        data = self._read(query_path(
+            '/scan', {'cursor': cursor, 'limit': limit, 'prefix': prefix}
+        ))
+        return [tuple(item) for item in data['items']], data['cursor']
+
+    def dumps(self):
+        """ Returns a string dump of the entire database sorted by key. """
+
+        return json.dumps(self._read('/dumps')['database'], sort_keys=True)
+
+    def truncate_db(self):
+        """ Truncates the entire database (makes it empty). """
+
+        return self._write('/truncate-db')
+
+    def pipeline(self):
+        """
+            Returns a Pipeline of operations sent together, e.g.:
+
+                with client.pipeline() as pipeline:
+                    pipeline.set('key', 1)
+                    pipeline.get('other')
+                results = pipeline.results
+        """
+
+        return Pipeline(self)
+
+
+class Pipeline(object):
+    """
+        Queue of get(), set() and remove() operations of a PupDBClient,
+        sent by execute() with a single multi-key request for each run of
+        consecutive operations of the same kind (and ttl), in order.
+    """
+
+    def __init__(self, client):
+        """ Initializes an empty pipeline of the client. """
+
+        self.client = client
+        self._operations = []
+        self.results = None
+
+    def __enter__(self):
+        """ Returns the pipeline, executed when leaving the with block. """
+
+        return self
+
+    def __exit__(self, exc_type, exc_value, exc_traceback):
+        """ Executes the pipeline, unless the with block raised. """
+
+        if exc_type is None:
+            self.execute()
+
+    def get(self, key):
+        """ Queues a get() of the key. """
+
+        self._operations.append(('get', None, str(key), None))
+        return self
+
+    def set(self, key, val, ttl=None):
+        """ Queues a set() of the key. """
+
+        self._operations.append(('set', ttl, str(key), val))
+        return self
+
+    def remove(self, key):
+        """ Queues a remove() of the key. """
+
+        self._operations.append(('remove', None, str(key), None))
+        return self
+
+    def execute(self):
+        """
+            Sends the queued operations, and returns the list of their
+            results, as returned by the methods of PupDBClient. A remove()
+            of a missing key raises a KeyError, after the operations
+            before its run are sent.
+        """
+
+        operations, self._operations = self._operations, []
+        results = []
+        start = 0
+        while start < len(operations):
+            kind, ttl = operations[start][:2]
+            end = start
+            while end < len(operations) and \
+                    operations[end][:2] == (kind, ttl):
+                end += 1
+            keys = [operation[2] for operation in operations[start:end]]
+            if kind == 'get':
+                values = self.client.get_many(keys)
+                results.extend(values[key] for key in keys)
+            elif kind == 'set':
+                result = self.client.set_many(
+                    [operation[2:] for operation in operations[start:end]],
+                    ttl
+                )
+                results.extend([result] * (end - start))
+            else:
+                result = self.client.remove_many(keys)
+                results.extend([result] * (end - start))
+            start = end
+        self.results = results
+        return results
@@ -2,31 +2,361 @@
     Core module containing entrypoint functions for PupDB.
 """
 
+import base64
+import binascii
+import hashlib
 import logging
 import os
 import json
+import stat
+import tempfile
+import threading
+import time
 import traceback
+import weakref
 
-from filelock import FileLock
+from filelock import FileLock, Timeout
+
+from pupdb.expiry import ExpiryIndex
+from pupdb.locks import ReadWriteFileLock
+from pupdb.secondary_index import SecondaryIndex, SecondaryIndexSet
+from pupdb.serializers import detect_serializer, get_serializer
+from pupdb.sorted_keys import SortedKeyDict, prefix_range
+from pupdb.value_cache import ValueCache
 
 logging.basicConfig(
     level=logging.INFO,
     format='%(asctime)s | %(process)d | %(levelname)s | %(message)s'
 )
 
+# os.replace() is not available in Python 2, where os.rename() already
+# replaces the destination on POSIX systems.
+_replace = getattr(os, 'replace', os.rename)
+
+# Marks a key removed in a transaction, or missing.
+_REMOVED = object()
+
+# Number of bytes read from the start of a file to detect its serializer.
+_HEADER_PEEK_SIZE = 64
+
+# Durability levels of the writes to the database files, see PupDB.
+DURABILITY_NONE = 'none'
+DURABILITY_FLUSH = 'flush'
+DURABILITY_FSYNC = 'fsync'
+DURABILITY_FSYNC_DIRSYNC = 'fsync+dirsync'
+DURABILITY_LEVELS = (
+    DURABILITY_NONE, DURABILITY_FLUSH, DURABILITY_FSYNC,
+    DURABILITY_FSYNC_DIRSYNC
+)
+
+# Lock modes of PupDB.
+LOCK_MODE_EXCLUSIVE = 'exclusive'
+LOCK_MODE_SHARED = 'shared'
+LOCK_MODES = (LOCK_MODE_EXCLUSIVE, LOCK_MODE_SHARED)
+
+
+def _file_signature(file_path):
+    """
+        Returns a tuple identifying the current version of a file,
+        or None if the file does not exist.
+    """
+
+    try:
+        file_stat = os.stat(file_path)
+    except OSError:
+        return None
+    return (
+        file_stat.st_ino, file_stat.st_size,
+        getattr(file_stat, 'st_mtime_ns', file_stat.st_mtime)
+    )
+
+
+def _fsync_dir(dir_path):
+    """
+        Flushes the directory entries (e.g. renames) of a directory to disk.
+        Not supported, and skipped, on Windows.
+    """
+
+    if os.name == 'nt':
+        return
+    dir_fd = os.open(dir_path, os.O_RDONLY)
+    try:
+        os.fsync(dir_fd)
+    finally:
+        os.close(dir_fd)
+
+
+def _write_file(file_path, data, durability=DURABILITY_FLUSH):
+    """
+        Writes data to file_path with the given durability level.
+
+        Unless the durability level is 'none', where file_path is rewritten
+        in place, data is written to a temporary file next to file_path
+        which is then renamed over file_path, so that neither a crash nor a
+        concurrent reader ever sees a partially written file.
+    """
+
+    if durability == DURABILITY_NONE:
+        with open(file_path, 'wb') as db_file:
+            db_file.write(data)
+        return
+
+    dir_path, file_name = os.path.split(os.path.abspath(file_path))
+    tmp_fd, tmp_path = tempfile.mkstemp(
+        dir=dir_path, prefix='{}.'.format(file_name), suffix='.tmp'
+    )
+    try:
+        with os.fdopen(tmp_fd, 'wb') as tmp_file:
+            tmp_file.write(data)
+            tmp_file.flush()
+            if durability != DURABILITY_FLUSH:
+                os.fsync(tmp_file.fileno())
+        if os.path.exists(file_path):
+            # mkstemp() creates the file readable by its owner only.
+            os.chmod(tmp_path, stat.S_IMODE(os.stat(file_path).st_mode))
+        _replace(tmp_path, file_path)
+    except Exception:
+        os.remove(tmp_path)
+        raise
+
+    if durability == DURABILITY_FSYNC_DIRSYNC:
+        _fsync_dir(dir_path)
+
+
+def _sweep_periodically(database_ref, interval):
+    """
+        Removes the expired keys of the database every interval seconds,
+        until the PupDB instance (weakly referenced) is garbage collected.
+    """
+
+    while True:
+        time.sleep(interval)
+        database = database_ref()
+        if database is None:
+            return
+        try:
+            database.sweep()
+        except Exception:
+            logging.error(
+                'Error while sweeping DB: %s', traceback.format_exc())
+        del database
+
+
+def encode_cursor(key):
+    """ Returns the opaque scan() cursor continuing after the key. """
+
+    return base64.urlsafe_b64encode(key.encode('utf-8')).decode('ascii')
+
+
+def decode_cursor(cursor):
+    """
+        Returns the key after which a scan() cursor continues.
+        Raises a ValueError if the cursor is invalid.
+    """
+
+    try:
+        key = base64.urlsafe_b64decode(cursor.encode('ascii')).decode('utf-8')
+    except (binascii.Error, UnicodeError, TypeError):
+        key = None
+    # The decoding skips the characters that are not base64.
+    if key is None or encode_cursor(key) != cursor:
+        raise ValueError('Invalid cursor {}'.format(cursor))
+    return key
+
+
+def scan_items(items, cursor=None, limit=100):
+    """
+        Returns a page of at most limit (key, val) pairs from items, an
+        iterable of pairs sorted by key, after the key of the cursor, and
+        the cursor of the next page, None after the last page.
+    """
+
+    if limit < 1:
+        raise ValueError('The scan limit must be positive.')
+
+    last_key = decode_cursor(cursor) if cursor is not None else None
+    page = []
+    for key, val in items:
+        if last_key is not None and key <= last_key:
+            continue
+        if len(page) == limit:
+            return page, encode_cursor(page[-1][0])
+        page.append((key, val))
+    return page, None
+
+
+# pylint: disable=useless-object-inheritance,too-few-public-methods
+class _PendingWrite(object):
+    """ Write waiting in the group commit queue of a PupDB instance. """
+
+    def __init__(self, records):
+        """ Initializes the write of the append log records. """
+
+        self.records = records
+        self.done = False
+        # Stays None if the write failed with an exception.
+        self.result = None
+
 
 # pylint: disable=useless-object-inheritance
 class PupDB(object):
     """ This class represents the core of the PupDB database. """
 
-    def __init__(self, db_file_path):
-        """ Initializes the PupDB database instance. """
+    # pylint: disable=too-many-arguments
+    def __init__(
+            self, db_file_path, append_log=False, auto_compact=True,
+            compact_min_bytes=1024 * 1024, compact_ratio=1.0,
+            background_compaction=True, cache=False,
+            durability=DURABILITY_FLUSH, serializer=None,
+            lock_mode=LOCK_MODE_EXCLUSIVE, sweep_interval=None,
+            value_cache=None, group_commit=False):
+        """
+            Initializes the PupDB database instance.
+
+            If append_log is True, set() and remove() append a record to
+            an append-only log file next to the database file instead of
+            rewriting the whole database file. The log is replayed over
+            the database file (the snapshot) whenever the database is read.
+
+            With auto_compact, the log is compacted into a new snapshot once
+            it is larger than both compact_min_bytes and compact_ratio times
+            the size of the snapshot. The compaction runs in a background
+            thread, unless background_compaction is False.
+
+            If cache is True, the parsed database is kept in memory and
+            only read again from disk when it has been changed, which is
+            detected through a generation counter bumped by every writer
+            and the size/mtime/inode of the database files. Note that
+            values returned by get() etc. are then shared with the cache,
+            so they must not be modified in place.
+
+            The durability level controls the tradeoff between the latency
+            and the safety of writes:
+            - 'none': the database file is rewritten in place. A crash
+              while writing leaves it truncated.
+            - 'flush' (default): the database file is written to a
+              temporary file, which is renamed over it once complete.
+            - 'fsync': the temporary file and the log appends are also
+              fsync()-ed, so that they survive a power loss.
+            - 'fsync+dirsync': the directory is also fsync()-ed after
+              renames and file creations, so that they survive a power
+              loss too.
+            Snapshots of the append log mode are always renamed into place.
+
+            The serializer (see pupdb.serializers) is the name of a
+            serializer, e.g. 'json', 'orjson', 'msgpack' or 'pickle', or a
+            Serializer instance, and sets the format in which the database
+            is written. The format of existing files is detected from their
+            header, and kept if no serializer is given.
+
+            With the 'exclusive' lock_mode (default), reads and writes are
+            serialized by an exclusive file lock. With the 'shared'
+            lock_mode, reads only take a shared lock, so that they run
+            concurrently across threads and processes, while writes still
+            take an exclusive lock. The shared lock_mode requires fcntl,
+            which is not available on Windows.
+
+            Keys set with a ttl expire after it (see set()), and are hidden
+            from reads once expired. They are removed from the database
+            files by the next write of the whole database, by compaction,
+            and by sweep(), which is called every sweep_interval seconds
+            by a background thread if sweep_interval is given.
+
+            The value_cache (see pupdb.value_cache.ValueCache) keeps the
+            values of the keys last read by get() in memory, within its
+            size limits, so that the hot keys are read without reading the
+            database from disk. Cached values are dropped when their keys
+            are written, or all of them when the database file has been
+            rewritten by another instance, as detected for the cache.
+            Unlike cache, it bounds the memory used by the cached values,
+            which must not be modified in place either.
+
+            With group_commit, the set() and remove() calls (and their
+            variants) made concurrently by the threads sharing the instance
+            are written together: the first of them writes the changes of
+            all the waiting threads with a single write of the database,
+            and each call returns once its changes are written.
+        """
+
+        if durability not in DURABILITY_LEVELS:
+            raise ValueError(
+                'Invalid durability {}, expected one of: {}'.format(
+                    durability, ', '.join(DURABILITY_LEVELS)
+                )
+            )
 
         self.db_file_path = db_file_path
         self.process_lock_path = '{}.lock'.format(db_file_path)
-        self.process_lock = FileLock(self.process_lock_path, timeout=-1)
+        if lock_mode == LOCK_MODE_EXCLUSIVE:
+            self.process_lock = FileLock(self.process_lock_path, timeout=-1)
+            self.read_lock = self.process_lock
+        elif lock_mode == LOCK_MODE_SHARED:
+            read_write_lock = ReadWriteFileLock(self.process_lock_path)
+            self.process_lock = read_write_lock.write_lock
+            self.read_lock = read_write_lock.read_lock
+        else:
+            raise ValueError(
+                'Invalid lock mode {}, expected one of: {}'.format(
+                    lock_mode, ', '.join(LOCK_MODES)
+                )
+            )
+        self.lock_mode = lock_mode
+        self.append_log = append_log
+        self.log_file_path = '{}.log'.format(db_file_path)
+        self.compacting_log_file_path = '{}.compacting'.format(
+            self.log_file_path)
+        self.compaction_lock_path = '{}.compact.lock'.format(db_file_path)
+        self.compaction_lock = FileLock(self.compaction_lock_path)
+        self.auto_compact = auto_compact
+        self.compact_min_bytes = compact_min_bytes
+        self.compact_ratio = compact_ratio
+        self.background_compaction = background_compaction
+        self.durability = durability
+        self.serializer = None if serializer is None \
+            else get_serializer(serializer)
+        self._compaction_thread = None
+        # (generation, inode, offset) of the live log, known to end on a
+        # record boundary at offset, see _recover_log().
+        self._log_end = None
+        self.generation_file_path = '{}.gen'.format(db_file_path)
+        self.cache = cache
+        # Guards the cache against concurrent readers in the shared mode.
+        self._cache_lock = threading.RLock()
+        self._cached_database = None
+        self._cached_signature = None
+        self._cached_log_offset = 0
+        self._cached_expiries = None
+        self.expiry_file_path = '{}.expiry'.format(db_file_path)
+        self.index_file_path = '{}.indexes'.format(db_file_path)
+        # Guards the secondary indexes, which are loaded lazily.
+        self._index_lock = threading.RLock()
+        self._index_set = None
+        self._index_signature = None
+        self._index_log_offset = 0
+        self._index_file_signature = None
+        if value_cache is not None and not isinstance(value_cache, ValueCache):
+            raise ValueError('The value_cache must be a ValueCache.')
+        self.value_cache = value_cache
+        # Guards the value cache against concurrent readers.
+        self._value_cache_lock = threading.RLock()
+        self._value_cache_signature = None
+        self._value_cache_log_offset = 0
+        self.group_commit = group_commit
+        # Writes waiting for a group commit, see _commit().
+        self._commit_condition = threading.Condition(threading.Lock())
+        self._commit_queue = []
+        self._committing = False
         self.init_db()
 
+        if sweep_interval is not None:
+            sweeper = threading.Thread(
+                target=_sweep_periodically,
+                args=(weakref.ref(self), sweep_interval),
+                name='pupdb-sweeper'
+            )
+            sweeper.daemon = True
+            sweeper.start()
+
     def __repr__(self):
         """ String representation of this class instance. """
 
@@ -42,42 +372,902 @@ class PupDB(object):
 
         with self.process_lock:
             if not os.path.exists(self.db_file_path):
-                with open(self.db_file_path, 'w') as db_file:
-                    db_file.write(json.dumps({}))
+                with open(self.db_file_path, 'wb') as db_file:
+                    db_file.write(self._writer_serializer().dumps_file({}))
+            if self.append_log:
+                self._recover_log()
         return True
 
-    def _get_database(self):
-        """ Returns the database json object. """
+    def _recover_log(self):
+        """
+            Truncates a partially written record left at the end of the
+            append log (e.g. by a crash), so that new records are not
+            appended to it. Called before every append, it only checks the
+            records appended since the last known record boundary.
+        """
+
+        try:
+            size = os.path.getsize(self.log_file_path)
+        except OSError:
+            self._log_end = None
+            return
+        log_key = self._log_key()
+        offset = 0
+        if self._log_end is not None and self._log_end[:2] == log_key and \
+                self._log_end[2] <= size:
+            offset = self._log_end[2]
+        end = self._complete_log_length(offset) if offset < size else size
+        if end != size:
+            logging.warning(
+                'Discarding %s bytes of incomplete log record in %s.',
+                size - end, self.log_file_path
+            )
+            with open(self.log_file_path, 'rb+') as log_file:
+                log_file.truncate(end)
+        self._log_end = log_key + (end,)
+
+    def _log_key(self):
+        """
+            Returns the (generation, inode) identifying the live log file,
+            as the generation is incremented whenever it is removed.
+        """
+
+        return self._read_generation(), os.stat(self.log_file_path).st_ino
+
+    def _complete_log_length(self, offset=0):
+        """
+            Returns the length of the live append log up to the end of its
+            last complete record, reading it from offset, which must be
+            the end of a record.
+        """
+
+        if not os.path.exists(self.log_file_path):
+            return 0
+        with open(self.log_file_path, 'rb') as log_file:
+            serializer, header_length = detect_serializer(
+                log_file.read(_HEADER_PEEK_SIZE), self.serializer
+            )
+            offset = max(offset, header_length)
+            log_file.seek(offset)
+            data = log_file.read()
+        return offset + serializer.complete_length(data)
+
+    @staticmethod
+    def _apply_record(database, record):
+        """ Applies a single append log record to the database dict. """
+
+        operation = record['op']
+        if operation == 'set':
+            database[record['key']] = record['value']
+        elif operation == 'remove':
+            database.pop(record['key'], None)
+        elif operation == 'clear':
+            database.clear()
+        elif operation == 'expire':
+            # Only changes the expiry time, see ExpiryIndex.
+            pass
+        else:
+            raise ValueError(
+                'Unknown log operation {}'.format(operation)
+            )
+
+    def _writer_serializer(self):
+        """
+            Returns the serializer to write the database with: the one
+            given to the constructor, or else the one of the database file.
+        """
+
+        if self.serializer is not None:
+            return self.serializer
+        try:
+            with open(self.db_file_path, 'rb') as db_file:
+                head = db_file.read(_HEADER_PEEK_SIZE)
+        except IOError:
+            head = b''
+        return detect_serializer(head)[0]
+
+    def _read_log_records(self, log_file_path, offset=0):
+        """
+            Returns the records of an append log file, starting at offset,
+            and the offset after the last record.
+        """
+
+        if not os.path.exists(log_file_path):
+            return [], 0
+        with open(log_file_path, 'rb') as log_file:
+            serializer, header_length = detect_serializer(
+                log_file.read(_HEADER_PEEK_SIZE), self.serializer
+            )
+            offset = max(offset, header_length)
+            log_file.seek(offset)
+            data = log_file.read()
+
+        # An incomplete trailing record of an interrupted write is skipped.
+        records = []
+        read_length = 0
+        for record, read_length in serializer.loads_records(data):
+            records.append(record)
+        return records, offset + read_length
+
+    def _replay_log_file(
+            self, database, log_file_path, offset=0, expiries=None):
+        """
+            Replays the records of an append log file, starting at offset,
+            over the database, and over the expiries (an ExpiryIndex) if
+            given. Returns the offset after the last record.
+        """
+
+        records, offset = self._read_log_records(log_file_path, offset)
+        for record in records:
+            self._apply_record(database, record)
+            if expiries is not None:
+                expiries.apply_record(record)
+        return offset
+
+    def _append_log(self, records):
+        """
+            Appends the records to the append log, in the format of the
+            existing log records.
+        """
 
         with self.process_lock:
-            with open(self.db_file_path, 'r') as db_file:
-                database = json.loads(db_file.read())
-                return database
+            # Another writer may have been killed while appending.
+            self._recover_log()
+            log_file_created = not os.path.exists(self.log_file_path)
+            with open(self.log_file_path, 'ab+') as log_file:
+                log_file.seek(0)
+                head = log_file.read(_HEADER_PEEK_SIZE)
+                if head:
+                    serializer = detect_serializer(head, self.serializer)[0]
+                    data = b''
+                else:
+                    serializer = self._writer_serializer()
+                    data = serializer.header()
+                log_file.write(data + b''.join(
+                    serializer.dumps_record(record) for record in records
+                ))
+                log_file.flush()
+                if self.durability in (
+                        DURABILITY_FSYNC, DURABILITY_FSYNC_DIRSYNC):
+                    os.fsync(log_file.fileno())
+                log_size = log_file.tell()
+            self._log_end = self._log_key() + (log_size,)
+            if log_file_created:
+                self._sync_dir()
+
+        if self.auto_compact and self._needs_compaction(log_size):
+            if self.background_compaction:
+                self._start_background_compaction()
+            else:
+                self.compact(blocking=False)
+        return True
+
+    def _needs_compaction(self, log_size):
+        """ Tells whether the append log has outgrown the snapshot. """
+
+        if log_size < self.compact_min_bytes:
+            return False
+        try:
+            snapshot_size = os.path.getsize(self.db_file_path)
+        except OSError:
+            return False
+        return log_size >= self.compact_ratio * snapshot_size
+
+    def _start_background_compaction(self):
+        """ Starts a compaction thread, unless one is already running. """
+
+        thread = self._compaction_thread
+        if thread is not None and thread.is_alive():
+            return
+        thread = threading.Thread(
+            target=self.compact, kwargs={'blocking': False},
+            name='pupdb-compaction'
+        )
+        thread.daemon = True
+        self._compaction_thread = thread
+        thread.start()
+
+    def compact(self, blocking=True):
+        """
+            Compacts the append log into a new snapshot of the database.
+
+            The log is first moved aside under the process lock, so that
+            writers continue appending to a fresh log and readers replay
+            both logs. The new snapshot is built and written without
+            holding the process lock, and swapped in atomically at the end.
+
+            Returns True if a new snapshot was written. If blocking is False
+            and another compaction is running, returns False immediately.
+        """
+
+        if not self.append_log:
+            return False
+        try:
+            with self.compaction_lock.acquire(timeout=-1 if blocking else 0):
+                return self._compact()
+        except Timeout:
+            return False
 
-    def _flush_database(self, database):
-        """ Flushes/Writes the database changes to disk. """
+    def _compact(self):
+        """ Performs the compaction, see compact(). """
 
         with self.process_lock:
-            with open(self.db_file_path, 'w') as db_file:
-                db_file.write(json.dumps(database))
-                return True
+            if not os.path.exists(self.compacting_log_file_path):
+                # A leftover compacting log means that a previous compaction
+                # was interrupted, so it is folded in first.
+                if not os.path.exists(self.log_file_path) or \
+                        os.path.getsize(self.log_file_path) == 0:
+                    return False
+                if self.cache:
+                    # Brings the cache up to date with the log moved aside.
+                    self._get_database()
+                with self._index_lock:
+                    index_set = self._sync_indexes(save=False)
+                    _replace(
+                        self.log_file_path, self.compacting_log_file_path
+                    )
+                    self._sync_dir()
+                    if index_set is not None:
+                        self._index_signature = self._jsonable_signature()
+                        self._index_log_offset = 0
+                if self._cached_database is not None:
+                    self._cached_signature = self._database_signature()
+                    self._cached_log_offset = 0
+            snapshot_signature = _file_signature(self.db_file_path)
+            with open(self.db_file_path, 'rb') as db_file:
+                snapshot_data = db_file.read()
+            expiries = ExpiryIndex()
+            expiries.load_file(self.expiry_file_path)
 
-    def set(self, key, val):
+        # The compacting log is not written to anymore, so it can be
+        # replayed without holding the process lock.
+        database = self._loads_database(snapshot_data)
+        self._replay_log_file(
+            database, self.compacting_log_file_path, expiries=expiries
+        )
+        self._drop_expired(database, expiries, purge=True)
+        snapshot_data = self._writer_serializer().dumps_file(database)
+
+        with self.process_lock:
+            if _file_signature(self.db_file_path) != snapshot_signature or \
+                    not os.path.exists(self.compacting_log_file_path):
+                # The database was flushed while compacting.
+                return False
+            cache_is_current = self._cached_database is not None and \
+                self._cached_signature == self._database_signature()
+            indexes_are_current = self._index_set is not None and \
+                self._index_signature == self._jsonable_signature()
+            # The expiry times of the expired keys left in the old snapshot
+            # would only be kept a little longer.
+            self._write_expiries(expiries, self._snapshot_durability())
+            _write_file(
+                self.db_file_path, snapshot_data, self._snapshot_durability()
+            )
+            # Replaying the compacting log again over the new snapshot
+            # yields the same database, so a crash before this point
+            # is harmless.
+            os.remove(self.compacting_log_file_path)
+            self._sync_dir()
+            self._bump_generation()
+            # The contents did not change, only the files holding them.
+            if cache_is_current:
+                self._cached_signature = self._database_signature()
+            if indexes_are_current:
+                with self._index_lock:
+                    self._index_signature = self._jsonable_signature()
+                    self._save_indexes()
+        return True
+
+    def _snapshot_durability(self):
         """
-            Sets the value to a key in the database.
-            Overwrites the value if the key already exists.
+            Returns the durability level for snapshots of the append log
+            mode, which are always renamed into place, as the log is only
+            replayed correctly over a complete snapshot.
+        """
+
+        if self.durability == DURABILITY_NONE:
+            return DURABILITY_FLUSH
+        return self.durability
+
+    def _database_durability(self):
+        """
+            Returns the durability level for rewriting the database file.
+            Indexed database files are read through mmap by the instances
+            holding them, which crash if the file is truncated in place, so
+            they are always renamed into place like snapshots.
+        """
+
+        if self.durability != DURABILITY_NONE:
+            return self.durability
+        try:
+            with open(self.db_file_path, 'rb') as db_file:
+                head = db_file.read(_HEADER_PEEK_SIZE)
+        except IOError:
+            head = b''
+        names = (self._writer_serializer().name,
+                 detect_serializer(head)[0].name)
+        if 'indexed' in names:
+            return self._snapshot_durability()
+        return self.durability
+
+    def _sync_dir(self):
+        """
+            Flushes the directory entries of the database directory to disk,
+            if required by the durability level.
+        """
+
+        if self.durability == DURABILITY_FSYNC_DIRSYNC:
+            _fsync_dir(os.path.dirname(os.path.abspath(self.db_file_path)))
+
+    def _read_generation(self):
+        """ Returns the generation counter of the database. """
+
+        try:
+            with open(self.generation_file_path, 'r') as generation_file:
+                return int(generation_file.read() or 0)
+        except (IOError, ValueError):
+            return 0
+
+    def _bump_generation(self):
+        """
+            Increments the generation counter of the database, which tells
+            cached readers that the database file has been rewritten.
+        """
+
+        generation = self._read_generation() + 1
+        with open(self.generation_file_path, 'w') as generation_file:
+            generation_file.write(str(generation))
+        return generation
+
+    def _database_signature(self):
+        """
+            Returns a tuple identifying the current version of the database
+            files. Records appended to the live log do not change it.
+        """
+
+        signature = (
+            self._read_generation(), _file_signature(self.db_file_path)
+        )
+        if self.append_log:
+            log_signature = _file_signature(self.log_file_path)
+            signature += (
+                _file_signature(self.compacting_log_file_path),
+                log_signature and log_signature[0]
+            )
+        return signature
+
+    def _invalidate_cache(self):
+        """ Drops the cached database. """
+
+        self._cached_database = None
+        self._cached_expiries = None
+        self._cached_signature = None
+        self._cached_log_offset = 0
+
+    def _loads_database(self, data):
+        """ Deserializes the contents of a database file. """
+
+        serializer, header_length = detect_serializer(
+            data[:_HEADER_PEEK_SIZE], self.serializer
+        )
+        if header_length:
+            data = data[header_length:]
+        return serializer.loads(data)
+
+    def _load_database(self, expiries=None):
+        """
+            Reads the database from disk, and its expiry times into the
+            expiries (an ExpiryIndex) if given. Returns the database and
+            the offset in the live log up to which it has been replayed.
+        """
+
+        with open(self.db_file_path, 'rb') as db_file:
+            head = db_file.read(_HEADER_PEEK_SIZE)
+        serializer, header_length = detect_serializer(head, self.serializer)
+        database = serializer.load_file(self.db_file_path, header_length)
+        if expiries is not None:
+            expiries.load_file(self.expiry_file_path)
+        log_offset = 0
+        if self.append_log:
+            self._replay_log_file(
+                database, self.compacting_log_file_path, expiries=expiries
+            )
+            log_offset = self._replay_log_file(
+                database, self.log_file_path, expiries=expiries
+            )
+        return database, log_offset
+
+    def _get_database(self):
+        """ Returns the database json object, without the expired keys. """
+
+        return self._get_database_with_expiries()[0]
+
+    def _get_database_with_expiries(self):
+        """
+            Returns the database, without the expired keys, and the
+            ExpiryIndex of its keys.
+        """
+
+        with self.read_lock:
+            if not self.cache:
+                expiries = ExpiryIndex()
+                database = self._load_database(expiries)[0]
+                self._drop_expired(database, expiries)
+                return database, expiries
+
+            with self._cache_lock:
+                database = self._get_cached_database()
+                self._drop_expired(database, self._cached_expiries)
+                return database, self._cached_expiries
+
+    @staticmethod
+    def _drop_expired(database, expiries, purge=False):
+        """
+            Removes the expired keys from the database in memory, and from
+            the expiries too if purge is True, so that they are removed
+            from the database files when they are written. Returns the
+            expired keys.
+        """
+
+        expired = expiries.expired(time.time())
+        for key in expired:
+            database.pop(key, None)
+            if purge:
+                expiries.remove(key)
+        return expired
+
+    def _write_expiries(self, expiries, durability):
+        """ Writes the expiry file of the database file being written. """
+
+        if expiries is not None and len(expiries):
+            _write_file(self.expiry_file_path, expiries.dumps(), durability)
+        elif os.path.exists(self.expiry_file_path):
+            os.remove(self.expiry_file_path)
+
+    def _get_cached_database(self):
+        """
+            Returns the cached database, after reading the changes since
+            it was cached.
         """
 
         try:
-            database = self._get_database()
-            database[key] = val
-            self._flush_database(database)
+            signature = self._database_signature()
+            if self._cached_database is None or \
+                    signature != self._cached_signature:
+                expiries = ExpiryIndex()
+                database, self._cached_log_offset = \
+                    self._load_database(expiries)
+                if isinstance(database, dict):
+                    database = SortedKeyDict(database)
+                self._cached_database = database
+                self._cached_expiries = expiries
+                self._cached_signature = signature
+            elif self.append_log:
+                # Only the records appended since the last read.
+                self._cached_log_offset = self._replay_log_file(
+                    self._cached_database, self.log_file_path,
+                    self._cached_log_offset, self._cached_expiries
+                )
         except Exception:
-            logging.error(
-                'Error while writing to DB: %s', traceback.format_exc())
-            return False
+            self._invalidate_cache()
+            raise
+        return self._cached_database
+
+    def _flush_database(self, database, expiries=None):
+        """
+            Flushes/Writes the database changes to disk, along with the
+            expiry times of its keys (an ExpiryIndex, None for none).
+            In append log mode, the written database file becomes the new
+            snapshot and the append log is emptied.
+        """
+
+        with self.process_lock:
+            try:
+                # Serialized before the database file gets truncated.
+                data = self._writer_serializer().dumps_file(database)
+                if self.append_log:
+                    self._write_expiries(
+                        expiries, self._snapshot_durability()
+                    )
+                    _write_file(
+                        self.db_file_path, data, self._snapshot_durability()
+                    )
+                    for log_file_path in (
+                            self.compacting_log_file_path, self.log_file_path):
+                        if os.path.exists(log_file_path):
+                            os.remove(log_file_path)
+                    self._sync_dir()
+                else:
+                    durability = self._database_durability()
+                    self._write_expiries(expiries, durability)
+                    _write_file(self.db_file_path, data, durability)
+                self._bump_generation()
+            except Exception:
+                self._invalidate_cache()
+                raise
+
+            if self.cache and isinstance(database, dict):
+                if not isinstance(database, SortedKeyDict):
+                    database = SortedKeyDict(database)
+                self._cached_database = database
+                self._cached_expiries = expiries if expiries is not None \
+                    else ExpiryIndex()
+                self._cached_signature = self._database_signature()
+                self._cached_log_offset = 0
+            else:
+                # Lazily loaded databases are cheaper to map again from the
+                # new file than to keep with all their changes in memory.
+                self._invalidate_cache()
+            return True
+
+    def _write_records(self, records, database=None, expiries=None):
+        """
+            Applies the append log records (see _apply_record()) to the
+            database with a single write: one append to the log in append
+            log mode, or one read and one flush of the database file.
+            The database and expiries, if given, are the ones returned by
+            _get_database_with_expiries() while holding the process lock,
+            which are then not read again.
+        """
+
+        with self.process_lock:
+            if self.append_log:
+                # The indexes are updated from the log when next queried.
+                return self._append_log(records)
+            with self._index_lock, self._value_cache_lock:
+                if self.value_cache is not None:
+                    # Only the values written below are dropped after the
+                    # flush, if no other instance wrote since last synced.
+                    self._sync_value_cache()
+                index_set = self._sync_indexes(save=False)
+                if database is None:
+                    database, expiries = self._get_database_with_expiries()
+                # The expired keys are removed from the files.
+                expired = self._drop_expired(database, expiries, purge=True)
+                for record in records:
+                    self._apply_record(database, record)
+                    expiries.apply_record(record)
+                self._flush_database(database, expiries)
+                if self.value_cache is not None:
+                    for record in records:
+                        self.value_cache.apply_record(record)
+                    self._value_cache_signature = self._database_signature()
+                if index_set is not None:
+                    for key in expired:
+                        index_set.pop(key)
+                    for record in records:
+                        self._apply_record(index_set, record)
+                    self._index_signature = self._jsonable_signature()
+                    self._save_indexes()
+            return True
+
+    def _write_batch(self, requests):
+        """
+            Writes the requests, lists of append log records (see
+            _apply_record()), with a single write of the database. A request
+            removing a missing key fails with a KeyError, without writing
+            any of its records. Returns the result of each request: True,
+            False if the write failed, or the KeyError.
+        """
+
+        results = []
+        records = []
+        with self.process_lock:
+            database = expiries = None
+            # Whether the keys exist after the requests of the batch so far.
+            exists = {}
+            for request in requests:
+                removed = [
+                    record['key'] for record in request
+                    if record['op'] == 'remove'
+                ]
+                if removed and database is None:
+                    database, expiries = self._get_database_with_expiries()
+                missing = [
+                    key for key in removed
+                    if not exists.get(key, key in database)
+                ]
+                if missing:
+                    results.append(KeyError(
+                        'Non-existent Key {} in database'.format(missing[0])
+                    ))
+                    continue
+                for record in request:
+                    exists[record['key']] = record['op'] == 'set'
+                records.extend(request)
+                results.append(True)
+
+            if records:
+                try:
+                    self._write_records(records, database, expiries)
+                except Exception:
+                    logging.error(
+                        'Error while writing to DB: %s',
+                        traceback.format_exc()
+                    )
+                    results = [
+                        False if result is True else result
+                        for result in results
+                    ]
+        return results
+
+    def _commit(self, records):
+        """
+            Writes the records, like _write_batch(), and returns their
+            result, raising it if it is an exception.
+
+            In group commit mode, the records queued by concurrent threads
+            are written by the first of them, with a single write, while
+            the others wait for it to be done. Threads already holding the
+            process lock write directly, as the writing thread would wait
+            for them.
+        """
+
+        if not self.group_commit or self.process_lock.is_locked:
+            result = self._write_batch([records])[0]
+        else:
+            pending = _PendingWrite(records)
+            with self._commit_condition:
+                self._commit_queue.append(pending)
+                while self._committing and not pending.done:
+                    self._commit_condition.wait()
+                if not pending.done:
+                    self._committing = True
+                    batch, self._commit_queue = self._commit_queue, []
+            if not pending.done:
+                self._commit_batch(batch)
+            result = pending.result
+
+        if isinstance(result, Exception):
+            raise result
+        return result
+
+    def _commit_batch(self, batch):
+        """ Writes a batch of pending writes of the group commit queue. """
+
+        results = None
+        try:
+            results = self._write_batch([pending.records for pending in batch])
+        except Exception as exc:
+            results = [exc] * len(batch)
+            raise
+        finally:
+            with self._commit_condition:
+                for pending, result in zip(batch, results or []):
+                    pending.result = result
+                for pending in batch:
+                    pending.done = True
+                self._committing = False
+                self._commit_condition.notify_all()
+
+    def _jsonable_signature(self):
+        """ Returns the database signature, as persisted with the indexes. """
+
+        return json.loads(json.dumps(self._database_signature()))
+
+    def _sync_indexes(self, save=True):
+        """
+            Brings the secondary indexes up to date with the database, and
+            returns them, or None if there are none. Called with the read
+            lock or the process lock held.
+
+            The indexes are read from the index file if it has been written
+            since they were last read. They are then updated from the
+            records appended to the log, or else rebuilt from the database
+            if it has been rewritten, in which case they are persisted again
+            if save is True.
+        """
+
+        with self._index_lock:
+            file_signature = _file_signature(self.index_file_path)
+            if file_signature is None:
+                self._index_set = None
+                self._index_file_signature = None
+                return None
+
+            if file_signature != self._index_file_signature:
+                with open(self.index_file_path, 'rb') as index_file:
+                    state = json.loads(index_file.read().decode('utf-8'))
+                self._index_set = SecondaryIndexSet()
+                self._index_set.loads(state['indexes'])
+                self._index_signature = state['signature']
+                self._index_log_offset = state['log_offset']
+                self._index_file_signature = file_signature
+
+            signature = self._jsonable_signature()
+            if self.append_log and not self._index_log_offset and \
+                    len(signature) == len(self._index_signature) and \
+                    self._index_signature[-1] is None:
+                # The live log was created since, and is replayed in full.
+                self._index_signature[-1] = signature[-1]
+            if signature != self._index_signature:
+                database, log_offset = self._load_database()
+                self._index_set.build(database)
+                self._index_signature = signature
+                self._index_log_offset = log_offset
+                if save:
+                    self._save_indexes()
+            elif self.append_log:
+                self._index_log_offset = self._replay_log_file(
+                    self._index_set, self.log_file_path,
+                    self._index_log_offset
+                )
+            return self._index_set
+
+    def _save_indexes(self):
+        """ Persists the secondary indexes to the index file. """
+
+        data = json.dumps({
+            'signature': self._index_signature,
+            'log_offset': self._index_log_offset,
+            'indexes': self._index_set.dumps()
+        }).encode('utf-8')
+        _write_file(self.index_file_path, data, self._snapshot_durability())
+        self._index_file_signature = _file_signature(self.index_file_path)
+
+    def create_index(self, field):
+        """
+            Creates a persistent secondary index on a field of the json
+            object values of the database, given as a dotted path, e.g.
+            'address.city'. The index is kept up to date by all writers,
+            and used by find() and find_range().
+
+            Returns False if the field is already indexed.
+        """
+
+        with self.process_lock:
+            with self._index_lock:
+                index_set = self._sync_indexes(save=False)
+                if index_set is not None and field in index_set.indexes:
+                    return False
+                database, log_offset = self._load_database()
+                if index_set is None:
+                    index_set = self._index_set = SecondaryIndexSet()
+                    self._index_signature = self._jsonable_signature()
+                    self._index_log_offset = log_offset
+                index_set.indexes[field] = SecondaryIndex(field)
+                index_set.indexes[field].build(database.items())
+                self._save_indexes()
+        return True
+
+    def drop_index(self, field):
+        """
+            Removes the secondary index on a field. Raises a KeyError if
+            the field is not indexed.
+        """
+
+        with self.process_lock:
+            with self._index_lock:
+                index_set = self._sync_indexes(save=False)
+                if index_set is None or field not in index_set.indexes:
+                    raise KeyError(field)
+                del index_set.indexes[field]
+                if index_set.indexes:
+                    self._save_indexes()
+                else:
+                    os.remove(self.index_file_path)
+                    self._index_set = None
+                    self._index_file_signature = None
         return True
 
+    def indexes(self):
+        """ Returns the sorted list of the indexed fields. """
+
+        with self.read_lock:
+            index_set = self._sync_indexes()
+        return sorted(index_set.indexes) if index_set is not None else []
+
+    def _get_index(self, field):
+        """
+            Returns the up to date secondary index of a field. Raises a
+            ValueError if the field is not indexed.
+        """
+
+        index_set = self._sync_indexes()
+        if index_set is None or field not in index_set.indexes:
+            raise ValueError('No index on the field {}'.format(field))
+        return index_set.indexes[field]
+
+    def find(self, *args, **kwargs):
+        """
+            Returns the list of (key, val) pairs, sorted by key, whose
+            values have all the given fields equal to the given values,
+            which are passed like the arguments of dict(), e.g.:
+
+                database.find(status='active')
+                database.find({'address.city': 'Paris', 'status': 'active'})
+
+            All the fields must be indexed, see create_index(), otherwise
+            a ValueError is raised.
+        """
+
+        criteria = dict(*args, **kwargs)
+        if not criteria:
+            raise ValueError('No field to find.')
+
+        with self.read_lock:
+            with self._index_lock:
+                keys = None
+                for field, value in criteria.items():
+                    field_keys = self._get_index(field).find(value)
+                    keys = set(field_keys) if keys is None \
+                        else keys & field_keys
+            return self._get_items(sorted(keys))
+
+    def find_range(self, field, start=None, stop=None):
+        """
+            Returns the list of (key, val) pairs, sorted by field and key,
+            whose values have the indexed field in the range
+            start <= field < stop. Either bound can be None, and the bounds
+            must be both numbers or both strings, only compared to fields
+            of the same type. Raises a ValueError if the field is not
+            indexed.
+        """
+
+        with self.read_lock:
+            with self._index_lock:
+                keys = self._get_index(field).find_range(start, stop)
+            return self._get_items(keys)
+
+    def _get_items(self, keys):
+        """ Returns the list of (key, val) pairs of the existing keys. """
+
+        database = self._get_database()
+        items = []
+        for key in keys:
+            val = database.get(key, _REMOVED)
+            if val is not _REMOVED:
+                items.append((key, val))
+        return items
+
+    def set(self, key, val, ttl=None):
+        """
+            Sets the value to a key in the database.
+            Overwrites the value if the key already exists.
+
+            If ttl is given, the key expires after ttl seconds, otherwise
+            it doesn't expire, even if it was set with a ttl before.
+        """
+
+        return self.set_many({key: val}, ttl)
+
+    def set_many(self, mapping, ttl=None):
+        """
+            Sets the values of multiple keys in the database at once.
+            Accepts a dict or an iterable of (key, val) pairs.
+            The keys expire after ttl seconds if given, see set().
+        """
+
+        return self._commit(self._set_records(mapping, ttl))
+
+    @staticmethod
+    def _set_records(mapping, ttl=None):
+        """
+            Returns the records setting the values of a dict or an iterable
+            of (key, val) pairs, expiring after ttl seconds if given.
+        """
+
+        if isinstance(mapping, dict):
+            mapping = mapping.items()
+        records = [
+            {'op': 'set', 'key': str(key), 'value': val}
+            for key, val in mapping
+        ]
+        if ttl is not None:
+            expires = time.time() + ttl
+            for record in records:
+                record['expires'] = expires
+        return records
+
+    def update(self, *args, **kwargs):
+        """
+            Updates the database with the key/value pairs from a dict or an
+            iterable of (key, val) pairs and/or keyword arguments,
+            like dict.update().
+        """
+
+        return self.set_many(dict(*args, **kwargs))
+
     def get(self, key):
         """
             Gets the value of a key from the database.
@@ -85,61 +1275,544 @@ class PupDB(object):
         """
 
         key = str(key)
+        if self.value_cache is not None:
+            return self._get_cached_values([key])[key]
         database = self._get_database()
         return database.get(key, None)
 
-    def remove(self, key):
+    def get_many(self, keys):
         """
-            Removes a key from the database.
+            Gets the values of multiple keys from the database at once,
+            with a single read of the database. Returns a dict of the
+            values by key, None for the keys not found in the database.
         """
 
-        key = str(key)
+        keys = [str(key) for key in keys]
+        if self.value_cache is not None:
+            return self._get_cached_values(keys)
         database = self._get_database()
-        if key not in database:
-            raise KeyError(
-                'Non-existent Key {} in database'.format(key)
+        return {key: database.get(key, None) for key in keys}
+
+    def _sync_value_cache(self):
+        """
+            Drops the cached values changed since the value cache was last
+            synced: all of them if the database file has been rewritten, or
+            those of the records appended to the live log since. Called with
+            the read lock or the process lock, and the value cache lock held.
+        """
+
+        signature = self._database_signature()
+        if signature != self._value_cache_signature:
+            self.value_cache.clear()
+            self._value_cache_signature = signature
+            self._value_cache_log_offset = self._complete_log_length() \
+                if self.append_log else 0
+        elif self.append_log:
+            records, self._value_cache_log_offset = self._read_log_records(
+                self.log_file_path, self._value_cache_log_offset
             )
-        del database[key]
+            for record in records:
+                self.value_cache.apply_record(record)
 
-        try:
-            self._flush_database(database)
-        except Exception:
-            logging.error(
-                'Error while writing to DB: %s', traceback.format_exc())
-            return False
+    def _get_cached_values(self, keys):
+        """
+            Gets the values of the keys from the value cache, or else from
+            the database, read once for all of them, caching them. Missing
+            keys are cached as None too.
+        """
+
+        with self.read_lock:
+            with self._value_cache_lock:
+                self._sync_value_cache()
+                now = time.time()
+                values = {}
+                missed = []
+                for key in keys:
+                    found, val = self.value_cache.get(key, now)
+                    if found:
+                        values[key] = val
+                    else:
+                        missed.append(key)
+                if missed:
+                    database, expiries = self._get_database_with_expiries()
+                    for key in missed:
+                        values[key] = database.get(key, None)
+                        self.value_cache.put(
+                            key, values[key], expiries.get(key)
+                        )
+                return values
+
+    def value_cache_stats(self):
+        """
+            Returns the hit/miss/eviction/invalidation counters and the
+            size of the value cache, or None if there is no value cache.
+        """
+
+        if self.value_cache is None:
+            return None
+        with self._value_cache_lock:
+            return self.value_cache.stats()
+
+    def expire(self, key, ttl):
+        """
+            Sets the key to expire after ttl seconds, or to never expire if
+            ttl is None. Raises a KeyError if the key is not found in the
+            database.
+        """
+
+        key = str(key)
+        with self.process_lock:
+            if key not in self._get_database():
+                raise KeyError('Non-existent Key {} in database'.format(key))
+
+            try:
+                self._write_records([{
+                    'op': 'expire', 'key': key,
+                    'expires': None if ttl is None else time.time() + ttl
+                }])
+            except Exception:
+                logging.error(
+                    'Error while writing to DB: %s', traceback.format_exc())
+                return False
         return True
 
-    def keys(self):
+    def ttl(self, key):
         """
-            Returns a list (py27) or iterator (py3) of all the keys
+            Returns the number of seconds before the key expires, or None
+            if it doesn't expire. Raises a KeyError if the key is not found
             in the database.
         """
 
-        return self._get_database().keys()
+        key = str(key)
+        database, expiries = self._get_database_with_expiries()
+        if key not in database:
+            raise KeyError('Non-existent Key {} in database'.format(key))
+        expires = expiries.get(key)
+        if expires is None:
+            return None
+        return max(expires - time.time(), 0)
+
+    def sweep(self):
+        """
+            Removes the expired keys from the database files, which are
+            otherwise only hidden from reads until the next write of the
+            whole database. Returns the number of removed keys.
+        """
+
+        with self.process_lock:
+            expiries = self._get_database_with_expiries()[1]
+            expired = expiries.expired(time.time())
+            if expired:
+                self._write_records(
+                    [{'op': 'remove', 'key': key} for key in expired]
+                )
+        return len(expired)
+
+    def remove(self, key):
+        """
+            Removes a key from the database.
+        """
+
+        return self.remove_many([key])
+
+    def remove_many(self, keys):
+        """
+            Removes multiple keys from the database at once.
+            Raises a KeyError, without removing any key, if one of the keys
+            is not found in the database.
+        """
+
+        return self._commit(
+            [{'op': 'remove', 'key': str(key)} for key in keys]
+        )
+
+    def keys(self):
+        """
+            Returns a list (py27, or with the read cache) or iterator
+            (py3) of all the keys in the database.
+        """
+
+        return self._copy_if_cached(self._get_database().keys())
 
     def values(self):
         """
-            Returns a list (py27) or iterator (py3) of all the values
-            in the database.
+            Returns a list (py27, or with the read cache) or iterator
+            (py3) of all the values in the database.
         """
 
-        return self._get_database().values()
+        return self._copy_if_cached(self._get_database().values())
 
     def items(self):
         """
-            Returns a list (py27) or iterator (py3) of all the items i.e.
-            (key, val) pairs in the database.
+            Returns a list (py27, or with the read cache) or iterator
+            (py3) of all the items i.e. (key, val) pairs in the database.
+        """
+
+        return self._copy_if_cached(self._get_database().items())
+
+    def _copy_if_cached(self, view):
+        """
+            Returns a list of the elements of a view of the database with
+            the read cache, whose database is changed in place by the
+            writes, so that they can be made while iterating. Returns the
+            view otherwise.
+        """
+
+        if self.cache:
+            return list(view)
+        return view
+
+    @staticmethod
+    def _iter_database_keys(database, prefix, start, stop):
+        """
+            Yields the keys of database matching the filters, sorted.
+            The range of the keys is looked up in the sorted key index of
+            the database if it has one (see SortedKeyDict.irange()), and
+            the matching keys are sorted otherwise.
+        """
+
+        if prefix is not None:
+            prefix_start, prefix_stop = prefix_range(prefix)
+            if start is None or start < prefix_start:
+                start = prefix_start
+            if prefix_stop is not None and \
+                    (stop is None or stop > prefix_stop):
+                stop = prefix_stop
+        if start is not None and stop is not None and start >= stop:
+            return
+
+        if hasattr(database, 'irange'):
+            keys = database.irange(start, stop)
+        else:
+            # Sorting copies the keys, as the database can change while
+            # iterating. Values are left in the database.
+            keys = sorted(
+                key for key in database
+                if (start is None or key >= start) and
+                (stop is None or key < stop)
+            )
+        for key in keys:
+            if prefix is None or key.startswith(prefix):
+                yield key
+
+    def iter_keys(self, prefix=None, start=None, stop=None):
+        """
+            Returns an iterator over the keys in the database sorted by key,
+            optionally only those starting with prefix and/or in the range
+            start <= key < stop.
+        """
+
+        return self._iter_database_keys(
+            self._get_database(), prefix, start, stop
+        )
+
+    def iter_values(self, prefix=None, start=None, stop=None):
+        """
+            Returns an iterator over the values in the database sorted by
+            key, filtered like iter_keys().
         """
 
-        return self._get_database().items()
+        for _, val in self.iter_items(prefix, start, stop):
+            yield val
+
+    def iter_items(self, prefix=None, start=None, stop=None):
+        """
+            Returns an iterator over the (key, val) pairs in the database
+            sorted by key, filtered like iter_keys(). The values of indexed
+            databases are only decoded as they are iterated.
+        """
+
+        database = self._get_database()
+        for key in self._iter_database_keys(database, prefix, start, stop):
+            val = database.get(key, _REMOVED)
+            if val is not _REMOVED:
+                yield key, val
+
+    def range(self, start=None, stop=None):
+        """
+            Returns an iterator over the (key, val) pairs with
+            start <= key < stop, sorted by key. Either bound can be None.
+        """
+
+        return self.iter_items(start=start, stop=stop)
+
+    def prefix(self, prefix):
+        """
+            Returns an iterator over the (key, val) pairs whose key starts
+            with prefix, e.g. 'user:123:', sorted by key.
+        """
+
+        return self.iter_items(prefix=prefix)
+
+    def scan(self, cursor=None, limit=100, prefix=None):
+        """
+            Returns a page of at most limit (key, val) pairs of the database
+            sorted by key, optionally only for keys starting with prefix,
+            and an opaque cursor to pass to the next call to get the next
+            page, or None after the last page. The first page is returned
+            without a cursor.
+
+            Pages are not a snapshot of the database: keys set after the
+            cursor are returned by later pages, whatever the writes in the
+            meantime.
+        """
+
+        start = decode_cursor(cursor) if cursor is not None else None
+        return scan_items(
+            self.iter_items(prefix=prefix, start=start), cursor, limit
+        )
 
     def dumps(self):
         """ Returns a string dump of the entire database sorted by key. """
 
-        return json.dumps(self._get_database(), sort_keys=True)
+        database = self._get_database()
+        if not isinstance(database, dict):
+            database = dict(database)
+        return json.dumps(database, sort_keys=True)
+
+    def version(self):
+        """
+            Returns an opaque string identifying the current contents of
+            the database, which changes with every write (from any process)
+            and whenever keys expire, e.g. for HTTP ETags. With the read
+            cache, the database is only read again if it has changed.
+        """
+
+        with self.read_lock:
+            signature = self._database_signature()
+            if self.append_log:
+                signature += (_file_signature(self.log_file_path),)
+            # Between writes, the contents only change by keys expiring.
+            signature += (len(self._get_database()),)
+        return hashlib.sha1(repr(signature).encode('utf-8')).hexdigest()
+
+    def export(self, file_path, serializer='json'):
+        """
+            Writes a copy of the database to file_path, in the format of
+            the serializer, e.g. to export an indexed database to json.
+        """
+
+        data = get_serializer(serializer).dumps_file(self._get_database())
+        _write_file(file_path, data, self._snapshot_durability())
+        return True
+
+    def migrate(self, serializer):
+        """
+            Rewrites the database file in the format of the serializer,
+            which is then used for all further writes.
+        """
+
+        with self.process_lock:
+            self.serializer = get_serializer(serializer)
+            database, expiries = self._get_database_with_expiries()
+            self._drop_expired(database, expiries, purge=True)
+            return self._flush_database(database, expiries)
+
+    def transaction(self):
+        """
+            Returns a Transaction, to be used as a context manager, which
+            holds the process lock from the read of the database until
+            its changes are written.
+        """
+
+        return Transaction(self)
 
     def truncate_db(self):
         """ Truncates the entire database (makes it empty). """
 
-        self._flush_database({})
+        if self.append_log:
+            self._write_records([{'op': 'clear'}])
+        else:
+            self._flush_database({})
+        return True
+
+
+# pylint: disable=protected-access
+class Transaction(object):
+    """
+        This class represents a read-modify-write transaction on a PupDB
+        database, e.g.:
+
+            with database.transaction() as txn:
+                txn.set('counter', txn.get('counter', 0) + 1)
+
+        The process lock is held for the whole with block, the database is
+        read once when entering it, and the changes are written with a
+        single write when leaving it. If the block raises an exception,
+        the changes are discarded.
+    """
+
+    def __init__(self, database):
+        """ Initializes the transaction on the PupDB instance. """
+
+        self.database = database
+        self._snapshot = None
+        self._expiries = None
+        self._changes = {}
+        self._cleared = False
+
+    def __enter__(self):
+        """ Acquires the process lock and reads the database. """
+
+        self.database.process_lock.acquire()
+        try:
+            self._snapshot, self._expiries = \
+                self.database._get_database_with_expiries()
+        except Exception:
+            self.database.process_lock.release()
+            raise
+        self._changes = {}
+        self._cleared = False
+        return self
+
+    def __exit__(self, exc_type, exc_value, exc_traceback):
+        """ Writes the changes, unless an exception was raised. """
+
+        try:
+            if exc_type is None:
+                self._write()
+        finally:
+            self._snapshot = self._expiries = None
+            self.database.process_lock.release()
+
+    def _records(self):
+        """ Returns the append log records for the changes. """
+
+        records = [{'op': 'clear'}] if self._cleared else []
+        for key, val in self._changes.items():
+            if val is _REMOVED:
+                records.append({'op': 'remove', 'key': key})
+            else:
+                records.append({'op': 'set', 'key': key, 'value': val})
+        return records
+
+    def _write(self):
+        """ Writes the changes to the database. """
+
+        records = self._records()
+        if records:
+            # Outside append log mode, the records are applied to the
+            # snapshot, which is not read again.
+            self.database._write_records(
+                records, self._snapshot, self._expiries
+            )
+        self._changes = {}
+        self._cleared = False
+        return bool(records)
+
+    def commit(self):
+        """
+            Writes the changes made so far to the database, without leaving
+            the transaction.
+        """
+
+        if self._write() and self.database.append_log:
+            self._snapshot, self._expiries = \
+                self.database._get_database_with_expiries()
         return True
+
+    def _current(self):
+        """ Returns a dict of the database including the changes. """
+
+        database = {} if self._cleared else dict(self._snapshot)
+        for key, val in self._changes.items():
+            if val is _REMOVED:
+                database.pop(key, None)
+            else:
+                database[key] = val
+        return database
+
+    def get(self, key, default=None):
+        """
+            Gets the value of a key, as changed by this transaction.
+            Returns default if the key is not found.
+        """
+
+        key = str(key)
+        if key in self._changes:
+            val = self._changes[key]
+            return default if val is _REMOVED else val
+        if self._cleared:
+            return default
+        return self._snapshot.get(key, default)
+
+    def set(self, key, val):
+        """ Sets the value to a key when the transaction is committed. """
+
+        self._changes[str(key)] = val
+
+    def set_many(self, mapping):
+        """ Sets the values of multiple keys, see PupDB.set_many(). """
+
+        if isinstance(mapping, dict):
+            mapping = mapping.items()
+        for key, val in mapping:
+            self.set(key, val)
+
+    def update(self, *args, **kwargs):
+        """ Sets the values of multiple keys, like dict.update(). """
+
+        self.set_many(dict(*args, **kwargs))
+
+    def remove(self, key):
+        """
+            Removes a key when the transaction is committed.
+            Raises a KeyError if the key is not found.
+        """
+
+        if key not in self:
+            raise KeyError(
+                'Non-existent Key {} in database'.format(key)
+            )
+        self._changes[str(key)] = _REMOVED
+
+    def truncate_db(self):
+        """ Removes all keys when the transaction is committed. """
+
+        self._cleared = True
+        self._changes = {}
+
+    def __contains__(self, key):
+        """ Tells whether the key exists, as changed by this transaction. """
+
+        return self.get(key, _REMOVED) is not _REMOVED
+
+    def __getitem__(self, key):
+        """ Gets the value of a key, raising a KeyError if not found. """
+
+        val = self.get(key, _REMOVED)
+        if val is _REMOVED:
+            raise KeyError(
+                'Non-existent Key {} in database'.format(key)
+            )
+        return val
+
+    def __setitem__(self, key, val):
+        """ Same as set(). """
+
+        self.set(key, val)
+
+    def __delitem__(self, key):
+        """ Same as remove(). """
+
+        self.remove(key)
+
+    def __len__(self):
+        """ Returns the number of keys, as changed by this transaction. """
+
+        return len(self._current())
+
+    def keys(self):
+        """ Returns the keys, as changed by this transaction. """
+
+        return self._current().keys()
+
+    def values(self):
+        """ Returns the values, as changed by this transaction. """
+
+        return self._current().values()
+
+    def items(self):
+        """ Returns the (key, val) pairs, as changed by this transaction. """
+
+        return self._current().items()
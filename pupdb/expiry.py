@@ -0,0 +1,100 @@
+"""
+    Expiry index of the keys of PupDB set with a time to live.
+"""
+
+import bisect
+import json
+import os
+
+
+# pylint: disable=useless-object-inheritance
+class ExpiryIndex(object):
+    """
+        Expiry times (seconds since the epoch) of the keys of a database,
+        sorted by time, so that the expired keys are found without
+        scanning all the keys.
+
+        The expiry times of the database file are stored in a file next to
+        it, and their changes in the append log records, as the 'expires'
+        of 'set' records and in 'expire' records.
+    """
+
+    def __init__(self):
+        """ Initializes an empty index. """
+
+        self._expires = {}
+        # Sorted (expiry time, key) pairs.
+        self._sorted = []
+
+    def __len__(self):
+        """ Returns the number of keys with an expiry time. """
+
+        return len(self._expires)
+
+    def get(self, key):
+        """ Returns the expiry time of the key, or None. """
+
+        return self._expires.get(key)
+
+    def set(self, key, expires):
+        """ Sets the expiry time of the key, None to remove it. """
+
+        self.remove(key)
+        if expires is None:
+            return
+        self._expires[key] = expires
+        bisect.insort(self._sorted, (expires, key))
+
+    def remove(self, key):
+        """ Removes the expiry time of the key, if any. """
+
+        expires = self._expires.pop(key, None)
+        if expires is not None:
+            del self._sorted[bisect.bisect_left(self._sorted, (expires, key))]
+
+    def clear(self):
+        """ Removes all expiry times. """
+
+        self._expires = {}
+        self._sorted = []
+
+    def expired(self, now):
+        """ Returns the keys expired at the time now, oldest first. """
+
+        expired = []
+        for expires, key in self._sorted:
+            if expires > now:
+                break
+            expired.append(key)
+        return expired
+
+    def apply_record(self, record):
+        """ Applies an append log record to the expiry times. """
+
+        operation = record['op']
+        if operation == 'set':
+            self.set(record['key'], record.get('expires'))
+        elif operation == 'expire':
+            self.set(record['key'], record['expires'])
+        elif operation == 'remove':
+            self.remove(record['key'])
+        elif operation == 'clear':
+            self.clear()
+
+    def load_file(self, file_path):
+        """ Loads the expiry times of the file, if it exists. """
+
+        self.clear()
+        if not os.path.exists(file_path):
+            return
+        with open(file_path, 'rb') as expiry_file:
+            expires = json.loads(expiry_file.read().decode('utf-8'))
+        self._expires = expires
+        self._sorted = sorted(
+            (expires_at, key) for key, expires_at in expires.items()
+        )
+
+    def dumps(self):
+        """ Returns the contents of the expiry file. """
+
+        return json.dumps(self._expires, sort_keys=True).encode('utf-8')
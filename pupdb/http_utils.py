@@ -0,0 +1,286 @@
+"""
+    Helpers shared by the HTTP interfaces to PupDB, pupdb.rest and
+    pupdb.asgi.
+"""
+
+import json
+import os
+import threading
+import zlib
+from collections import OrderedDict
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+# Size of the chunks of the streamed responses.
+STREAM_CHUNK_SIZE = 64 * 1024
+
+# Maximum number of items of a /scan page.
+MAX_SCAN_LIMIT = 10000
+
+# Maximum number of keys of a /mget, /mset or /mremove request.
+MAX_BATCH_SIZE = 10000
+
+# Default maximum size of the cached responses of the listing endpoints.
+RESPONSE_CACHE_SIZE = 64 * 1024 * 1024
+
+# Compression levels of the streamed responses.
+GZIP_LEVEL = 6
+ZSTD_LEVEL = 3
+
+# Content encodings of the streamed responses, by order of preference.
+# zstd requires the optional zstandard package.
+CONTENT_ENCODINGS = ('zstd', 'gzip') if zstandard is not None else ('gzip',)
+
+
+def database_options():
+    """
+        Returns the options of the PupDB instance of the HTTP interfaces,
+        with the read cache and the settings of the environment variables.
+    """
+
+    return {
+        'cache': True,
+        # Lets the server workers serve reads concurrently.
+        'lock_mode': os.environ.get('PUPDB_LOCK_MODE') or (
+            'exclusive' if os.name == 'nt' else 'shared'
+        ),
+        'sweep_interval': float(os.environ['PUPDB_SWEEP_INTERVAL'])
+        if os.environ.get('PUPDB_SWEEP_INTERVAL') else None,
+    }
+
+
+def iter_json_chunks(name, elements, is_object=False,
+                     chunk_size=STREAM_CHUNK_SIZE):
+    """
+        Yields {name: [...]} encoded in chunks of about chunk_size bytes,
+        encoding one element at a time. With is_object, the elements are
+        (key, val) pairs encoded as {name: {...}}.
+    """
+
+    opening, closing = ('{', '}') if is_object else ('[', ']')
+    chunk = ['{{{}: {}'.format(json.dumps(name), opening)]
+    size = 0
+    separator = ''
+    for element in elements:
+        if is_object:
+            data = '{}{}: {}'.format(
+                separator, json.dumps(element[0]), json.dumps(element[1])
+            )
+        else:
+            data = separator + json.dumps(element)
+        separator = ', '
+        chunk.append(data)
+        size += len(data)
+        if size >= chunk_size:
+            yield ''.join(chunk)
+            chunk = []
+            size = 0
+    chunk.append(closing + '}\n')
+    yield ''.join(chunk)
+
+
+def batch_keys(payload):
+    """
+        Returns the list of keys of a /mget or /mremove request payload,
+        {"keys": [...]}. Raises a ValueError if it is invalid.
+    """
+
+    keys = payload.get('keys') if isinstance(payload, dict) else None
+    if not isinstance(keys, list) or not keys:
+        raise ValueError('Missing parameter \'keys\'')
+    if len(keys) > MAX_BATCH_SIZE:
+        raise ValueError(
+            'Parameter \'keys\' must have at most {} keys'.format(
+                MAX_BATCH_SIZE
+            )
+        )
+    return keys
+
+
+def batch_items(payload):
+    """
+        Returns the list of (key, value) pairs of a /mset request payload,
+        {"items": {...}} or {"items": [[key, value], ...]}. Raises a
+        ValueError if it is invalid.
+    """
+
+    items = payload.get('items') if isinstance(payload, dict) else None
+    if isinstance(items, dict):
+        items = list(items.items())
+    elif not isinstance(items, list) or not all(
+            isinstance(item, list) and len(item) == 2 for item in items):
+        items = None
+    if not items:
+        raise ValueError('Missing parameter \'items\'')
+    if len(items) > MAX_BATCH_SIZE:
+        raise ValueError(
+            'Parameter \'items\' must have at most {} items'.format(
+                MAX_BATCH_SIZE
+            )
+        )
+    return items
+
+
+def choose_encoding(accept_encoding):
+    """
+        Returns the content encoding of CONTENT_ENCODINGS with the highest
+        quality in an Accept-Encoding header, the first one of them for
+        equal qualities, or None for none.
+    """
+
+    accepted = {}
+    for coding in (accept_encoding or '').split(','):
+        coding, _, params = coding.partition(';')
+        quality = 1.0
+        for param in params.split(';'):
+            name, _, value = param.partition('=')
+            if name.strip() == 'q':
+                try:
+                    quality = float(value)
+                except ValueError:
+                    quality = 0.0
+        accepted[coding.strip().lower()] = quality
+    chosen, chosen_quality = None, 0.0
+    for encoding in CONTENT_ENCODINGS:
+        quality = accepted.get(encoding, accepted.get('*', 0.0))
+        if quality > chosen_quality:
+            chosen, chosen_quality = encoding, quality
+    return chosen
+
+
+def compress_chunks(chunks, encoding):
+    """
+        Yields the chunks of a response, see iter_json_chunks(),
+        compressed in a single stream with the content encoding.
+    """
+
+    if encoding == 'zstd':
+        compressor = zstandard.ZstdCompressor(level=ZSTD_LEVEL).compressobj()
+    else:
+        # The gzip container, rather than a raw zlib stream.
+        compressor = zlib.compressobj(
+            GZIP_LEVEL, zlib.DEFLATED, 16 + zlib.MAX_WBITS
+        )
+    for chunk in chunks:
+        data = compressor.compress(chunk.encode('utf-8'))
+        if data:
+            yield data
+    yield compressor.flush()
+
+
+def decompress(data, encoding):
+    """ Returns the data of a response body with the content encoding. """
+
+    if encoding == 'zstd':
+        # Streamed zstd frames don't record their size.
+        return zstandard.ZstdDecompressor().decompressobj().decompress(data)
+    if encoding == 'gzip':
+        return zlib.decompress(data, 16 + zlib.MAX_WBITS)
+    return data
+
+
+def make_etag(version, encoding=None):
+    """
+        Returns the ETag of the responses for a version of the database,
+        compressed with the content encoding if given.
+    """
+
+    if encoding:
+        return '"{}-{}"'.format(version, encoding)
+    return '"{}"'.format(version)
+
+
+def etag_matches(if_none_match, etag):
+    """ Returns whether an If-None-Match header matches the ETag. """
+
+    if not if_none_match:
+        return False
+    tags = [tag.strip() for tag in if_none_match.split(',')]
+    return '*' in tags or etag in tags or 'W/' + etag in tags
+
+
+# pylint: disable=useless-object-inheritance
+class ResponseCache(object):
+    """
+        Cache of the encoded responses of the listing endpoints, for the
+        current version of the database only (see PupDB.version()).
+
+        It holds at most max_bytes bytes of responses, dropping the least
+        recently used ones first. max_bytes defaults to the
+        PUPDB_RESPONSE_CACHE_SIZE environment variable, or 64 MiB, and 0
+        disables the cache.
+    """
+
+    def __init__(self, max_bytes=None):
+        """ Initializes an empty cache. """
+
+        if max_bytes is None:
+            max_bytes = int(
+                os.environ.get('PUPDB_RESPONSE_CACHE_SIZE') or
+                RESPONSE_CACHE_SIZE
+            )
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._version = None
+        self._responses = OrderedDict()
+        self._size = 0
+
+    def get(self, version, key):
+        """
+            Returns the cached response body of the key (e.g. the path and
+            query string of the request) for the version, or None.
+        """
+
+        with self._lock:
+            if version != self._version:
+                return None
+            body = self._responses.pop(key, None)
+            if body is not None:
+                self._responses[key] = body
+            return body
+
+    def put(self, version, key, body):
+        """
+            Caches the response body of the key for the version, dropping
+            the responses of the other versions.
+        """
+
+        if len(body) > self.max_bytes:
+            return
+        with self._lock:
+            if version != self._version:
+                self._version = version
+                self._responses.clear()
+                self._size = 0
+            previous = self._responses.pop(key, None)
+            if previous is not None:
+                self._size -= len(previous)
+            while self._responses and \
+                    self._size + len(body) > self.max_bytes:
+                self._size -= len(self._responses.popitem(last=False)[1])
+            self._responses[key] = body
+            self._size += len(body)
+
+    def cache_chunks(self, version, key, chunks):
+        """
+            Yields the chunks of a response, see iter_json_chunks() and
+            compress_chunks(), and caches the response encoded in utf-8
+            once they are all yielded, if it fits in the cache.
+        """
+
+        body = []
+        size = 0
+        for chunk in chunks:
+            yield chunk
+            if body is not None:
+                if not isinstance(chunk, bytes):
+                    chunk = chunk.encode('utf-8')
+                body.append(chunk)
+                size += len(chunk)
+                if size > self.max_bytes:
+                    body = None
+        if body is not None:
+            self.put(version, key, b''.join(body))
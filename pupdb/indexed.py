@@ -0,0 +1,306 @@
+"""
+    Indexed file format of PupDB, used by the 'indexed' serializer.
+
+    The keys and the separately encoded values are stored in sorted key
+    order, followed by a directory of their offsets and a hash table of
+    the directory entries. Database files in this format are read through
+    mmap, so that looking up a key only reads and decodes its own value.
+
+    Layout (offsets are relative to the end of the 'PUPDB indexed' header):
+    - file header: magic, version, number of entries, directory offset,
+      hash table offset and hash table size.
+    - data: the key and value bytes of each entry.
+    - directory: (key offset, key length, value offset, value length)
+      of each entry, sorted by key.
+    - hash table: directory index + 1 of the entry hashed to each slot,
+      0 for empty slots, with linear probing.
+"""
+
+import heapq
+import mmap
+import struct
+import zlib
+
+try:
+    from collections.abc import MutableMapping
+except ImportError:
+    # Python 2
+    from collections import MutableMapping
+
+MAGIC = b'PIDX'
+VERSION = 1
+
+_FILE_HEADER = struct.Struct('>4sIQQQQ')
+_ENTRY = struct.Struct('>QIQI')
+_SLOT = struct.Struct('>Q')
+
+# Marks a key removed from an IndexedMapping.
+_REMOVED = object()
+
+
+def _hash(key):
+    """ Returns the hash of encoded key, stable across processes. """
+
+    return zlib.crc32(key) & 0xffffffff
+
+
+def dumps_indexed(items):
+    """
+        Returns the indexed file contents (without the serializer header)
+        for an iterable of (key bytes, value bytes) pairs sorted by key.
+    """
+
+    parts = [b'']
+    entries = []
+    offset = _FILE_HEADER.size
+    for key, value in items:
+        entries.append((key, offset, len(key), offset + len(key), len(value)))
+        parts.append(key)
+        parts.append(value)
+        offset += len(key) + len(value)
+
+    directory_offset = offset
+    for entry in entries:
+        parts.append(_ENTRY.pack(*entry[1:]))
+
+    table_offset = directory_offset + len(entries) * _ENTRY.size
+    table_size = 1
+    while table_size < 2 * len(entries):
+        table_size *= 2
+    table = [0] * table_size
+    for index, entry in enumerate(entries):
+        slot = _hash(entry[0]) & (table_size - 1)
+        while table[slot]:
+            slot = (slot + 1) & (table_size - 1)
+        table[slot] = index + 1
+    parts.append(struct.pack('>{}Q'.format(table_size), *table))
+
+    parts[0] = _FILE_HEADER.pack(
+        MAGIC, VERSION, len(entries), directory_offset, table_offset,
+        table_size
+    )
+    return b''.join(parts)
+
+
+class IndexedMapping(MutableMapping):
+    """
+        Dict-like view of the database held in an indexed file buffer
+        (usually a mmap), which only decodes the values that are accessed.
+        Changes are kept in memory, on top of the buffer.
+    """
+
+    def __init__(self, buffer, offset, value_serializer):
+        """
+            Initializes the mapping for the indexed file contents starting
+            at offset in buffer, with values encoded by value_serializer.
+        """
+
+        magic, version, count, directory_offset, table_offset, table_size = \
+            _FILE_HEADER.unpack_from(buffer, offset)
+        if magic != MAGIC or version != VERSION:
+            raise ValueError('Unsupported indexed file format.')
+        self._buffer = buffer
+        self._offset = offset
+        self._count = count
+        self._directory_offset = offset + directory_offset
+        self._table_offset = offset + table_offset
+        self._table_mask = table_size - 1
+        self._value_serializer = value_serializer
+        self._changes = {}
+        self._cleared = False
+        self._length = count
+
+    def __repr__(self):
+        """ String representation of the mapping, like a dict. """
+
+        return repr(dict(self))
+
+    def _entry(self, index):
+        """ Returns the offsets and lengths of the key and value at index. """
+
+        key_offset, key_length, value_offset, value_length = \
+            _ENTRY.unpack_from(
+                self._buffer, self._directory_offset + index * _ENTRY.size
+            )
+        return (
+            self._offset + key_offset, key_length,
+            self._offset + value_offset, value_length
+        )
+
+    def _raw_key(self, index):
+        """ Returns the encoded key at index. """
+
+        key_offset, key_length, _, _ = self._entry(index)
+        return self._buffer[key_offset:key_offset + key_length]
+
+    def _raw_value(self, index):
+        """ Returns the encoded value at index. """
+
+        _, _, value_offset, value_length = self._entry(index)
+        return self._buffer[value_offset:value_offset + value_length]
+
+    def _find(self, key):
+        """ Returns the index of the str key in the buffer, or -1. """
+
+        if not self._count:
+            return -1
+        raw_key = key.encode('utf-8')
+        slot = _hash(raw_key) & self._table_mask
+        while True:
+            index = _SLOT.unpack_from(
+                self._buffer, self._table_offset + slot * _SLOT.size
+            )[0]
+            if not index:
+                return -1
+            if self._raw_key(index - 1) == raw_key:
+                return index - 1
+            slot = (slot + 1) & self._table_mask
+
+    def get(self, key, default=None):
+        """ Returns the value of the key, or default if not found. """
+
+        if key in self._changes:
+            val = self._changes[key]
+            return default if val is _REMOVED else val
+        if self._cleared:
+            return default
+        index = self._find(key)
+        if index < 0:
+            return default
+        return self._value_serializer.loads(self._raw_value(index))
+
+    def __getitem__(self, key):
+        """ Returns the value of the key, raising a KeyError if not found. """
+
+        val = self.get(key, _REMOVED)
+        if val is _REMOVED:
+            raise KeyError(key)
+        return val
+
+    def __contains__(self, key):
+        """ Tells whether the key exists, without decoding its value. """
+
+        if key in self._changes:
+            return self._changes[key] is not _REMOVED
+        return not self._cleared and self._find(key) >= 0
+
+    def __setitem__(self, key, val):
+        """ Sets the value of the key, in memory. """
+
+        if key not in self:
+            self._length += 1
+        self._changes[key] = val
+
+    def __delitem__(self, key):
+        """ Removes the key, in memory. """
+
+        if key not in self:
+            raise KeyError(key)
+        self._changes[key] = _REMOVED
+        self._length -= 1
+
+    def clear(self):
+        """ Removes all keys, in memory. """
+
+        self._changes = {}
+        self._cleared = True
+        self._length = 0
+
+    def __len__(self):
+        """ Returns the number of keys. """
+
+        return self._length
+
+    def _iter_base_indexes(self):
+        """ Yields the indexes of the unchanged keys of the buffer. """
+
+        if self._cleared:
+            return
+        for index in range(self._count):
+            if self._changes and \
+                    self._raw_key(index).decode('utf-8') in self._changes:
+                continue
+            yield index
+
+    def __iter__(self):
+        """ Yields the keys, without decoding any value. """
+
+        for index in self._iter_base_indexes():
+            yield self._raw_key(index).decode('utf-8')
+        for key, val in list(self._changes.items()):
+            if val is not _REMOVED:
+                yield key
+
+    def _bisect(self, raw_key):
+        """ Returns the index of the first key >= raw_key in the buffer. """
+
+        low, high = 0, self._count
+        while low < high:
+            middle = (low + high) // 2
+            if self._raw_key(middle) < raw_key:
+                low = middle + 1
+            else:
+                high = middle
+        return low
+
+    def irange(self, start=None, stop=None):
+        """
+            Yields the keys with start <= key < stop in sorted order,
+            found by binary search in the sorted directory of the buffer.
+        """
+
+        changed_keys = sorted(
+            key for key, val in self._changes.items()
+            if val is not _REMOVED and (start is None or key >= start) and
+            (stop is None or key < stop)
+        )
+        if self._cleared:
+            return iter(changed_keys)
+
+        low = 0 if start is None else self._bisect(start.encode('utf-8'))
+        high = self._count if stop is None \
+            else self._bisect(stop.encode('utf-8'))
+        # UTF-8 preserves the order of the encoded strings.
+        base_keys = (
+            key for key in (
+                self._raw_key(index).decode('utf-8')
+                for index in range(low, high)
+            ) if key not in self._changes
+        )
+        return heapq.merge(base_keys, changed_keys)
+
+    def raw_items(self, value_serializer):
+        """
+            Yields the (key bytes, value bytes) pairs sorted by key, copying
+            the unchanged values without decoding them if they are encoded
+            with value_serializer, e.g. to write a new indexed file.
+        """
+
+        copy_values = \
+            value_serializer.name == self._value_serializer.name
+        base_items = (
+            (
+                self._raw_key(index),
+                self._raw_value(index) if copy_values else
+                value_serializer.dumps(
+                    self._value_serializer.loads(self._raw_value(index))
+                )
+            )
+            for index in self._iter_base_indexes()
+        )
+        changed_items = sorted(
+            (key.encode('utf-8'), value_serializer.dumps(val))
+            for key, val in self._changes.items() if val is not _REMOVED
+        )
+        return heapq.merge(base_items, changed_items)
+
+
+def load_indexed_file(file_path, offset, value_serializer):
+    """
+        Returns an IndexedMapping of the indexed file at file_path, whose
+        contents start at offset, read through mmap.
+    """
+
+    with open(file_path, 'rb') as db_file:
+        buffer = mmap.mmap(db_file.fileno(), 0, access=mmap.ACCESS_READ)
+    return IndexedMapping(buffer, offset, value_serializer)
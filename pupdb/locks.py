@@ -0,0 +1,250 @@
+"""
+    Reader/writer locks used by the 'shared' lock mode of PupDB.
+"""
+
+import os
+import threading
+
+try:
+    import fcntl
+except ImportError:
+    # Not available on Windows.
+    fcntl = None
+
+
+# pylint: disable=useless-object-inheritance
+class ReadWriteLock(object):
+    """
+        In-process reader/writer lock: any number of threads can hold it
+        for reading, or a single thread for writing. Both are reentrant,
+        and the writing thread can also acquire it for reading, but a
+        reading thread can't upgrade to writing. Waiting writers take
+        precedence over new readers, so that they are not starved.
+    """
+
+    def __init__(self):
+        """ Initializes the lock. """
+
+        self._condition = threading.Condition(threading.Lock())
+        self._readers = 0
+        self._writer = None
+        self._writer_depth = 0
+        self._waiting_writers = 0
+        self._local = threading.local()
+
+    def read_depth(self):
+        """ Returns the read acquisitions of the current thread. """
+
+        return getattr(self._local, 'read_depth', 0)
+
+    def write_depth(self):
+        """ Returns the write acquisitions of the current thread. """
+
+        if self._writer != threading.current_thread():
+            return 0
+        return self._writer_depth
+
+    def acquire_read(self):
+        """
+            Acquires the lock for reading. Returns True if the current
+            thread became a reader, i.e. if this is its outermost read
+            acquisition and it doesn't hold the lock for writing.
+        """
+
+        depth = self.read_depth()
+        self._local.read_depth = depth + 1
+        if depth or self._writer == threading.current_thread():
+            return False
+
+        with self._condition:
+            while self._writer is not None or self._waiting_writers:
+                self._condition.wait()
+            self._readers += 1
+            return True
+
+    def release_read(self):
+        """ Releases a read acquisition. """
+
+        depth = self.read_depth() - 1
+        if depth < 0:
+            raise RuntimeError('Releasing a read lock that is not held.')
+        self._local.read_depth = depth
+        if depth or self._writer == threading.current_thread():
+            return
+
+        with self._condition:
+            self._readers -= 1
+            if not self._readers:
+                self._condition.notify_all()
+
+    def acquire_write(self):
+        """
+            Acquires the lock for writing. Returns True if this is the
+            outermost write acquisition.
+        """
+
+        current_thread = threading.current_thread()
+        if self._writer == current_thread:
+            self._writer_depth += 1
+            return False
+        if self.read_depth():
+            raise RuntimeError(
+                'Upgrading a read lock to a write lock would deadlock.'
+            )
+
+        with self._condition:
+            self._waiting_writers += 1
+            try:
+                while self._writer is not None or self._readers:
+                    self._condition.wait()
+            finally:
+                self._waiting_writers -= 1
+            self._writer = current_thread
+            self._writer_depth = 1
+            return True
+
+    def release_write(self):
+        """ Releases a write acquisition. """
+
+        if self._writer != threading.current_thread():
+            raise RuntimeError('Releasing a write lock that is not held.')
+        self._writer_depth -= 1
+        if self._writer_depth:
+            return
+
+        with self._condition:
+            self._writer = None
+            self._condition.notify_all()
+
+
+class _LockContext(object):
+    """ Context manager acquiring one side of a reader/writer lock. """
+
+    def __init__(self, acquire, release, depth):
+        """
+            Initializes the context with the acquire/release functions, and
+            the function returning the acquisitions of the current thread.
+        """
+
+        self.acquire = acquire
+        self.release = release
+        self._depth = depth
+
+    @property
+    def is_locked(self):
+        """ Tells whether the current thread holds the lock. """
+
+        return bool(self._depth())
+
+    def __enter__(self):
+        """ Acquires the lock. """
+
+        self.acquire()
+        return self
+
+    def __exit__(self, exc_type, exc_value, exc_traceback):
+        """ Releases the lock. """
+
+        self.release()
+
+
+class ReadWriteFileLock(object):
+    """
+        Reader/writer lock across threads and processes, combining a
+        ReadWriteLock with shared and exclusive fcntl.flock() locks on
+        lock_file_path. The exclusive locks are compatible with the
+        filelock.FileLock locks on the same file.
+
+        Use the read_lock and write_lock context managers, e.g.:
+
+            with lock.read_lock:
+                ...
+    """
+
+    def __init__(self, lock_file_path):
+        """ Initializes the lock. Raises a ValueError without fcntl. """
+
+        if fcntl is None:
+            raise ValueError(
+                'Shared file locks require fcntl, which is not available '
+                'on this platform.'
+            )
+        self.lock_file_path = lock_file_path
+        self._thread_lock = ReadWriteLock()
+        # The file lock is shared by the reading threads of the process.
+        self._file_lock = threading.Lock()
+        self._lock_fd = None
+        self._shared_holders = 0
+        self.read_lock = _LockContext(
+            self.acquire_read, self.release_read,
+            self._thread_lock.read_depth
+        )
+        self.write_lock = _LockContext(
+            self.acquire_write, self.release_write,
+            self._thread_lock.write_depth
+        )
+
+    def _lock_file(self, operation):
+        """ Opens the lock file and applies the flock() operation to it. """
+
+        self._lock_fd = os.open(self.lock_file_path, os.O_RDWR | os.O_CREAT)
+        try:
+            fcntl.flock(self._lock_fd, operation)
+        except Exception:
+            os.close(self._lock_fd)
+            self._lock_fd = None
+            raise
+
+    def _unlock_file(self):
+        """ Releases the flock() lock and closes the lock file. """
+
+        lock_fd, self._lock_fd = self._lock_fd, None
+        try:
+            fcntl.flock(lock_fd, fcntl.LOCK_UN)
+        finally:
+            os.close(lock_fd)
+
+    def acquire_read(self):
+        """ Acquires the lock for reading. """
+
+        if not self._thread_lock.acquire_read():
+            return
+        try:
+            with self._file_lock:
+                if not self._shared_holders:
+                    self._lock_file(fcntl.LOCK_SH)
+                self._shared_holders += 1
+        except Exception:
+            self._thread_lock.release_read()
+            raise
+
+    def release_read(self):
+        """ Releases the lock for reading. """
+
+        if self._thread_lock.read_depth() == 1 and \
+                not self._thread_lock.write_depth():
+            with self._file_lock:
+                self._shared_holders -= 1
+                if not self._shared_holders:
+                    self._unlock_file()
+        self._thread_lock.release_read()
+
+    def acquire_write(self):
+        """ Acquires the lock for writing. """
+
+        if not self._thread_lock.acquire_write():
+            return
+        try:
+            with self._file_lock:
+                self._lock_file(fcntl.LOCK_EX)
+        except Exception:
+            self._thread_lock.release_write()
+            raise
+
+    def release_write(self):
+        """ Releases the lock for writing. """
+
+        if self._thread_lock.write_depth() == 1:
+            with self._file_lock:
+                self._unlock_file()
+        self._thread_lock.release_write()
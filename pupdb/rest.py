@@ -3,12 +3,16 @@
 """
 
 import os
-import json
 import traceback
 
 from flask import Flask, request, Response, jsonify
 
 from pupdb.core import PupDB
+from pupdb.http_utils import (
+    MAX_SCAN_LIMIT, ResponseCache, batch_items, batch_keys, choose_encoding,
+    compress_chunks, database_options, etag_matches, iter_json_chunks,
+    make_etag
+)
 
 
 # pylint: disable=too-many-ancestors
@@ -29,12 +33,18 @@ def init_module():
 
     app = Flask(__name__)
     app.response_class = CustomResponse
-    database = PupDB(os.environ.get('PUPDB_FILE_PATH') or 'pupdb.json')
+    database = PupDB(
+        os.environ.get('PUPDB_FILE_PATH') or 'pupdb.json',
+        **database_options()
+    )
     return app, database
 
 
 APP, DB = init_module()
 
+# Encoded responses of the listing endpoints, for the current version of DB.
+RESPONSES = ResponseCache()
+
 
 @APP.route('/get', methods=['GET'])
 def db_get():
@@ -58,7 +68,7 @@ def db_set():
         if not value:
             return {'error': 'Missing parameter \'value\''}, 400
 
-        result = DB.set(key, value)
+        result = DB.set(key, value, request.json.get('ttl'))
 
         if result:
             return {
@@ -104,32 +114,167 @@ def db_remove(key):
         }, 422
 
 
+@APP.route('/mget', methods=['POST'])
+def db_mget():
+    """ Endpoint Function to interact with PupDB's get_many() method. """
+
+    try:
+        keys = batch_keys(request.get_json(silent=True))
+    except ValueError as val_err:
+        return {'error': str(val_err)}, 400
+    return {'values': DB.get_many(keys)}, 200
+
+
+@APP.route('/mset', methods=['POST'])
+def db_mset():
+    """ Endpoint Function to interact with PupDB's set_many() method. """
+
+    try:
+        payload = request.get_json(silent=True)
+        try:
+            items = batch_items(payload)
+        except ValueError as val_err:
+            return {'error': str(val_err)}, 400
+
+        if DB.set_many(items, payload.get('ttl')):
+            return {'message': '{} keys set.'.format(len(items))}, 200
+        return {
+            'error': 'There was a problem saving the keys to the DB.'
+        }, 400
+    except Exception:
+        return {'error': 'Unable to process this request.'}, 422
+
+
+@APP.route('/mremove', methods=['POST'])
+def db_mremove():
+    """ Endpoint Function to interact with PupDB's remove_many() method. """
+
+    try:
+        keys = batch_keys(request.get_json(silent=True))
+    except ValueError as val_err:
+        return {'error': str(val_err)}, 400
+
+    try:
+        result = DB.remove_many(keys)
+    except KeyError as key_err:
+        return {'error': str(key_err)[1:-1]}, 404
+
+    if result:
+        return {'message': '{} keys removed from DB.'.format(len(keys))}, 200
+    return {
+        'error': 'There was a problem removing the keys from the DB.'
+    }, 400
+
+
+def _iter_args():
+    """ Returns the prefix/start/stop filters of the iterating endpoints. """
+
+    return {
+        name: request.args.get(name) for name in ('prefix', 'start', 'stop')
+    }
+
+
+def _stream_json(name, iter_elements, is_object=False):
+    """
+        Returns a response streaming {name: [...]} in chunks, see
+        pupdb.http_utils.iter_json_chunks(), for the elements iterated by
+        iter_elements(), compressed with the preferred content encoding
+        accepted by the client. The response has the ETag of the version
+        of the database: a 304 Not Modified response is returned if it
+        matches the If-None-Match header, without reading the database
+        again, and the response is cached until the database changes.
+    """
+
+    version = DB.version()
+    encoding = choose_encoding(request.headers.get('Accept-Encoding'))
+    headers = {
+        'ETag': make_etag(version, encoding), 'Vary': 'Accept-Encoding'
+    }
+    if etag_matches(request.headers.get('If-None-Match'), headers['ETag']):
+        return Response(status=304, headers=headers)
+
+    if encoding:
+        headers['Content-Encoding'] = encoding
+    cache_key = (request.full_path, encoding)
+    body = RESPONSES.get(version, cache_key)
+    if body is None:
+        chunks = iter_json_chunks(name, iter_elements(), is_object)
+        if encoding:
+            chunks = compress_chunks(chunks, encoding)
+        body = RESPONSES.cache_chunks(version, cache_key, chunks)
+    return Response(body, mimetype='application/json', headers=headers)
+
+
 @APP.route('/keys', methods=['GET'])
 def db_keys():
-    """ Endpoint Function to interact with PupDB's keys() method. """
+    """ Endpoint Function to interact with PupDB's iter_keys() method. """
 
-    return {'keys': list(DB.keys())}, 200
+    return _stream_json('keys', lambda: DB.iter_keys(**_iter_args()))
 
 
 @APP.route('/values', methods=['GET'])
 def db_values():
-    """ Endpoint Function to interact with PupDB's values() method. """
+    """ Endpoint Function to interact with PupDB's iter_values() method. """
 
-    return {'values': list(DB.values())}, 200
+    return _stream_json('values', lambda: DB.iter_values(**_iter_args()))
 
 
 @APP.route('/items', methods=['GET'])
 def db_items():
-    """ Endpoint Function to interact with PupDB's items() method. """
+    """ Endpoint Function to interact with PupDB's iter_items() method. """
 
-    return {'items': [list(item) for item in DB.items()]}, 200
+    return _stream_json('items', lambda: DB.iter_items(**_iter_args()))
 
 
 @APP.route('/dumps', methods=['GET'])
 def db_dumps():
-    """ Endpoint Function to interact with PupDB's dumps() method. """
+    """
+        Endpoint Function to dump the database like PupDB's dumps() method,
+        streamed from PupDB's iter_items() method.
+    """
+
+    return _stream_json('database', DB.iter_items, is_object=True)
 
-    return {'database': json.loads(DB.dumps())}, 200
+
+@APP.route('/range', methods=['GET'])
+def db_range():
+    """ Endpoint Function to interact with PupDB's range() method. """
+
+    return _stream_json(
+        'items',
+        lambda: DB.range(request.args.get('start'), request.args.get('stop'))
+    )
+
+
+@APP.route('/prefix', methods=['GET'])
+def db_prefix():
+    """ Endpoint Function to interact with PupDB's prefix() method. """
+
+    prefix = request.args.get('prefix')
+    if prefix is None:
+        return {'error': 'Missing parameter \'prefix\''}, 400
+    return _stream_json('items', lambda: DB.prefix(prefix))
+
+
+@APP.route('/scan', methods=['GET'])
+def db_scan():
+    """ Endpoint Function to interact with PupDB's scan() method. """
+
+    try:
+        limit = int(request.args.get('limit', 100))
+        if limit > MAX_SCAN_LIMIT:
+            return {
+                'error': 'Parameter \'limit\' must be at most {}'.format(
+                    MAX_SCAN_LIMIT
+                )
+            }, 400
+        items, cursor = DB.scan(
+            cursor=request.args.get('cursor') or None, limit=limit,
+            prefix=request.args.get('prefix')
+        )
+    except ValueError as val_err:
+        return {'error': str(val_err)}, 400
+    return {'items': [list(item) for item in items], 'cursor': cursor}, 200
 
 
 @APP.route('/truncate-db', methods=['POST'])
@@ -0,0 +1,216 @@
+"""
+    Secondary indexes of PupDB, mapping the values of a field of the json
+    object values of the database to their keys.
+"""
+
+import bisect
+import json
+
+# Marks a missing field.
+_MISSING = object()
+
+try:
+    _STRING_TYPES = (basestring,)  # noqa: F821
+except NameError:
+    # Python 3
+    _STRING_TYPES = (str,)
+
+# Ranks of the types of field values that can be queried by range, so
+# that numbers and strings are never compared with each other.
+_NUMBER_RANK = 0
+_STRING_RANK = 1
+
+
+def _range_rank(value):
+    """ Returns the range rank of the field value, or None. """
+
+    if isinstance(value, bool):
+        return None
+    if isinstance(value, (int, float)):
+        return _NUMBER_RANK
+    if isinstance(value, _STRING_TYPES):
+        return _STRING_RANK
+    return None
+
+
+def _encode(value):
+    """ Returns the equality lookup key of a field value. """
+
+    if isinstance(value, float) and value.is_integer():
+        value = int(value)
+    return json.dumps(value, sort_keys=True)
+
+
+# pylint: disable=useless-object-inheritance
+class SecondaryIndex(object):
+    """
+        Index of the values of a field of the database values, given as
+        a dotted path, e.g. 'address.city' for the 'city' of the 'address'
+        of each value. Values without the field are not indexed.
+    """
+
+    def __init__(self, field):
+        """ Initializes an empty index of the field. """
+
+        self.field = field
+        self._path = field.split('.')
+        # Field value of each indexed key.
+        self._values = {}
+        # Indexed keys of each encoded field value.
+        self._keys = {}
+        # Sorted (range rank, field value, key) of the range queries.
+        self._sorted = []
+
+    def extract(self, value):
+        """ Returns the field of the database value, or _MISSING. """
+
+        for name in self._path:
+            if not isinstance(value, dict) or name not in value:
+                return _MISSING
+            value = value[name]
+        return value
+
+    def field_values(self):
+        """ Returns a dict of the field value of each indexed key. """
+
+        return self._values
+
+    def load(self, field_values):
+        """ Replaces the index contents with a dict of field values. """
+
+        self._values = dict(field_values)
+        self._keys = {}
+        self._sorted = []
+        for key, value in self._values.items():
+            self._keys.setdefault(_encode(value), set()).add(key)
+            rank = _range_rank(value)
+            if rank is not None:
+                self._sorted.append((rank, value, key))
+        self._sorted.sort()
+
+    def build(self, items):
+        """ Replaces the index contents with the (key, value) items. """
+
+        field_values = {}
+        for key, value in items:
+            value = self.extract(value)
+            if value is not _MISSING:
+                field_values[key] = value
+        self.load(field_values)
+
+    def set(self, key, value):
+        """ Indexes the database value of the key. """
+
+        self.remove(key)
+        value = self.extract(value)
+        if value is _MISSING:
+            return
+        self._values[key] = value
+        self._keys.setdefault(_encode(value), set()).add(key)
+        rank = _range_rank(value)
+        if rank is not None:
+            bisect.insort(self._sorted, (rank, value, key))
+
+    def remove(self, key):
+        """ Removes the key from the index, if indexed. """
+
+        value = self._values.pop(key, _MISSING)
+        if value is _MISSING:
+            return
+        encoded = _encode(value)
+        keys = self._keys[encoded]
+        keys.discard(key)
+        if not keys:
+            del self._keys[encoded]
+        rank = _range_rank(value)
+        if rank is not None:
+            position = bisect.bisect_left(self._sorted, (rank, value, key))
+            del self._sorted[position]
+
+    def clear(self):
+        """ Removes all keys from the index. """
+
+        self.load({})
+
+    def find(self, value):
+        """ Returns the set of keys whose field equals value. """
+
+        return self._keys.get(_encode(value), set())
+
+    def find_range(self, start=None, stop=None):
+        """
+            Returns the keys whose field is in the range start <= field
+            < stop, sorted by field value and key. Either bound may be
+            None, but not both, and the bounds must be both numbers or
+            both strings, which are only compared to fields of their type.
+        """
+
+        ranks = set(
+            _range_rank(bound) for bound in (start, stop) if bound is not None
+        )
+        if len(ranks) != 1 or None in ranks:
+            raise ValueError(
+                'The range bounds must be both numbers or both strings.'
+            )
+        rank = ranks.pop()
+        low = bisect.bisect_left(
+            self._sorted, (rank,) if start is None else (rank, start)
+        )
+        high = bisect.bisect_left(
+            self._sorted, (rank + 1,) if stop is None else (rank, stop)
+        )
+        return [key for _, _, key in self._sorted[low:high]]
+
+
+class SecondaryIndexSet(object):
+    """
+        The secondary indexes of a database, updated like the database dict
+        by PupDB._apply_record(), so that append log records can be replayed
+        over them.
+    """
+
+    def __init__(self, fields=()):
+        """ Initializes empty indexes of the fields. """
+
+        self.indexes = {field: SecondaryIndex(field) for field in fields}
+
+    def __setitem__(self, key, value):
+        """ Indexes the database value of the key. """
+
+        for index in self.indexes.values():
+            index.set(key, value)
+
+    def pop(self, key, default=None):
+        """ Removes the key from the indexes. """
+
+        for index in self.indexes.values():
+            index.remove(key)
+        return default
+
+    def clear(self):
+        """ Removes all keys from the indexes. """
+
+        for index in self.indexes.values():
+            index.clear()
+
+    def build(self, database):
+        """ Replaces the contents of the indexes with the database. """
+
+        for index in self.indexes.values():
+            index.build(database.items())
+
+    def dumps(self):
+        """ Returns the field values of the indexes, to be persisted. """
+
+        return {
+            field: index.field_values()
+            for field, index in self.indexes.items()
+        }
+
+    def loads(self, indexes):
+        """ Loads field values returned by dumps(). """
+
+        self.indexes = {}
+        for field, field_values in indexes.items():
+            self.indexes[field] = SecondaryIndex(field)
+            self.indexes[field].load(field_values)
@@ -0,0 +1,365 @@
+"""
+    Serializers of the PupDB database files.
+
+    Files written by the json-compatible serializers are plain json, as
+    written by earlier versions of PupDB. Files written by the other
+    serializers start with a header line naming the serializer,
+    e.g. 'PUPDB msgpack', so that their format is detected when reading.
+"""
+
+import json
+import pickle
+import struct
+
+from pupdb.indexed import IndexedMapping, dumps_indexed, load_indexed_file
+
+HEADER_PREFIX = b'PUPDB '
+
+# Length prefix of the append log records of binary serializers.
+_RECORD_LENGTH = struct.Struct('>I')
+
+
+def _import_optional(module_name, serializer_name):
+    """ Imports the optional dependency module of a serializer. """
+
+    try:
+        return __import__(module_name)
+    except ImportError:
+        raise ImportError(
+            'The {} serializer requires the {} package, '
+            'install it with: pip install {}'.format(
+                serializer_name, module_name, module_name
+            )
+        )
+
+
+# pylint: disable=useless-object-inheritance
+class Serializer(object):
+    """ Base class of the serializers of the PupDB database files. """
+
+    # Name of the serializer, recorded in the header of its files.
+    name = None
+
+    # Whether the serializer writes plain json, stored without a header.
+    json_compatible = False
+
+    # Whether files of this serializer may only be read when it has been
+    # chosen explicitly, as reading them can execute arbitrary code.
+    trusted_only = False
+
+    def dumps(self, obj):
+        """ Serializes obj to bytes. """
+
+        raise NotImplementedError
+
+    def loads(self, data):
+        """ Deserializes bytes to an object. """
+
+        raise NotImplementedError
+
+    def header(self):
+        """ Returns the header of the files written by this serializer. """
+
+        if self.json_compatible:
+            return b''
+        return HEADER_PREFIX + self.name.encode('ascii') + b'\n'
+
+    def dumps_file(self, obj):
+        """ Returns the contents of a database file holding obj. """
+
+        if not isinstance(obj, dict):
+            obj = dict(obj)
+        return self.header() + self.dumps(obj)
+
+    def load_file(self, file_path, header_length=0):
+        """
+            Returns the object held in the database file at file_path,
+            whose header is header_length bytes long.
+        """
+
+        with open(file_path, 'rb') as db_file:
+            db_file.seek(header_length)
+            return self.loads(db_file.read())
+
+    def dumps_record(self, record):
+        """
+            Returns an append log record: a line for json-compatible
+            serializers, and length-prefixed bytes otherwise.
+        """
+
+        data = self.dumps(record)
+        if self.json_compatible:
+            return data + b'\n'
+        return _RECORD_LENGTH.pack(len(data)) + data
+
+    def complete_length(self, data):
+        """
+            Returns the length of the complete append log records at the
+            start of data, discarding an incomplete trailing record.
+        """
+
+        if self.json_compatible:
+            return data.rfind(b'\n') + 1
+
+        end = 0
+        while end + _RECORD_LENGTH.size <= len(data):
+            record_end = end + _RECORD_LENGTH.size + \
+                _RECORD_LENGTH.unpack_from(data, end)[0]
+            if record_end > len(data):
+                break
+            end = record_end
+        return end
+
+    def loads_records(self, data):
+        """
+            Yields the complete append log records in data, along with the
+            offset in data after each of them.
+        """
+
+        if self.json_compatible:
+            start = 0
+            end = data.find(b'\n')
+            while end != -1:
+                yield self.loads(data[start:end]), end + 1
+                start = end + 1
+                end = data.find(b'\n', start)
+            return
+
+        start = 0
+        while start + _RECORD_LENGTH.size <= len(data):
+            record_start = start + _RECORD_LENGTH.size
+            record_end = record_start + \
+                _RECORD_LENGTH.unpack_from(data, start)[0]
+            if record_end > len(data):
+                return
+            yield self.loads(data[record_start:record_end]), record_end
+            start = record_end
+
+
+class JSONSerializer(Serializer):
+    """ Serializer using the json module of the standard library. """
+
+    name = 'json'
+    json_compatible = True
+
+    def dumps(self, obj):
+        """ Serializes obj to json bytes. """
+
+        return json.dumps(obj).encode('utf-8')
+
+    def loads(self, data):
+        """ Deserializes json bytes. """
+
+        return json.loads(data.decode('utf-8'))
+
+
+class OrjsonSerializer(Serializer):
+    """ Fast json serializer using the optional orjson package. """
+
+    name = 'orjson'
+    json_compatible = True
+
+    def __init__(self):
+        """ Imports orjson. """
+
+        self.orjson = _import_optional('orjson', self.name)
+
+    def dumps(self, obj):
+        """ Serializes obj to json bytes. """
+
+        return self.orjson.dumps(obj)
+
+    def loads(self, data):
+        """ Deserializes json bytes. """
+
+        return self.orjson.loads(data)
+
+
+class UJSONSerializer(Serializer):
+    """ Fast json serializer using the optional ujson package. """
+
+    name = 'ujson'
+    json_compatible = True
+
+    def __init__(self):
+        """ Imports ujson. """
+
+        self.ujson = _import_optional('ujson', self.name)
+
+    def dumps(self, obj):
+        """ Serializes obj to json bytes. """
+
+        return self.ujson.dumps(obj).encode('utf-8')
+
+    def loads(self, data):
+        """ Deserializes json bytes. """
+
+        return self.ujson.loads(data)
+
+
+class MsgpackSerializer(Serializer):
+    """ Compact binary serializer using the optional msgpack package. """
+
+    name = 'msgpack'
+
+    def __init__(self):
+        """ Imports msgpack. """
+
+        self.msgpack = _import_optional('msgpack', self.name)
+
+    def dumps(self, obj):
+        """ Serializes obj to msgpack bytes. """
+
+        return self.msgpack.packb(obj, use_bin_type=True)
+
+    def loads(self, data):
+        """ Deserializes msgpack bytes. """
+
+        return self.msgpack.unpackb(data, raw=False)
+
+
+class PickleSerializer(Serializer):
+    """
+        Binary serializer using the pickle module, which supports any
+        picklable Python value. As unpickling can execute arbitrary code,
+        pickle files are only read by PupDB instances created with this
+        serializer.
+    """
+
+    name = 'pickle'
+    trusted_only = True
+
+    def dumps(self, obj):
+        """ Pickles obj. """
+
+        return pickle.dumps(obj, pickle.HIGHEST_PROTOCOL)
+
+    def dumps_file(self, obj):
+        """
+            Returns the contents of a database file holding obj, pickled
+            as a plain dict, whatever the class of obj.
+        """
+
+        return self.header() + self.dumps(dict(obj))
+
+    def loads(self, data):
+        """ Unpickles bytes. """
+
+        return pickle.loads(data)
+
+
+class IndexedSerializer(Serializer):
+    """
+        Serializer of the indexed file format (see pupdb.indexed), whose
+        files are read through mmap and only decode the values that are
+        accessed. The values, and the append log records, are encoded with
+        a json-compatible value_serializer.
+    """
+
+    name = 'indexed'
+
+    def __init__(self, value_serializer='json'):
+        """ Initializes the serializer with the value serializer. """
+
+        self.value_serializer = get_serializer(value_serializer)
+        if not self.value_serializer.json_compatible:
+            raise ValueError('The value serializer must write json.')
+
+    def dumps(self, obj):
+        """ Serializes a dict or an IndexedMapping to the indexed format. """
+
+        if isinstance(obj, IndexedMapping):
+            items = obj.raw_items(self.value_serializer)
+        else:
+            items = sorted(
+                (key.encode('utf-8'), self.value_serializer.dumps(val))
+                for key, val in obj.items()
+            )
+        return dumps_indexed(items)
+
+    def dumps_file(self, obj):
+        """ Returns the contents of a database file holding obj. """
+
+        return self.header() + self.dumps(obj)
+
+    def loads(self, data):
+        """ Returns an IndexedMapping of indexed bytes. """
+
+        return IndexedMapping(data, 0, self.value_serializer)
+
+    def load_file(self, file_path, header_length=0):
+        """ Returns an IndexedMapping of the file, read through mmap. """
+
+        return load_indexed_file(
+            file_path, header_length, self.value_serializer
+        )
+
+    def dumps_record(self, record):
+        """ Returns an append log record, as a line of json. """
+
+        return self.value_serializer.dumps_record(record)
+
+    def complete_length(self, data):
+        """ Returns the length of the complete append log records. """
+
+        return self.value_serializer.complete_length(data)
+
+    def loads_records(self, data):
+        """ Yields the complete append log records in data. """
+
+        return self.value_serializer.loads_records(data)
+
+
+SERIALIZERS = {
+    serializer_cls.name: serializer_cls
+    for serializer_cls in (
+        JSONSerializer, OrjsonSerializer, UJSONSerializer,
+        MsgpackSerializer, PickleSerializer, IndexedSerializer
+    )
+}
+
+
+def get_serializer(serializer):
+    """
+        Returns the serializer for a serializer name (see SERIALIZERS)
+        or Serializer instance.
+    """
+
+    if isinstance(serializer, Serializer):
+        return serializer
+    if serializer not in SERIALIZERS:
+        raise ValueError(
+            'Unknown serializer {}, expected one of: {}'.format(
+                serializer, ', '.join(sorted(SERIALIZERS))
+            )
+        )
+    return SERIALIZERS[serializer]()
+
+
+def detect_serializer(data, serializer=None):
+    """
+        Detects the serializer of a file from its first bytes.
+        Returns the serializer and the length of the file header.
+
+        Files without a header are json, read with serializer if it is
+        json-compatible. Files of a trusted_only serializer are only read
+        if it is the given serializer.
+    """
+
+    if not data.startswith(HEADER_PREFIX):
+        if serializer is None or not serializer.json_compatible:
+            serializer = JSONSerializer()
+        return serializer, 0
+
+    header_length = data.find(b'\n') + 1
+    name = data[len(HEADER_PREFIX):header_length - 1].decode('ascii')
+    if serializer is not None and serializer.name == name:
+        return serializer, header_length
+
+    detected = get_serializer(name)
+    if detected.trusted_only:
+        raise ValueError(
+            'Refusing to read a {} file, unless the {} serializer is '
+            'chosen explicitly.'.format(name, name)
+        )
+    return detected, header_length
@@ -1,18 +1,80 @@
 """
-    Entrypoint module for PupDB's gunicorn-based Flask server.
+    Entrypoint module for PupDB's gunicorn-based Flask server, for its
+    uvicorn-based ASGI server, and for its wire protocol server.
 """
 
 import os
 import subprocess
 
-from pupdb import rest
+DEFAULT_HOST = '127.0.0.1'
+DEFAULT_PORT = 4000
 
 
 def start_http_server():
     """ Python wrapper around start_http_server script. """
 
-    dirpath = os.path.dirname(rest.__file__)
+    dirpath = os.path.dirname(os.path.abspath(__file__))
     subprocess.call(
         'env PYTHONPATH={} {}/start_http_server'.format(
             dirpath, dirpath), shell=True
     )
+
+
+def start_asgi_server(host=None, port=None, workers=None):
+    """
+        Starts the ASGI server of pupdb.asgi with uvicorn, listening on
+        host:port with the given number of worker processes. They default
+        to the PUPDB_HOST, PUPDB_PORT and PUPDB_WORKERS environment
+        variables, or else 127.0.0.1:4000 and a single worker.
+    """
+
+    try:
+        import uvicorn  # pylint: disable=import-outside-toplevel
+    except ImportError:
+        raise ImportError(
+            'The ASGI server requires the uvicorn package, '
+            'install it with: pip install uvicorn'
+        )
+
+    uvicorn.run(
+        'pupdb.asgi:APP',
+        host=host or os.environ.get('PUPDB_HOST') or DEFAULT_HOST,
+        port=int(port or os.environ.get('PUPDB_PORT') or DEFAULT_PORT),
+        workers=int(workers or os.environ.get('PUPDB_WORKERS') or 1),
+        log_level='warning',
+    )
+
+
+def start_wire_server(host=None, port=None, path=None, serializer=None):
+    """
+        Starts the wire protocol server of pupdb.wire, listening on
+        host:port, or on the Unix socket at path if given, with the
+        serializer of the messages. They default to the PUPDB_HOST,
+        PUPDB_WIRE_PORT, PUPDB_WIRE_SOCKET and PUPDB_WIRE_SERIALIZER
+        environment variables, or else 127.0.0.1:4001 and json. The
+        database is the one of the HTTP servers.
+    """
+
+    # pylint: disable=import-outside-toplevel
+    import asyncio
+    from pupdb.http_utils import database_options
+    from pupdb.wire import DEFAULT_PORT as DEFAULT_WIRE_PORT, WireServer
+
+    server = WireServer(
+        os.environ.get('PUPDB_FILE_PATH') or 'pupdb.json',
+        serializer or os.environ.get('PUPDB_WIRE_SERIALIZER') or 'json',
+        **database_options()
+    )
+    loop = asyncio.new_event_loop()
+    asyncio.set_event_loop(loop)
+    loop.run_until_complete(server.start(
+        host or os.environ.get('PUPDB_HOST') or DEFAULT_HOST,
+        int(port or os.environ.get('PUPDB_WIRE_PORT') or DEFAULT_WIRE_PORT),
+        path or os.environ.get('PUPDB_WIRE_SOCKET')
+    ))
+    try:
+        loop.run_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        loop.run_until_complete(server.close())
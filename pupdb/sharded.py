@@ -0,0 +1,391 @@
+"""
+    Module containing the sharded variant of the PupDB database, which
+    hash-partitions the keys across several PupDB database files.
+"""
+
+import heapq
+import json
+import logging
+import os
+import traceback
+import zlib
+
+from filelock import FileLock
+
+from pupdb.core import PupDB, _write_file, decode_cursor, scan_items
+from pupdb.secondary_index import SecondaryIndex
+
+DEFAULT_NUM_SHARDS = 8
+
+
+# pylint: disable=useless-object-inheritance
+class ShardedPupDB(object):
+    """
+        This class represents a PupDB database whose keys are spread over
+        num_shards PupDB database files, each with its own lock, so that
+        writes to different shards run in parallel and only rewrite
+        the data of their shard.
+    """
+
+    def __init__(self, db_file_path, num_shards=None, **kwargs):
+        """
+            Initializes the sharded database instance.
+
+            The shard files are named after db_file_path, e.g. db.0.json,
+            db.1.json, ... for db.json, and their number is recorded in
+            db_file_path + '.shards'. It defaults to DEFAULT_NUM_SHARDS
+            for new databases. The other keyword arguments are passed on
+            to the PupDB instance of each shard, except for value_cache,
+            whose limits are divided between the shards.
+        """
+
+        self.db_file_path = db_file_path
+        self.manifest_file_path = '{}.shards'.format(db_file_path)
+        self.num_shards = self._init_manifest(num_shards)
+
+        root, ext = os.path.splitext(db_file_path)
+        value_cache = kwargs.pop('value_cache', None)
+        self.shards = [
+            PupDB(
+                '{}.{}{}'.format(root, index, ext),
+                value_cache=None if value_cache is None
+                else value_cache.split(self.num_shards),
+                **kwargs
+            )
+            for index in range(self.num_shards)
+        ]
+
+    def _init_manifest(self, num_shards):
+        """
+            Reads the number of shards from the manifest file, or creates it.
+            Raises a ValueError if it doesn't match num_shards.
+        """
+
+        with FileLock('{}.lock'.format(self.manifest_file_path)):
+            if os.path.exists(self.manifest_file_path):
+                with open(self.manifest_file_path, 'r') as manifest_file:
+                    manifest = json.loads(manifest_file.read())
+                if num_shards is not None and \
+                        num_shards != manifest['num_shards']:
+                    raise ValueError(
+                        'Database {} has {} shards, not {}'.format(
+                            self.db_file_path, manifest['num_shards'],
+                            num_shards
+                        )
+                    )
+                return manifest['num_shards']
+
+            if num_shards is None:
+                num_shards = DEFAULT_NUM_SHARDS
+            if num_shards < 1:
+                raise ValueError('The number of shards must be positive.')
+            _write_file(
+                self.manifest_file_path,
+                json.dumps({'num_shards': num_shards}).encode('utf-8')
+            )
+            return num_shards
+
+    def __repr__(self):
+        """ String representation of this class instance. """
+
+        return str(self._get_database())
+
+    def __len__(self):
+        """ Function to return the size of iterable. """
+
+        return sum(len(shard) for shard in self.shards)
+
+    def shard_for(self, key):
+        """ Returns the PupDB instance of the shard holding the key. """
+
+        key = str(key).encode('utf-8')
+        return self.shards[(zlib.crc32(key) & 0xffffffff) % self.num_shards]
+
+    def _group_by_shard(self, keys):
+        """ Returns a dict of the keys grouped by their shard. """
+
+        groups = {}
+        for key in keys:
+            groups.setdefault(self.shard_for(key), []).append(key)
+        return groups
+
+    def _get_database(self):
+        """ Returns the merged database dicts of all shards. """
+
+        database = {}
+        for shard in self.shards:
+            # pylint: disable=protected-access
+            database.update(shard._get_database())
+        return database
+
+    def set(self, key, val, ttl=None):
+        """
+            Sets the value to a key in the database.
+            Overwrites the value if the key already exists.
+            The key expires after ttl seconds if given.
+        """
+
+        return self.shard_for(key).set(key, val, ttl)
+
+    def set_many(self, mapping, ttl=None):
+        """
+            Sets the values of multiple keys in the database, with a single
+            write per shard. Accepts a dict or an iterable of (key, val)
+            pairs. The keys expire after ttl seconds if given.
+        """
+
+        if isinstance(mapping, dict):
+            mapping = mapping.items()
+        groups = {}
+        for key, val in mapping:
+            groups.setdefault(self.shard_for(key), []).append((key, val))
+
+        result = True
+        for shard, pairs in groups.items():
+            result = shard.set_many(pairs, ttl) and result
+        return result
+
+    def update(self, *args, **kwargs):
+        """ Updates the database like dict.update(), see set_many(). """
+
+        return self.set_many(dict(*args, **kwargs))
+
+    def get(self, key):
+        """
+            Gets the value of a key from the database.
+            Returns None if the key is not found in the database.
+        """
+
+        return self.shard_for(key).get(key)
+
+    def get_many(self, keys):
+        """
+            Gets the values of multiple keys from the database, with a
+            single read per shard. Returns a dict of the values by key,
+            None for the keys not found in the database.
+        """
+
+        values = {}
+        for shard, shard_keys in self._group_by_shard(keys).items():
+            values.update(shard.get_many(shard_keys))
+        return values
+
+    def value_cache_stats(self):
+        """
+            Returns the counters and sizes of the value caches of the
+            shards summed up, or None if there are no value caches.
+        """
+
+        stats = None
+        for shard in self.shards:
+            shard_stats = shard.value_cache_stats()
+            if shard_stats is None:
+                return None
+            if stats is None:
+                stats = shard_stats
+            else:
+                for name, value in shard_stats.items():
+                    stats[name] += value
+        return stats
+
+    def expire(self, key, ttl):
+        """ Sets the key to expire after ttl seconds, see PupDB.expire(). """
+
+        return self.shard_for(key).expire(key, ttl)
+
+    def ttl(self, key):
+        """ Returns the seconds before the key expires, see PupDB.ttl(). """
+
+        return self.shard_for(key).ttl(key)
+
+    def sweep(self):
+        """ Removes the expired keys from all shards, see PupDB.sweep(). """
+
+        return sum(shard.sweep() for shard in self.shards)
+
+    def remove(self, key):
+        """
+            Removes a key from the database.
+        """
+
+        return self.shard_for(key).remove(key)
+
+    def remove_many(self, keys):
+        """
+            Removes multiple keys from the database, with a single write per
+            shard. Raises a KeyError, without removing any key, if one of
+            the keys is not found in the database: the locks of all the
+            shards of the keys are held from the check of the keys until
+            they are removed.
+        """
+
+        groups = self._group_by_shard(str(key) for key in keys)
+        # Locked in the same order by all writers, not to deadlock.
+        shards = sorted(groups, key=self.shards.index)
+        locked = []
+        try:
+            databases = []
+            for shard in shards:
+                shard.process_lock.acquire()
+                locked.append(shard)
+                # pylint: disable=protected-access
+                database, expiries = shard._get_database_with_expiries()
+                removed = set()
+                for key in groups[shard]:
+                    if key in removed or key not in database:
+                        raise KeyError(
+                            'Non-existent Key {} in database'.format(key)
+                        )
+                    removed.add(key)
+                databases.append((database, expiries))
+
+            result = True
+            for shard, (database, expiries) in zip(shards, databases):
+                records = [
+                    {'op': 'remove', 'key': key} for key in groups[shard]
+                ]
+                try:
+                    # pylint: disable=protected-access
+                    shard._write_records(records, database, expiries)
+                except Exception:  # pylint: disable=broad-except
+                    logging.error(
+                        'Error while writing to DB: %s',
+                        traceback.format_exc()
+                    )
+                    result = False
+            return result
+        finally:
+            for shard in reversed(locked):
+                shard.process_lock.release()
+
+    def keys(self):
+        """ Returns a list of all the keys in the database. """
+
+        return [key for shard in self.shards for key in shard.keys()]
+
+    def values(self):
+        """ Returns a list of all the values in the database. """
+
+        return [val for shard in self.shards for val in shard.values()]
+
+    def items(self):
+        """
+            Returns a list of all the items i.e. (key, val) pairs
+            in the database.
+        """
+
+        return [item for shard in self.shards for item in shard.items()]
+
+    def iter_keys(self, prefix=None, start=None, stop=None):
+        """
+            Returns an iterator over the keys in the database sorted by key,
+            merged from the shards, see PupDB.iter_keys().
+        """
+
+        return heapq.merge(*[
+            shard.iter_keys(prefix, start, stop) for shard in self.shards
+        ])
+
+    def iter_values(self, prefix=None, start=None, stop=None):
+        """
+            Returns an iterator over the values in the database sorted by
+            key, filtered like iter_keys().
+        """
+
+        for _, val in self.iter_items(prefix, start, stop):
+            yield val
+
+    def iter_items(self, prefix=None, start=None, stop=None):
+        """
+            Returns an iterator over the (key, val) pairs in the database
+            sorted by key, filtered like iter_keys().
+        """
+
+        # Each key is in a single shard, so only keys are ever compared.
+        return heapq.merge(*[
+            shard.iter_items(prefix, start, stop) for shard in self.shards
+        ])
+
+    def range(self, start=None, stop=None):
+        """
+            Returns an iterator over the (key, val) pairs with
+            start <= key < stop, sorted by key.
+        """
+
+        return self.iter_items(start=start, stop=stop)
+
+    def prefix(self, prefix):
+        """
+            Returns an iterator over the (key, val) pairs whose key starts
+            with prefix, sorted by key.
+        """
+
+        return self.iter_items(prefix=prefix)
+
+    def scan(self, cursor=None, limit=100, prefix=None):
+        """
+            Returns a page of the (key, val) pairs in the database sorted by
+            key, and the cursor of the next page, see PupDB.scan().
+        """
+
+        start = decode_cursor(cursor) if cursor is not None else None
+        return scan_items(
+            self.iter_items(prefix=prefix, start=start), cursor, limit
+        )
+
+    def create_index(self, field):
+        """ Creates a secondary index on a field in every shard. """
+
+        created = [shard.create_index(field) for shard in self.shards]
+        return any(created)
+
+    def drop_index(self, field):
+        """ Removes the secondary index on a field from every shard. """
+
+        for shard in self.shards:
+            shard.drop_index(field)
+        return True
+
+    def find(self, *args, **kwargs):
+        """
+            Returns the list of (key, val) pairs, sorted by key, matching
+            the indexed fields, see PupDB.find().
+        """
+
+        return sorted(
+            item for shard in self.shards
+            for item in shard.find(*args, **kwargs)
+        )
+
+    def find_range(self, field, start=None, stop=None):
+        """
+            Returns the list of (key, val) pairs, sorted by field and key,
+            in the range of the indexed field, see PupDB.find_range().
+        """
+
+        index = SecondaryIndex(field)
+        return sorted(
+            (
+                item for shard in self.shards
+                for item in shard.find_range(field, start, stop)
+            ),
+            key=lambda item: (index.extract(item[1]), item[0])
+        )
+
+    def dumps(self):
+        """ Returns a string dump of the entire database sorted by key. """
+
+        return json.dumps(self._get_database(), sort_keys=True)
+
+    def compact(self, blocking=True):
+        """ Compacts the append logs of all shards, see PupDB.compact(). """
+
+        compacted = [shard.compact(blocking) for shard in self.shards]
+        return any(compacted)
+
+    def truncate_db(self):
+        """ Truncates the entire database (makes it empty). """
+
+        for shard in self.shards:
+            shard.truncate_db()
+        return True
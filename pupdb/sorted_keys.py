@@ -0,0 +1,122 @@
+"""
+    Sorted key index of the databases cached by PupDB.
+"""
+
+import bisect
+import heapq
+
+# Number of added keys above which they are merged into the sorted keys at
+# once, rather than inserted one by one.
+_MERGE_THRESHOLD = 16
+
+
+def prefix_range(prefix):
+    """
+        Returns the (start, stop) range of the keys starting with prefix,
+        where stop is None if there is no upper bound.
+    """
+
+    stop = prefix
+    while stop and ord(stop[-1]) >= 0x10ffff:
+        stop = stop[:-1]
+    if not stop:
+        return prefix, None
+    return prefix, stop[:-1] + chr(ord(stop[-1]) + 1)
+
+
+class SortedKeyDict(dict):
+    """
+        dict which keeps a sorted list of its keys, updated incrementally
+        as keys are added and removed, for ordered and range iteration
+        without sorting all the keys again.
+
+        The sorted list is built on first use. Added keys are inserted
+        in it when it is next used.
+    """
+
+    def __init__(self, *args, **kwargs):
+        """ Initializes the dict like dict(). """
+
+        super(SortedKeyDict, self).__init__(*args, **kwargs)
+        self._sorted = None
+        self._added = set()
+
+    def __setitem__(self, key, val):
+        """ Sets the value of the key. """
+
+        if self._sorted is not None and key not in self:
+            self._added.add(key)
+        super(SortedKeyDict, self).__setitem__(key, val)
+
+    def __delitem__(self, key):
+        """ Removes the key. """
+
+        super(SortedKeyDict, self).__delitem__(key)
+        self._discard(key)
+
+    def _discard(self, key):
+        """ Removes a removed key from the sorted keys. """
+
+        if self._sorted is None:
+            return
+        if key in self._added:
+            self._added.discard(key)
+            return
+        del self._sorted[bisect.bisect_left(self._sorted, key)]
+
+    def pop(self, key, *default):
+        """ Removes the key and returns its value, like dict.pop(). """
+
+        if key in self:
+            self._discard(key)
+        return super(SortedKeyDict, self).pop(key, *default)
+
+    def popitem(self):
+        """ Removes and returns a (key, val) pair, like dict.popitem(). """
+
+        key, val = super(SortedKeyDict, self).popitem()
+        self._discard(key)
+        return key, val
+
+    def setdefault(self, key, default=None):
+        """ Returns the value of the key, set to default if missing. """
+
+        if key not in self:
+            self[key] = default
+        return self[key]
+
+    def update(self, *args, **kwargs):
+        """ Updates the dict, like dict.update(). """
+
+        for key, val in dict(*args, **kwargs).items():
+            self[key] = val
+
+    def clear(self):
+        """ Removes all keys. """
+
+        super(SortedKeyDict, self).clear()
+        self._sorted = []
+        self._added = set()
+
+    def sorted_keys(self):
+        """ Returns the sorted list of the keys, not to be modified. """
+
+        if self._sorted is None:
+            self._sorted = sorted(dict.keys(self))
+        elif len(self._added) > _MERGE_THRESHOLD:
+            self._sorted = list(
+                heapq.merge(self._sorted, sorted(self._added))
+            )
+        else:
+            for key in self._added:
+                bisect.insort(self._sorted, key)
+        self._added = set()
+        return self._sorted
+
+    def irange(self, start=None, stop=None):
+        """ Returns a sorted list of the keys with start <= key < stop. """
+
+        keys = self.sorted_keys()
+        low = 0 if start is None else bisect.bisect_left(keys, start)
+        high = len(keys) if stop is None else bisect.bisect_left(keys, stop)
+        return keys[low:high]
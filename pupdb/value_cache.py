@@ -0,0 +1,201 @@
+"""
+    Bounded in-memory cache of the values read by PupDB.get().
+"""
+
+import sys
+from collections import OrderedDict
+
+POLICY_LRU = 'lru'
+POLICY_LFU = 'lfu'
+POLICIES = (POLICY_LRU, POLICY_LFU)
+
+
+def approximate_size(value):
+    """ Returns the approximate memory size of a json-like value. """
+
+    size = sys.getsizeof(value)
+    if isinstance(value, dict):
+        for key, val in value.items():
+            size += approximate_size(key) + approximate_size(val)
+    elif isinstance(value, (list, tuple, set)):
+        for val in value:
+            size += approximate_size(val)
+    return size
+
+
+# pylint: disable=useless-object-inheritance
+class ValueCache(object):
+    """
+        Cache of values by key, bounded by a number of entries and/or an
+        approximate number of bytes, evicting the least recently used
+        ('lru' policy) or least frequently used ('lfu' policy, the least
+        recently used first among equally used) entries first.
+
+        The cache is not thread-safe by itself, PupDB guards it with a lock.
+    """
+
+    def __init__(self, max_entries=None, max_bytes=None, policy=POLICY_LRU):
+        """
+            Initializes an empty cache with the limits and eviction policy.
+            At least one of max_entries and max_bytes must be given.
+        """
+
+        if max_entries is None and max_bytes is None:
+            raise ValueError('A value cache needs max_entries or max_bytes.')
+        if (max_entries is not None and max_entries < 1) or \
+                (max_bytes is not None and max_bytes < 1):
+            raise ValueError('The value cache limits must be positive.')
+        if policy not in POLICIES:
+            raise ValueError(
+                'Invalid cache policy {}, expected one of: {}'.format(
+                    policy, ', '.join(POLICIES)
+                )
+            )
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.policy = policy
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+        self.size = 0
+        # key -> [value, size, expiry time, use count]
+        self._entries = {}
+        # Keys by use count, each in least recently used first order.
+        # The 'lru' policy uses a single count.
+        self._order = {}
+        self._min_count = 1
+
+    def split(self, parts):
+        """
+            Returns an empty cache with the same policy, whose limits are
+            those of this cache divided between the parts, rounded up.
+        """
+
+        def divide(limit):
+            """ Divides a limit between the parts. """
+
+            return None if limit is None else -(-limit // parts)
+
+        return ValueCache(
+            divide(self.max_entries), divide(self.max_bytes), self.policy
+        )
+
+    def __len__(self):
+        """ Returns the number of cached values. """
+
+        return len(self._entries)
+
+    def __contains__(self, key):
+        """ Tells whether the key has a cached value. """
+
+        return key in self._entries
+
+    def stats(self):
+        """ Returns a dict of the counters and the size of the cache. """
+
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'evictions': self.evictions,
+            'invalidations': self.invalidations,
+            'entries': len(self._entries),
+            'bytes': self.size,
+        }
+
+    def _touch(self, key, entry):
+        """ Records a use of the entry of the key. """
+
+        count = entry[3]
+        keys = self._order[count]
+        del keys[key]
+        if self.policy == POLICY_LFU:
+            if not keys:
+                del self._order[count]
+                if self._min_count == count:
+                    self._min_count = count + 1
+            count += 1
+            entry[3] = count
+        self._order.setdefault(count, OrderedDict())[key] = None
+
+    def get(self, key, now):
+        """
+            Returns (True, value) for a cached value not expired at the
+            time now, or (False, None) for a miss.
+        """
+
+        entry = self._entries.get(key)
+        if entry is None or (entry[2] is not None and entry[2] <= now):
+            if entry is not None:
+                self.invalidate(key)
+            self.misses += 1
+            return False, None
+        self.hits += 1
+        self._touch(key, entry)
+        return True, entry[0]
+
+    def put(self, key, value, expires=None):
+        """
+            Caches the value of the key, until the expiry time expires if
+            given, evicting other values if needed.
+        """
+
+        self.invalidate(key, count=False)
+        size = approximate_size(key) + approximate_size(value)
+        if self.max_bytes is not None and size > self.max_bytes:
+            return
+        # Evicted before adding the value, which would otherwise be the
+        # least frequently used one.
+        while (self.max_entries is not None and
+               len(self._entries) >= self.max_entries) or \
+                (self.max_bytes is not None and
+                 self.size + size > self.max_bytes):
+            self._evict()
+        self._entries[key] = [value, size, expires, 1]
+        self._order.setdefault(1, OrderedDict())[key] = None
+        self._min_count = 1
+        self.size += size
+
+    def _evict(self):
+        """ Evicts the entry chosen by the eviction policy. """
+
+        while self._min_count not in self._order:
+            self._min_count += 1
+        key = next(iter(self._order[self._min_count]))
+        self._remove(key)
+        self.evictions += 1
+
+    def _remove(self, key):
+        """ Removes the entry of the key. """
+
+        entry = self._entries.pop(key)
+        keys = self._order[entry[3]]
+        del keys[key]
+        if not keys:
+            del self._order[entry[3]]
+        self.size -= entry[1]
+
+    def invalidate(self, key, count=True):
+        """ Removes the cached value of the key, if any. """
+
+        if key in self._entries:
+            self._remove(key)
+            if count:
+                self.invalidations += 1
+
+    def clear(self):
+        """ Removes all cached values. """
+
+        self.invalidations += len(self._entries)
+        self._entries = {}
+        self._order = {}
+        self._min_count = 1
+        self.size = 0
+
+    def apply_record(self, record):
+        """ Invalidates the values changed by an append log record. """
+
+        if record['op'] == 'clear':
+            self.clear()
+        else:
+            self.invalidate(record['key'])
@@ -0,0 +1,536 @@
+"""
+    Module containing the binary wire protocol server of PupDB, a compact
+    alternative to its HTTP interfaces for co-located clients, over TCP or
+    Unix sockets, and its client.
+
+    Each message is a frame: the length of the message, as a 4-byte
+    big-endian unsigned integer, followed by the message, serialized by
+    the serializer of the server (json by default, or e.g. msgpack).
+    Requests are lists [operation, arguments...], see OPERATIONS, answered
+    by [status, result] responses in the order of the requests. Clients
+    may send several requests without waiting for their responses, which
+    are served as if they were sent one at a time.
+
+    Requires Python 3.5+.
+"""
+
+import asyncio
+import logging
+import os
+import socket
+import struct
+import traceback
+
+from pupdb.aio import AsyncPupDB
+from pupdb.core import PupDB
+from pupdb.http_utils import MAX_BATCH_SIZE, MAX_SCAN_LIMIT
+from pupdb.serializers import get_serializer
+
+DEFAULT_HOST = '127.0.0.1'
+DEFAULT_PORT = 4001
+
+# Maximum length of a message.
+MAX_FRAME_SIZE = 64 * 1024 * 1024
+
+# Operations of the requests, with the PupDB methods they call.
+OPERATIONS = (
+    'ping', 'get', 'get_many', 'set', 'set_many', 'remove', 'remove_many',
+    'len', 'scan', 'truncate_db',
+)
+
+# Operations which don't change the database, served concurrently.
+READ_OPERATIONS = ('ping', 'get', 'get_many', 'len', 'scan')
+
+# Statuses of the responses.
+STATUS_OK = 0
+STATUS_KEY_ERROR = 1
+STATUS_VALUE_ERROR = 2
+STATUS_ERROR = 3
+
+_FRAME_LENGTH = struct.Struct('>I')
+
+
+def wire_serializer(serializer):
+    """
+        Returns the serializer of the messages for a serializer name or
+        Serializer instance. Raises a ValueError for the serializers which
+        can't be used on untrusted messages.
+    """
+
+    serializer = get_serializer(serializer)
+    if serializer.trusted_only or serializer.name == 'indexed':
+        raise ValueError(
+            'The {} serializer can\'t be used by the wire protocol.'.format(
+                serializer.name
+            )
+        )
+    return serializer
+
+
+def dumps_frame(serializer, message):
+    """ Returns the frame of a message. """
+
+    data = serializer.dumps(message)
+    return _FRAME_LENGTH.pack(len(data)) + data
+
+
+def _check_batch(elements):
+    """ Raises a ValueError for the batches of too many elements. """
+
+    if len(elements) > MAX_BATCH_SIZE:
+        raise ValueError(
+            'At most {} keys can be given at once'.format(MAX_BATCH_SIZE)
+        )
+
+
+# pylint: disable=useless-object-inheritance
+class WireServer(object):
+    """
+        Server of a PupDB database over the wire protocol.
+
+        The requests are served by an AsyncPupDB instance with the read
+        cache, so that concurrent requests of all the connections are
+        merged into single reads and writes of the database. Each
+        connection serves its consecutive reads concurrently, and each
+        other request once the requests before it are served, so that it
+        reads its own writes. Responses are sent in order.
+    """
+
+    def __init__(self, db_file_path, serializer='json', **kwargs):
+        """
+            Initializes the server of the database. The keyword arguments
+            are passed on to AsyncPupDB, with the read cache by default.
+        """
+
+        self.serializer = wire_serializer(serializer)
+        kwargs.setdefault('cache', True)
+        self.database = AsyncPupDB(db_file_path, **kwargs)
+        self.servers = []
+
+    async def start(self, host=DEFAULT_HOST, port=DEFAULT_PORT, path=None):
+        """
+            Starts listening on host:port, or on the Unix socket at path
+            if given. Returns the asyncio server.
+        """
+
+        if path is not None:
+            if os.path.exists(path):
+                os.remove(path)
+            server = await asyncio.start_unix_server(self.handle, path)
+        else:
+            server = await asyncio.start_server(self.handle, host, port)
+        self.servers.append(server)
+        return server
+
+    async def close(self):
+        """ Stops listening, and closes the database. """
+
+        for server in self.servers:
+            server.close()
+            await server.wait_closed()
+        self.servers = []
+        self.database.close()
+
+    async def handle(self, reader, writer):
+        """ Serves the requests of a connection. """
+
+        sock = writer.get_extra_info('socket')
+        if sock is not None and sock.family != getattr(socket, 'AF_UNIX', -1):
+            sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+
+        responses = asyncio.Queue()
+        sender = asyncio.ensure_future(self._send(responses, writer))
+        # The last request other than a read, and the reads since then.
+        last_write, reads = None, []
+        try:
+            while not sender.done():
+                try:
+                    header = await reader.readexactly(_FRAME_LENGTH.size)
+                    length = _FRAME_LENGTH.unpack(header)[0]
+                    if length > MAX_FRAME_SIZE:
+                        logging.error(
+                            'Closing a wire connection sending a message '
+                            'of %d bytes.', length
+                        )
+                        break
+                    data = await reader.readexactly(length)
+                except (asyncio.IncompleteReadError, ConnectionError):
+                    break
+                request = self._loads(data)
+                if isinstance(request, list) and request and \
+                        request[0] in READ_OPERATIONS:
+                    response = asyncio.ensure_future(
+                        self._serve_request(request, [last_write])
+                    )
+                    reads = [read for read in reads if not read.done()]
+                    reads.append(response)
+                else:
+                    response = asyncio.ensure_future(
+                        self._serve_request(request, reads + [last_write])
+                    )
+                    last_write, reads = response, []
+                responses.put_nowait(response)
+        finally:
+            responses.put_nowait(None)
+            await sender
+            writer.close()
+
+    @staticmethod
+    async def _send(responses, writer):
+        """ Sends the responses of a connection, in order. """
+
+        while True:
+            response = await responses.get()
+            if response is None:
+                return
+            try:
+                writer.write(await response)
+                if responses.empty():
+                    await writer.drain()
+            except ConnectionError:
+                return
+
+    async def serve(self, data):
+        """ Returns the response frame of a request message. """
+
+        return await self._serve_request(self._loads(data))
+
+    def _loads(self, data):
+        """
+            Returns the request of a message, or the exception raised while
+            deserializing it.
+        """
+
+        try:
+            return self.serializer.loads(data)
+        except Exception as err:  # pylint: disable=broad-except
+            return err
+
+    async def _serve_request(self, request, after=()):
+        """
+            Returns the response frame of a request (see _loads()), served
+            once the futures of after are done.
+        """
+
+        after = [future for future in after
+                 if future is not None and not future.done()]
+        if after:
+            await asyncio.wait(after)
+        try:
+            if isinstance(request, Exception):
+                raise request
+            if not isinstance(request, list) or not request or \
+                    request[0] not in OPERATIONS:
+                raise ValueError('Invalid request, expected a list '
+                                 '[operation, arguments...]')
+            response = [STATUS_OK, await getattr(
+                self, '_' + request[0]
+            )(*request[1:])]
+        except KeyError as key_err:
+            response = [STATUS_KEY_ERROR, str(key_err.args[0])]
+        except (ValueError, TypeError) as err:
+            response = [STATUS_VALUE_ERROR, str(err)]
+        except Exception:  # pylint: disable=broad-except
+            logging.error(
+                'Error while serving a wire request: %s',
+                traceback.format_exc()
+            )
+            response = [STATUS_ERROR, 'Unable to process this request.']
+        return dumps_frame(self.serializer, response)
+
+    @staticmethod
+    async def _ping():
+        """ Answers a ping request. """
+
+        return 'pong'
+
+    async def _get(self, key):
+        """ Serves a get request. """
+
+        return await self.database.get(key)
+
+    async def _get_many(self, keys):
+        """ Serves a get_many request. """
+
+        _check_batch(keys)
+        return await self.database.get_many(keys)
+
+    async def _set(self, key, val, ttl=None):
+        """ Serves a set request. """
+
+        return await self.database.set(key, val, ttl)
+
+    async def _set_many(self, items, ttl=None):
+        """ Serves a set_many request, of a dict or [key, val] pairs. """
+
+        _check_batch(items)
+        return await self.database.set_many(items, ttl)
+
+    async def _remove(self, key):
+        """ Serves a remove request. """
+
+        return await self.database.remove(key)
+
+    async def _remove_many(self, keys):
+        """ Serves a remove_many request. """
+
+        _check_batch(keys)
+        return await self.database.remove_many(keys)
+
+    async def _len(self):
+        """ Serves a len request. """
+
+        return await self.database.length()
+
+    async def _scan(self, cursor=None, limit=100, prefix=None):
+        """ Serves a scan request, returning [items, cursor]. """
+
+        if not isinstance(limit, int) or limit > MAX_SCAN_LIMIT:
+            raise ValueError(
+                'Parameter \'limit\' must be an integer of at most {}'.format(
+                    MAX_SCAN_LIMIT
+                )
+            )
+        items, cursor = await self.database.run(
+            PupDB.scan, cursor, limit, prefix
+        )
+        return [[list(item) for item in items], cursor]
+
+    async def _truncate_db(self):
+        """ Serves a truncate_db request. """
+
+        return await self.database.run(PupDB.truncate_db)
+
+
+class WireClient(object):
+    """
+        Client of a WireServer, with the interface of PupDB.
+
+        A WireClient instance keeps one connection, and must not be used
+        by several threads at once.
+    """
+
+    def __init__(self, host=DEFAULT_HOST, port=DEFAULT_PORT, path=None,
+                 serializer='json', timeout=30):
+        """
+            Initializes the client of the server at host:port, or at the
+            Unix socket at path if given, which uses the serializer.
+        """
+
+        self.serializer = wire_serializer(serializer)
+        if path is not None:
+            self._socket = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            self._socket.settimeout(timeout)
+            self._socket.connect(path)
+        else:
+            self._socket = socket.create_connection((host, port), timeout)
+            self._socket.setsockopt(
+                socket.IPPROTO_TCP, socket.TCP_NODELAY, 1
+            )
+        self._buffer = bytearray()
+
+    def __enter__(self):
+        """ Returns the client, closed when leaving the with block. """
+
+        return self
+
+    def __exit__(self, exc_type, exc_value, exc_traceback):
+        """ Closes the client. """
+
+        self.close()
+
+    def __len__(self):
+        """ Returns the number of keys in the database. """
+
+        return self.request('len')
+
+    def close(self):
+        """ Closes the connection. """
+
+        self._socket.close()
+
+    def _receive(self, size):
+        """ Returns the next size bytes of the connection. """
+
+        while len(self._buffer) < size:
+            data = self._socket.recv(max(size - len(self._buffer), 65536))
+            if not data:
+                raise IOError('Connection closed by the server.')
+            self._buffer.extend(data)
+        data = bytes(self._buffer[:size])
+        del self._buffer[:size]
+        return data
+
+    def _read_response(self):
+        """ Returns the next [status, result] response. """
+
+        length = _FRAME_LENGTH.unpack(self._receive(_FRAME_LENGTH.size))[0]
+        return self.serializer.loads(self._receive(length))
+
+    @staticmethod
+    def _result(response):
+        """
+            Returns the result of a response, or raises its KeyError,
+            ValueError or IOError.
+        """
+
+        status, result = response
+        if status == STATUS_OK:
+            return result
+        if status == STATUS_KEY_ERROR:
+            raise KeyError(result)
+        if status == STATUS_VALUE_ERROR:
+            raise ValueError(result)
+        raise IOError(result)
+
+    def request(self, operation, *args):
+        """ Sends a request, and returns its result. """
+
+        return self.execute([[operation] + list(args)])[0]
+
+    def execute(self, requests):
+        """
+            Sends the [operation, arguments...] requests at once, and
+            returns their results. Raises the error of the first failed
+            request, once all the responses are read.
+        """
+
+        self._socket.sendall(b''.join(
+            dumps_frame(self.serializer, request) for request in requests
+        ))
+        responses = [self._read_response() for _ in requests]
+        return [self._result(response) for response in responses]
+
+    def pipeline(self):
+        """ Returns a pipeline of requests, sent at once by execute(). """
+
+        return Pipeline(self)
+
+    def ping(self):
+        """ Returns 'pong', after a round trip to the server. """
+
+        return self.request('ping')
+
+    def get(self, key):
+        """
+            Gets the value of a key from the database.
+            Returns None if the key is not found in the database.
+        """
+
+        return self.request('get', str(key))
+
+    def get_many(self, keys):
+        """
+            Gets the values of multiple keys from the database at once.
+            Returns a dict of the values by key, None for the keys not
+            found in the database.
+        """
+
+        return self.request('get_many', [str(key) for key in keys])
+
+    def set(self, key, val, ttl=None):
+        """
+            Sets the value to a key in the database.
+            Overwrites the value if the key already exists.
+            The key expires after ttl seconds if given.
+        """
+
+        return self.request('set', str(key), val, ttl)
+
+    def set_many(self, mapping, ttl=None):
+        """
+            Sets the values of multiple keys in the database at once.
+            Accepts a dict or an iterable of (key, val) pairs.
+            The keys expire after ttl seconds if given.
+        """
+
+        if isinstance(mapping, dict):
+            mapping = mapping.items()
+        return self.request(
+            'set_many', [[str(key), val] for key, val in mapping], ttl
+        )
+
+    def remove(self, key):
+        """
+            Removes a key from the database.
+            Raises a KeyError if the key is not found in the database.
+        """
+
+        return self.request('remove', str(key))
+
+    def remove_many(self, keys):
+        """
+            Removes multiple keys from the database at once.
+            Raises a KeyError, without removing any key, if one of the keys
+            is not found in the database.
+        """
+
+        return self.request('remove_many', [str(key) for key in keys])
+
+    def scan(self, cursor=None, limit=100, prefix=None):
+        """
+            Returns a page of at most limit (key, val) pairs and the cursor
+            of the next page, see PupDB.scan().
+        """
+
+        items, cursor = self.request('scan', cursor, limit, prefix)
+        return [tuple(item) for item in items], cursor
+
+    def truncate_db(self):
+        """ Truncates the entire database (makes it empty). """
+
+        return self.request('truncate_db')
+
+
+class Pipeline(object):
+    """
+        Queue of requests of a WireClient, sent at once by execute(),
+        without waiting for the responses of the previous requests.
+    """
+
+    def __init__(self, client):
+        """ Initializes an empty pipeline of the client. """
+
+        self.client = client
+        self._requests = []
+        self.results = None
+
+    def __enter__(self):
+        """ Returns the pipeline, executed when leaving the with block. """
+
+        return self
+
+    def __exit__(self, exc_type, exc_value, exc_traceback):
+        """ Executes the pipeline, unless the with block raised. """
+
+        if exc_type is None:
+            self.execute()
+
+    def get(self, key):
+        """ Queues a get() of the key. """
+
+        self._requests.append(['get', str(key)])
+        return self
+
+    def set(self, key, val, ttl=None):
+        """ Queues a set() of the key. """
+
+        self._requests.append(['set', str(key), val, ttl])
+        return self
+
+    def remove(self, key):
+        """ Queues a remove() of the key. """
+
+        self._requests.append(['remove', str(key)])
+        return self
+
+    def execute(self):
+        """
+            Sends the queued requests, and returns the list of their
+            results. Raises the error of the first failed request, e.g. a
+            KeyError for a remove() of a missing key.
+        """
+
+        requests, self._requests = self._requests, []
+        self.results = self.client.execute(requests)
+        return self.results
@@ -31,6 +31,13 @@ setup(
         'flask',
         'gunicorn'
     ],
+    extras_require={
+        'orjson': ['orjson'],
+        'ujson': ['ujson'],
+        'msgpack': ['msgpack'],
+        'asgi': ['uvicorn'],
+        'zstd': ['zstandard'],
+    },
     classifiers=[
         'Development Status :: 4 - Beta',
         'Intended Audience :: Developers',
@@ -0,0 +1,13 @@
+"""
+    Configuration of the tests of PupDB.
+"""
+
+import sys
+
+# The tests of the asyncio interfaces use the async syntax of Python 3.5+,
+# so older versions can't even collect them.
+collect_ignore = []  # pylint: disable=invalid-name
+if sys.version_info < (3, 5):
+    collect_ignore.extend([
+        'test_aio.py', 'test_asgi.py', 'test_client.py', 'test_wire.py'
+    ])
@@ -0,0 +1,156 @@
+"""
+    Tests for the asyncio interface to PupDB.
+"""
+
+import asyncio
+import logging
+import os
+
+import pytest
+
+from pupdb.aio import AsyncPupDB
+from pupdb.core import PupDB
+
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s | %(process)d | %(levelname)s | %(message)s'
+)
+
+
+TEST_DB_PATH = 'testdb.json'
+TEST_DB_LOCK_PATH = '{}.lock'.format(TEST_DB_PATH)
+TEST_DB_GENERATION_PATH = '{}.gen'.format(TEST_DB_PATH)
+TEST_DB_LOG_PATH = '{}.log'.format(TEST_DB_PATH)
+TEST_DB_COMPACTION_LOCK_PATH = '{}.compact.lock'.format(TEST_DB_PATH)
+
+
+@pytest.fixture(autouse=True)
+def run_around_tests():
+    """ Function is invoked around each test run. """
+
+    logging.debug('Test started.')
+    yield
+    logging.debug('Test ended.')
+
+    for path in (
+            TEST_DB_PATH, TEST_DB_LOCK_PATH, TEST_DB_GENERATION_PATH,
+            TEST_DB_LOG_PATH, TEST_DB_COMPACTION_LOCK_PATH):
+        if os.path.exists(path):
+            os.remove(path)
+
+
+def run(awaitable):
+    """ Runs the awaitable in a new event loop, returning its result. """
+
+    loop = asyncio.new_event_loop()
+    try:
+        return loop.run_until_complete(awaitable)
+    finally:
+        loop.close()
+
+
+async def gather(*awaitables):
+    """ Runs the awaitables concurrently, returning their results. """
+
+    return await asyncio.gather(*awaitables, return_exceptions=True)
+
+
+def count_writes(database):
+    """ Counts the calls to _write_records() of the AsyncPupDB instance. """
+
+    # pylint: disable=protected-access
+    write_records = database.database._write_records
+    calls = []
+
+    def counting_write_records(records, *args):
+        """ Wrapper around _write_records() recording the records. """
+
+        calls.append(records)
+        return write_records(records, *args)
+
+    database.database._write_records = counting_write_records
+    return calls
+
+
+def test_basic_operations():
+    """ Tests the awaitable operations of AsyncPupDB. """
+
+    database = AsyncPupDB(TEST_DB_PATH)
+    assert run(database.set('key', 'value'))
+    assert run(database.set_many({'other': 1, 'third': [1, 2]}))
+    assert run(database.get('key')) == 'value'
+    assert run(database.get('missing')) is None
+    assert run(database.get_many(['key', 'missing'])) == {
+        'key': 'value', 'missing': None
+    }
+    assert sorted(run(database.keys())) == ['key', 'other', 'third']
+    assert run(database.length()) == 3
+    assert sorted(run(database.items()))[0] == ('key', 'value')
+
+    assert run(database.remove('key'))
+    with pytest.raises(KeyError):
+        run(database.remove('key'))
+    assert run(database.remove_many(['other', 'third']))
+    assert not run(database.values())
+    assert run(database.run(PupDB.dumps)) == '{}'
+    database.close()
+
+
+@pytest.mark.parametrize('options', [{}, {'append_log': True}])
+def test_concurrent_writes(options):
+    """ Tests that concurrent writes are merged into fewer writes. """
+
+    database = AsyncPupDB(TEST_DB_PATH, **options)
+    writes = count_writes(database)
+
+    results = run(gather(
+        *[database.set(i, i) for i in range(100)]
+    ))
+    assert results == [True] * 100
+    assert len(writes) < 10
+    assert sum(len(records) for records in writes) == 100
+    assert PupDB(TEST_DB_PATH, **options).get('99') == 99
+    database.close()
+
+
+def test_concurrent_removes():
+    """ Tests that a failed remove doesn't fail the rest of its batch. """
+
+    database = AsyncPupDB(TEST_DB_PATH)
+    run(database.set_many({'a': 1, 'b': 2}))
+
+    results = run(gather(
+        database.remove('a'), database.remove('a'), database.set('c', 3),
+        database.remove('missing'), database.remove('c')
+    ))
+    assert results[0] is True
+    assert isinstance(results[1], KeyError)
+    assert isinstance(results[3], KeyError)
+    assert results[4] is True
+    assert run(database.keys()) == ['b']
+    database.close()
+
+
+def test_concurrent_reads():
+    """ Tests that concurrent reads share reads of the database. """
+
+    database = AsyncPupDB(TEST_DB_PATH)
+    run(database.set_many({str(i): i for i in range(10)}))
+
+    # pylint: disable=protected-access
+    get_database = database.database._get_database
+    reads = []
+
+    def counting_get_database():
+        """ Wrapper around _get_database() recording the call. """
+
+        reads.append(1)
+        return get_database()
+
+    database.database._get_database = counting_get_database
+    values = run(gather(
+        *[database.get(i % 10) for i in range(100)]
+    ))
+    assert values == [i % 10 for i in range(100)]
+    assert len(reads) < 100
+    database.close()
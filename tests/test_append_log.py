@@ -0,0 +1,276 @@
+"""
+    Tests for the append log storage mode of PupDB.
+"""
+
+import logging
+import os
+import json
+
+import pytest
+
+from pupdb.core import PupDB
+
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s | %(process)d | %(levelname)s | %(message)s'
+)
+
+
+TEST_DB_PATH = 'testdb.json'
+TEST_DB_LOCK_PATH = '{}.lock'.format(TEST_DB_PATH)
+TEST_DB_GENERATION_PATH = '{}.gen'.format(TEST_DB_PATH)
+TEST_DB_LOG_PATH = '{}.log'.format(TEST_DB_PATH)
+TEST_DB_COMPACTING_LOG_PATH = '{}.compacting'.format(TEST_DB_LOG_PATH)
+TEST_DB_COMPACTION_LOCK_PATH = '{}.compact.lock'.format(TEST_DB_PATH)
+
+
+@pytest.fixture(autouse=True)
+def run_around_tests():
+    """ Function is invoked around each test run. """
+
+    logging.debug('Test started.')
+    yield
+    logging.debug('Test ended.')
+
+    for path in (
+            TEST_DB_PATH, TEST_DB_LOCK_PATH, TEST_DB_GENERATION_PATH,
+            TEST_DB_LOG_PATH, TEST_DB_COMPACTING_LOG_PATH,
+            TEST_DB_COMPACTION_LOCK_PATH):
+        if os.path.exists(path):
+            os.remove(path)
+
+
+def test_log_get_and_set():
+    """ Tests that set() appends to the log and leaves the snapshot alone. """
+
+    database = PupDB(TEST_DB_PATH, append_log=True)
+    for i in range(10):
+        database.set(i, i)
+
+    for i in range(10):
+        assert database.get(i) == i
+
+    with open(TEST_DB_PATH, 'r') as db_file:
+        assert json.loads(db_file.read()) == {}
+
+    with open(TEST_DB_LOG_PATH, 'r') as log_file:
+        assert len(log_file.readlines()) == 10
+
+
+def test_log_remove():
+    """ Tests the remove() method of PupDB in append log mode. """
+
+    database = PupDB(TEST_DB_PATH, append_log=True)
+    for i in range(10):
+        database.set(i, i)
+
+    database.remove(0)
+
+    assert database.get(0) is None
+    assert len(database) == 9
+
+    with pytest.raises(KeyError):
+        database.remove(0)
+
+
+def test_log_batch():
+    """ Tests that batch writes append all records at once. """
+
+    database = PupDB(TEST_DB_PATH, append_log=True)
+    database.set_many({i: i for i in range(10)})
+    database.remove_many([0, 1])
+
+    assert sorted(database.keys()) == [str(i) for i in range(2, 10)]
+
+    with open(TEST_DB_LOG_PATH, 'r') as log_file:
+        assert len(log_file.readlines()) == 12
+
+
+def test_log_recovery():
+    """ Tests that a new instance replays the log over the snapshot. """
+
+    database = PupDB(TEST_DB_PATH)
+    database.set('snapshot_key', 1)
+
+    database = PupDB(TEST_DB_PATH, append_log=True)
+    database.set('log_key', 2)
+    database.set('snapshot_key', 3)
+
+    database = PupDB(TEST_DB_PATH, append_log=True)
+    assert json.loads(database.dumps()) == {'snapshot_key': 3, 'log_key': 2}
+
+
+def test_log_torn_record():
+    """ Tests that an incomplete trailing log record is discarded. """
+
+    database = PupDB(TEST_DB_PATH, append_log=True)
+    database.set('key', 'val')
+
+    with open(TEST_DB_LOG_PATH, 'a') as log_file:
+        log_file.write('{"op": "set", "key": "torn", "val')
+
+    assert database.get('torn') is None
+
+    database = PupDB(TEST_DB_PATH, append_log=True)
+    database.set('other_key', 'other_val')
+
+    assert json.loads(database.dumps()) == {
+        'key': 'val', 'other_key': 'other_val'
+    }
+
+
+@pytest.mark.parametrize('serializer', ['json', 'msgpack'])
+def test_log_torn_record_then_set(serializer):
+    """
+        Tests that a record torn by another writer is discarded before the
+        next append of an open instance.
+    """
+
+    if serializer == 'msgpack':
+        pytest.importorskip('msgpack')
+    database = PupDB(TEST_DB_PATH, append_log=True, serializer=serializer)
+    database.set('key', 'val')
+
+    with open(TEST_DB_LOG_PATH, 'rb') as log_file:
+        data = log_file.read()
+    # The first half of a copy of the last record.
+    with open(TEST_DB_LOG_PATH, 'ab') as log_file:
+        log_file.write(data[-(len(data) // 2):-1])
+
+    database.set('other_key', 'other_val')
+    database.set('third_key', 'third_val')
+
+    expected = {
+        'key': 'val', 'other_key': 'other_val', 'third_key': 'third_val'
+    }
+    assert dict(PupDB(
+        TEST_DB_PATH, append_log=True, serializer=serializer
+    ).items()) == expected
+    assert database.get('third_key') == 'third_val'
+
+
+@pytest.mark.parametrize('serializer', ['json', 'pickle'])
+def test_log_append_cost(serializer):
+    """
+        Tests that checking the end of the log before an append only reads
+        the records appended since the last append, whatever the log size.
+    """
+
+    writer = PupDB(
+        TEST_DB_PATH, append_log=True, serializer=serializer,
+        auto_compact=False
+    )
+    writer.set_many({i: 'x' * 100 for i in range(5000)})
+    database = PupDB(
+        TEST_DB_PATH, append_log=True, serializer=serializer,
+        auto_compact=False
+    )
+
+    scanned = []
+    complete_length = database.serializer.complete_length
+
+    def counting_complete_length(data):
+        """ Wrapper around complete_length() recording the data size. """
+
+        scanned.append(len(data))
+        return complete_length(data)
+
+    database.serializer.complete_length = counting_complete_length
+    for i in range(10):
+        database.set('key', i)
+    assert sum(scanned) == 0
+
+    # Only the record of the other writer is read.
+    writer.set('other_key', 'val')
+    database.set('key', 'val')
+    assert 0 < sum(scanned) < 100
+    assert database.get('other_key') == 'val'
+
+
+def test_log_truncate_db():
+    """ Tests the truncate_db() method of PupDB in append log mode. """
+
+    database = PupDB(TEST_DB_PATH, append_log=True)
+    for i in range(10):
+        database.set(i, i)
+
+    database.truncate_db()
+    database.set('key', 'val')
+
+    assert database.dumps() == json.dumps({'key': 'val'})
+
+
+def test_log_flush_database():
+    """ Tests that _flush_database() writes a snapshot and empties the log. """
+
+    database = PupDB(TEST_DB_PATH, append_log=True)
+    for i in range(10):
+        database.set(i, i)
+
+    # pylint: disable=protected-access
+    database._flush_database(database._get_database())
+
+    assert not os.path.exists(TEST_DB_LOG_PATH)
+    assert len(database) == 10
+
+
+def test_compact():
+    """ Tests that compact() folds the log into a new snapshot. """
+
+    database = PupDB(TEST_DB_PATH, append_log=True, auto_compact=False)
+    for i in range(10):
+        database.set(i, i)
+    database.remove(0)
+
+    assert database.compact()
+    assert not os.path.exists(TEST_DB_LOG_PATH)
+    assert not os.path.exists(TEST_DB_COMPACTING_LOG_PATH)
+
+    with open(TEST_DB_PATH, 'r') as db_file:
+        assert json.loads(db_file.read()) == {str(i): i for i in range(1, 10)}
+
+    # Nothing left to compact.
+    assert not database.compact()
+
+
+def test_compact_interrupted():
+    """ Tests that a log left behind by an interrupted compaction is used. """
+
+    database = PupDB(TEST_DB_PATH, append_log=True, auto_compact=False)
+    database.set('old', 1)
+    os.rename(TEST_DB_LOG_PATH, TEST_DB_COMPACTING_LOG_PATH)
+    database.set('new', 2)
+
+    assert json.loads(database.dumps()) == {'old': 1, 'new': 2}
+
+    assert database.compact()
+    assert not os.path.exists(TEST_DB_COMPACTING_LOG_PATH)
+    assert json.loads(database.dumps()) == {'old': 1, 'new': 2}
+
+
+def test_auto_compact():
+    """ Tests that the log is compacted once it outgrows the snapshot. """
+
+    database = PupDB(
+        TEST_DB_PATH, append_log=True, compact_min_bytes=1024,
+        background_compaction=False
+    )
+    for i in range(100):
+        database.set(i, i)
+
+    assert os.path.getsize(TEST_DB_LOG_PATH) < 1024
+    assert len(database) == 100
+
+
+def test_log_durability():
+    """ Tests the append log mode with the strictest durability level. """
+
+    database = PupDB(
+        TEST_DB_PATH, append_log=True, auto_compact=False,
+        durability='fsync+dirsync'
+    )
+    database.set_many({i: i for i in range(10)})
+    database.compact()
+    database.remove(0)
+
+    assert len(PupDB(TEST_DB_PATH, append_log=True)) == 9
@@ -0,0 +1,311 @@
+"""
+    Tests for the ASGI interface to PupDB.
+"""
+
+import asyncio
+import logging
+import os
+import json
+import zlib
+from urllib.parse import quote, unquote
+
+import pytest
+
+from pupdb.asgi import PupDBApp
+from pupdb.http_utils import STREAM_CHUNK_SIZE
+
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s | %(process)d | %(levelname)s | %(message)s'
+)
+
+TEST_DB_PATH = 'testdb.json'
+TEST_DB_LOCK_PATH = '{}.lock'.format(TEST_DB_PATH)
+TEST_DB_GENERATION_PATH = '{}.gen'.format(TEST_DB_PATH)
+TEST_DB_EXPIRY_PATH = '{}.expiry'.format(TEST_DB_PATH)
+
+
+# pylint: disable=useless-object-inheritance,too-few-public-methods
+class Client(object):
+    """ Client calling an ASGI application directly, in an event loop. """
+
+    def __init__(self, app):
+        """ Initializes the client of the application. """
+
+        self.app = app
+        self.loop = asyncio.new_event_loop()
+        # Headers of the last response.
+        self.headers = None
+
+    def request(self, method, path, body=None, headers=None):
+        """
+            Requests the path, with the body encoded in json if given.
+            Returns the status, the json body (None if empty) and the body
+            chunks.
+        """
+
+        return self.loop.run_until_complete(
+            self._request(method, path, body, headers)
+        )
+
+    async def _request(self, method, path, body, headers=None):
+        """ Sends the request to the application. """
+
+        path, _, query_string = path.partition('?')
+        # As ASGI servers, the path of the scope is percent-decoded.
+        scope = {
+            'type': 'http', 'method': method, 'path': unquote(path),
+            'raw_path': path.encode('ascii'),
+            'query_string': query_string.encode('utf-8'),
+            'headers': [
+                (name.lower().encode('latin-1'), value.encode('latin-1'))
+                for name, value in (headers or {}).items()
+            ],
+        }
+        messages = [{
+            'type': 'http.request',
+            'body': b'' if body is None else json.dumps(body).encode('utf-8'),
+        }]
+        sent = []
+
+        async def receive():
+            """ Returns the request body. """
+
+            return messages.pop(0)
+
+        async def send(message):
+            """ Records the response messages. """
+
+            sent.append(message)
+
+        await self.app(scope, receive, send)
+        self.headers = {
+            name.decode('latin-1'): value.decode('latin-1')
+            for name, value in sent[0]['headers']
+        }
+        chunks = [
+            message['body'] for message in sent[1:] if message['body']
+        ]
+        data = b''.join(chunks)
+        if self.headers.get('content-encoding') == 'gzip':
+            data = zlib.decompress(data, 16 + zlib.MAX_WBITS)
+        data = data.decode('utf-8')
+        return sent[0]['status'], json.loads(data) if data else None, chunks
+
+    def close(self):
+        """ Closes the database of the application and the event loop. """
+
+        if self.app.database is not None:
+            self.app.database.close()
+        self.loop.close()
+
+
+@pytest.fixture()
+def client():
+    """ Fixture function to get a client of the ASGI application. """
+
+    test_client = Client(PupDBApp(TEST_DB_PATH))
+
+    yield test_client
+
+    test_client.close()
+    for path in (
+            TEST_DB_PATH, TEST_DB_LOCK_PATH, TEST_DB_GENERATION_PATH,
+            TEST_DB_EXPIRY_PATH):
+        if os.path.exists(path):
+            os.remove(path)
+
+
+# pylint: disable=redefined-outer-name
+def test_get_set_remove(client):
+    """ Test the /get, /set and /remove endpoints. """
+
+    status, data, _ = client.request('GET', '/get?key=test')
+    assert status == 200
+    assert data == {'key': 'test', 'value': None}
+
+    status, _, _ = client.request(
+        'POST', '/set', {'key': 'test', 'value': 'test', 'ttl': 100}
+    )
+    assert status == 200
+    assert client.request('GET', '/get?key=test')[1]['value'] == 'test'
+    assert client.request('GET', '/get')[0] == 400
+    assert client.request('POST', '/set', {'key': 'test'})[0] == 400
+
+    assert client.request('DELETE', '/remove/test')[0] == 200
+    assert client.request('DELETE', '/remove/test')[0] == 404
+    assert client.request('GET', '/remove/test')[0] == 405
+
+    for key in ('a b/c', 'a%41', u'\u00e9t\u00e9'):
+        client.request('POST', '/set', {'key': key, 'value': 1})
+        path = '/remove/{}'.format(quote(key.encode('utf-8'), safe=''))
+        assert client.request('DELETE', path)[0] == 200
+        assert client.request('GET', '/get?key={}'.format(
+            quote(key.encode('utf-8'), safe='')
+        ))[1]['value'] is None
+    assert client.request('GET', '/missing')[0] == 404
+
+
+# pylint: disable=redefined-outer-name
+def test_batches(client):
+    """ Test the /mget, /mset and /mremove endpoints. """
+
+    assert client.request(
+        'POST', '/mset', {'items': {'a': 1, 'b': 2}}
+    )[0] == 200
+    assert client.request('POST', '/mget', {'keys': ['a', 'missing']})[1] == {
+        'values': {'a': 1, 'missing': None}
+    }
+    assert client.request(
+        'POST', '/mremove', {'keys': ['a', 'missing']}
+    )[0] == 404
+    assert client.request('POST', '/mremove', {'keys': ['a', 'b']})[0] == 200
+    assert client.request('POST', '/mget', {'keys': ['a']})[1] == {
+        'values': {'a': None}
+    }
+    assert client.request('POST', '/mget', {'keys': []})[0] == 400
+    assert client.request('POST', '/mset', {'items': 1})[0] == 400
+
+
+# pylint: disable=redefined-outer-name
+def test_listings(client):
+    """ Test the streamed listing endpoints. """
+
+    for key in ('a1', 'a2', 'b1', 'b2'):
+        client.request('POST', '/set', {'key': key, 'value': key.upper()})
+
+    assert client.request('GET', '/keys?prefix=a')[1] == {
+        'keys': ['a1', 'a2']
+    }
+    assert client.request('GET', '/values?start=a2&stop=b2')[1] == {
+        'values': ['A2', 'B1']
+    }
+    assert client.request('GET', '/items?prefix=b')[1] == {
+        'items': [['b1', 'B1'], ['b2', 'B2']]
+    }
+    assert client.request('GET', '/range?start=a2&stop=b2')[1] == {
+        'items': [['a2', 'A2'], ['b1', 'B1']]
+    }
+    assert client.request('GET', '/prefix?prefix=a1')[1] == {
+        'items': [['a1', 'A1']]
+    }
+    assert client.request('GET', '/prefix')[0] == 400
+
+    status, data, _ = client.request('GET', '/scan?limit=3')
+    assert status == 200
+    assert len(data['items']) == 3
+    status, data, _ = client.request(
+        'GET', '/scan?cursor={}'.format(data['cursor'])
+    )
+    assert data == {'items': [['b2', 'B2']], 'cursor': None}
+    assert client.request('GET', '/scan?limit=0')[0] == 400
+
+    assert client.request('POST', '/truncate-db')[0] == 200
+    assert client.request('GET', '/dumps')[1] == {'database': {}}
+
+
+# pylint: disable=redefined-outer-name
+def test_streaming(client):
+    """ Test that large listings are streamed in several chunks. """
+
+    value = 'x' * 1024
+    # pylint: disable=protected-access
+    database = client.app._get_database()
+    client.loop.run_until_complete(database.set_many(
+        {'test{:03}'.format(i): value for i in range(200)}
+    ))
+
+    status, data, chunks = client.request('GET', '/dumps')
+    assert status == 200
+    assert len(chunks) > 1
+    assert all(len(chunk) < 2 * STREAM_CHUNK_SIZE for chunk in chunks)
+    assert list(data['database']) == sorted(data['database'])
+    assert data['database'] == {
+        'test{:03}'.format(i): value for i in range(200)
+    }
+
+
+# pylint: disable=redefined-outer-name
+def test_etag(client):
+    """ Test the ETags and the response cache of the listing endpoints. """
+
+    client.request('POST', '/mset', {'items': {'a': 1, 'b': 2}})
+    status, data, chunks = client.request('GET', '/dumps')
+    etag = client.headers['etag']
+    assert data == {'database': {'a': 1, 'b': 2}}
+
+    status, data, _ = client.request(
+        'GET', '/dumps', headers={'If-None-Match': etag}
+    )
+    assert (status, data) == (304, None)
+    assert client.headers['etag'] == etag
+
+    # Served from the response cache, in a single chunk.
+    status, data, cached_chunks = client.request('GET', '/dumps')
+    assert cached_chunks == [b''.join(chunks)]
+    assert client.headers['content-length'] == str(len(cached_chunks[0]))
+    assert client.headers['etag'] == etag
+
+    assert client.request('GET', '/keys?prefix=b')[1] == {'keys': ['b']}
+    client.request('POST', '/set', {'key': 'c', 'value': 3})
+    status, data, _ = client.request(
+        'GET', '/dumps', headers={'If-None-Match': etag}
+    )
+    assert status == 200
+    assert client.headers['etag'] != etag
+    assert data == {'database': {'a': 1, 'b': 2, 'c': 3}}
+
+
+# pylint: disable=redefined-outer-name
+def test_compression(client):
+    """ Test the gzip compressed responses of the listing endpoints. """
+
+    value = 'x' * 1024
+    client.request('POST', '/mset', {'items': {
+        'test{:03}'.format(i): value for i in range(200)
+    }})
+    status, data, chunks = client.request(
+        'GET', '/dumps', headers={'Accept-Encoding': 'gzip'}
+    )
+    assert status == 200
+    assert client.headers['content-encoding'] == 'gzip'
+    assert sum(len(chunk) for chunk in chunks) < 10 * 1024
+    assert data == {'database': {
+        'test{:03}'.format(i): value for i in range(200)
+    }}
+    etag = client.headers['etag']
+
+    status, cached_data, _ = client.request(
+        'GET', '/dumps', headers={'Accept-Encoding': 'gzip'}
+    )
+    assert cached_data == data
+    assert client.headers['content-encoding'] == 'gzip'
+    assert client.request('GET', '/dumps', headers={
+        'Accept-Encoding': 'gzip', 'If-None-Match': etag
+    })[0] == 304
+    assert client.request(
+        'GET', '/dumps', headers={'If-None-Match': etag}
+    )[1] == data
+    assert 'content-encoding' not in client.headers
+
+
+# pylint: disable=redefined-outer-name
+def test_concurrent_requests(client):
+    """ Test that concurrent requests are all served. """
+
+    async def requests():
+        """ Sends the requests concurrently. """
+
+        # pylint: disable=protected-access
+        await asyncio.gather(*[
+            client._request('POST', '/set', {'key': str(i), 'value': i + 1})
+            for i in range(50)
+        ])
+        return await asyncio.gather(*[
+            client._request('GET', '/get?key={}'.format(i), None)
+            for i in range(50)
+        ])
+
+    responses = client.loop.run_until_complete(requests())
+    assert [data['value'] for _, data, _ in responses] == \
+        [i + 1 for i in range(50)]
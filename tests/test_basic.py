@@ -18,6 +18,7 @@ logging.basicConfig(
 
 TEST_DB_PATH = 'testdb.json'
 TEST_DB_LOCK_PATH = '{}.lock'.format(TEST_DB_PATH)
+TEST_DB_GENERATION_PATH = '{}.gen'.format(TEST_DB_PATH)
 
 
 @pytest.fixture(autouse=True)
@@ -34,6 +35,9 @@ def run_around_tests():
     if os.path.exists(TEST_DB_LOCK_PATH):
         os.remove(TEST_DB_LOCK_PATH)
 
+    if os.path.exists(TEST_DB_GENERATION_PATH):
+        os.remove(TEST_DB_GENERATION_PATH)
+
 
 def test_get_and_set():
     """ Tests the get() and set() methods of PupDB. """
@@ -66,6 +70,82 @@ def test_remove():
         database.remove(1000)
 
 
+def test_set_many():
+    """ Tests the set_many() method of PupDB. """
+
+    database = PupDB(TEST_DB_PATH)
+    database.set_many({i: i for i in range(10)})
+    database.set_many([(i, -i) for i in range(5)])
+
+    for i in range(10):
+        assert database.get(i) == (-i if i < 5 else i)
+
+
+def test_get_many():
+    """ Tests the get_many() method of PupDB. """
+
+    database = PupDB(TEST_DB_PATH)
+    database.set_many({i: i for i in range(10)})
+
+    assert database.get_many([1, '2', 'missing']) == {
+        '1': 1, '2': 2, 'missing': None
+    }
+    assert database.get_many([]) == {}
+
+
+def test_update():
+    """ Tests the update() method of PupDB. """
+
+    database = PupDB(TEST_DB_PATH)
+    database.update({'key1': 1}, key2=2)
+    database.update([('key3', 3)])
+
+    assert json.loads(database.dumps()) == {'key1': 1, 'key2': 2, 'key3': 3}
+
+
+def test_remove_many():
+    """ Tests the remove_many() method of PupDB. """
+
+    database = PupDB(TEST_DB_PATH)
+    database.set_many({i: i for i in range(10)})
+
+    database.remove_many(range(5))
+
+    assert sorted(database.keys()) == [str(i) for i in range(5, 10)]
+
+    # A non-existent key fails the whole batch.
+    with pytest.raises(KeyError):
+        database.remove_many([5, 1000])
+    assert database.get(5) == 5
+
+
+def test_remove_reads_once():
+    """ Tests that remove() and remove_many() read the database once. """
+
+    database = PupDB(TEST_DB_PATH)
+    database.set_many({i: i for i in range(10)})
+
+    # pylint: disable=protected-access
+    load_database = database._load_database
+    calls = []
+
+    def counting_load_database(*args):
+        """ Wrapper around _load_database() recording the call. """
+
+        calls.append(1)
+        return load_database(*args)
+
+    database._load_database = counting_load_database
+    database.remove(0)
+    assert len(calls) == 1
+    database.remove_many([1, 2])
+    assert len(calls) == 2
+    with pytest.raises(KeyError):
+        database.remove_many([3, 1000])
+    assert len(calls) == 3
+    assert sorted(database.keys()) == [str(i) for i in range(3, 10)]
+
+
 def test_keys():
     """ Tests the keys() method of PupDB. """
 
@@ -106,6 +186,69 @@ def test_items():
     assert sorted(db_items_list) == items_list
 
 
+def test_iter_keys():
+    """ Tests the iter_keys() method of PupDB, with its filters. """
+
+    database = PupDB(TEST_DB_PATH)
+    database.set_many({'a{}'.format(i): i for i in range(5)})
+    database.set_many({'b{}'.format(i): i for i in range(5)})
+
+    assert list(database.iter_keys()) == sorted(database.keys())
+    assert list(database.iter_keys(prefix='b')) == \
+        ['b{}'.format(i) for i in range(5)]
+    assert list(database.iter_keys(start='a3', stop='b1')) == \
+        ['a3', 'a4', 'b0']
+    assert list(database.iter_keys(prefix='a', start='a3')) == ['a3', 'a4']
+
+
+def test_iter_values_and_items():
+    """ Tests the iter_values() and iter_items() methods of PupDB. """
+
+    database = PupDB(TEST_DB_PATH)
+    database.set_many({str(i): i for i in range(10)})
+
+    assert list(database.iter_values()) == list(range(10))
+    assert list(database.iter_items(start='8')) == [('8', 8), ('9', 9)]
+
+
+def test_scan():
+    """ Tests paging through the database with the scan() method of PupDB. """
+
+    database = PupDB(TEST_DB_PATH)
+    database.set_many({'{:02}'.format(i): i for i in range(25)})
+
+    items, cursor = database.scan(limit=10)
+    assert items == [('{:02}'.format(i), i) for i in range(10)]
+
+    # Writes between pages don't make the scan skip or repeat keys.
+    database.remove('10')
+    database.set('00', 'changed')
+
+    pages = [items]
+    while cursor is not None:
+        items, cursor = database.scan(cursor=cursor, limit=10)
+        pages.append(items)
+
+    assert [len(items) for items in pages] == [10, 10, 4]
+    assert [key for items in pages for key, _ in items] == \
+        ['{:02}'.format(i) for i in range(25) if i != 10]
+
+
+def test_scan_prefix_and_errors():
+    """ Tests the prefix filter and the invalid arguments of scan(). """
+
+    database = PupDB(TEST_DB_PATH)
+    database.set_many({'a1': 1, 'b1': 2, 'b2': 3})
+
+    assert database.scan(prefix='b') == ([('b1', 2), ('b2', 3)], None)
+    assert database.scan(prefix='c') == ([], None)
+
+    with pytest.raises(ValueError):
+        database.scan(limit=0)
+    with pytest.raises(ValueError):
+        database.scan(cursor='not a cursor')
+
+
 def test_dumps():
     """ Tests the dumps() method of PupDB. """
 
@@ -181,3 +324,38 @@ def test_flush_database():
 
     assert json.dumps(data_dict, sort_keys=True) == \
         json.dumps(db_dict, sort_keys=True)
+
+
+@pytest.mark.parametrize(
+    'durability', ['none', 'flush', 'fsync', 'fsync+dirsync']
+)
+def test_durability(durability):
+    """ Tests writes with each of the durability levels. """
+
+    database = PupDB(TEST_DB_PATH, durability=durability)
+    database.set('key', 'val')
+
+    assert PupDB(TEST_DB_PATH).get('key') == 'val'
+    assert not [
+        file_name for file_name in os.listdir('.')
+        if file_name.endswith('.tmp')
+    ]
+
+
+def test_invalid_durability():
+    """ Tests that unknown durability levels are rejected. """
+
+    with pytest.raises(ValueError):
+        PupDB(TEST_DB_PATH, durability='sometimes')
+
+
+def test_failed_write_keeps_database():
+    """ Tests that a failing write leaves the database file untouched. """
+
+    database = PupDB(TEST_DB_PATH)
+    database.set('key', 'val')
+
+    # Sets are not serializable to json.
+    assert not database.set('other_key', {1, 2})
+
+    assert json.loads(database.dumps()) == {'key': 'val'}
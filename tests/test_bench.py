@@ -0,0 +1,86 @@
+"""
+    Tests for the benchmarks of PupDB.
+"""
+
+import importlib
+import json
+import logging
+import os
+
+import pytest
+
+from pupdb.bench import OPERATIONS, main, percentile, run_benchmarks
+
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s | %(process)d | %(levelname)s | %(message)s'
+)
+
+TEST_DB_PATH = 'testdb.json'
+TEST_DB_LOCK_PATH = '{}.lock'.format(TEST_DB_PATH)
+TEST_DB_GENERATION_PATH = '{}.gen'.format(TEST_DB_PATH)
+TEST_OUTPUT_PATH = 'testbench.json'
+
+
+@pytest.fixture(autouse=True)
+def run_around_tests():
+    """ Function is invoked around each test run. """
+
+    logging.debug('Test started.')
+    # The benchmarks of the HTTP interface swap the database of pupdb.rest
+    # for theirs, and then restore it. The module is imported first with
+    # the database of the tests, which test_http uses, rather than with
+    # a temporary benchmark database, which would be restored.
+    os.environ['PUPDB_FILE_PATH'] = TEST_DB_PATH
+    importlib.import_module('pupdb.rest')
+    yield
+    logging.debug('Test ended.')
+
+    for path in (
+            TEST_DB_PATH, TEST_DB_LOCK_PATH, TEST_DB_GENERATION_PATH,
+            TEST_OUTPUT_PATH):
+        if os.path.exists(path):
+            os.remove(path)
+
+
+def test_percentile():
+    """ Tests the percentiles of the latencies. """
+
+    latencies = list(range(100))
+    assert percentile(latencies, 0.5) == 50
+    assert percentile(latencies, 0.99) == 99
+    assert percentile([1], 0.99) == 1
+    assert percentile([], 0.5) is None
+
+
+def test_run_benchmarks():
+    """ Tests the results of the benchmarks, for every target. """
+
+    results = run_benchmarks(
+        sizes=[50], value_sizes=[10], threads=[1, 2], processes=[1, 2],
+        options=[{}, {'append_log': True, 'cache': True}], count=5,
+        rest=True
+    )
+    assert len(results) == 2 * 2 * len(OPERATIONS) * 2 * 2
+    assert {result['target'] for result in results} == {'core', 'rest'}
+    for result in results:
+        assert result['ops'] == 5 * result['threads'] * result['processes']
+        assert 0 < result['p50_us'] <= result['p99_us'] <= result['max_us']
+        assert result['throughput'] > 0
+
+
+def test_main():
+    """ Tests the command line interface of the benchmarks. """
+
+    main([
+        '--sizes', '20', '--operations', 'get,set', '--count', '3',
+        '--options', '{"cache": true}', '--output', TEST_OUTPUT_PATH
+    ])
+    with open(TEST_OUTPUT_PATH, 'r') as output_file:
+        report = json.loads(output_file.read())
+    assert [result['operation'] for result in report['results']] == \
+        ['get', 'set']
+    assert report['results'][0]['options'] == {'cache': True}
+
+    with pytest.raises(SystemExit):
+        main(['--operations', 'unknown'])
@@ -0,0 +1,162 @@
+"""
+    Tests for the in-memory read cache of PupDB.
+"""
+
+import logging
+import os
+
+import pytest
+
+from pupdb.core import PupDB
+
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s | %(process)d | %(levelname)s | %(message)s'
+)
+
+
+TEST_DB_PATH = 'testdb.json'
+TEST_DB_LOCK_PATH = '{}.lock'.format(TEST_DB_PATH)
+TEST_DB_GENERATION_PATH = '{}.gen'.format(TEST_DB_PATH)
+TEST_DB_LOG_PATH = '{}.log'.format(TEST_DB_PATH)
+TEST_DB_COMPACTION_LOCK_PATH = '{}.compact.lock'.format(TEST_DB_PATH)
+
+
+@pytest.fixture(autouse=True)
+def run_around_tests():
+    """ Function is invoked around each test run. """
+
+    logging.debug('Test started.')
+    yield
+    logging.debug('Test ended.')
+
+    for path in (
+            TEST_DB_PATH, TEST_DB_LOCK_PATH, TEST_DB_GENERATION_PATH,
+            TEST_DB_LOG_PATH, TEST_DB_COMPACTION_LOCK_PATH):
+        if os.path.exists(path):
+            os.remove(path)
+
+
+def count_loads(database):
+    """ Counts the calls to _load_database() of the PupDB instance. """
+
+    # pylint: disable=protected-access
+    load_database = database._load_database
+    calls = []
+
+    def counting_load_database(*args):
+        """ Wrapper around _load_database() recording the call. """
+
+        calls.append(1)
+        return load_database(*args)
+
+    database._load_database = counting_load_database
+    return calls
+
+
+def test_cache_reads():
+    """ Tests that unchanged databases are not read again from disk. """
+
+    database = PupDB(TEST_DB_PATH, cache=True)
+    for i in range(10):
+        database.set(i, i)
+    loads = count_loads(database)
+
+    for i in range(10):
+        assert database.get(i) == i
+    assert len(database) == 10
+    assert not loads
+
+
+@pytest.mark.parametrize('append_log', [False, True])
+def test_cache_write_while_iterating(append_log):
+    """ Tests writing while iterating over the cached database. """
+
+    database = PupDB(TEST_DB_PATH, append_log=append_log, cache=True)
+    database.set_many({i: i for i in range(10)})
+
+    for key in database.keys():
+        database.remove(key)
+    for key, val in database.items():
+        database.set(key, val)
+    assert len(database) == 0
+
+    database.set_many({i: i for i in range(10)})
+    for val in database.values():
+        database.set(val + 10, val)
+    assert len(database) == 20
+
+
+def test_cache_invalidation():
+    """ Tests that writes of other instances invalidate the cache. """
+
+    reader = PupDB(TEST_DB_PATH, cache=True)
+    writer = PupDB(TEST_DB_PATH)
+
+    # Same size rewrites, quicker than the mtime resolution.
+    for i in range(10):
+        writer.set('key', i)
+        assert reader.get('key') == i
+
+    writer.truncate_db()
+    assert reader.get('key') is None
+
+
+def test_cache_log_tail():
+    """ Tests that only new log records are replayed over the cache. """
+
+    reader = PupDB(TEST_DB_PATH, append_log=True, cache=True)
+    writer = PupDB(TEST_DB_PATH, append_log=True, auto_compact=False)
+    writer.set('key', 0)
+    assert reader.get('key') == 0
+    loads = count_loads(reader)
+
+    for i in range(1, 10):
+        writer.set('key', i)
+        assert reader.get('key') == i
+    writer.remove('key')
+    assert reader.get('key') is None
+    assert not loads
+
+    writer.set('key', 'compacted')
+    writer.compact()
+    assert reader.get('key') == 'compacted'
+    assert loads
+
+
+def test_cache_own_compaction():
+    """ Tests that compacting keeps the cache of the compacting instance. """
+
+    database = PupDB(
+        TEST_DB_PATH, append_log=True, auto_compact=False, cache=True
+    )
+    for i in range(10):
+        database.set(i, i)
+    assert len(database) == 10
+    loads = count_loads(database)
+
+    database.compact()
+    assert len(database) == 10
+    assert not loads
+
+
+@pytest.mark.parametrize('options', [{}, {'append_log': True}])
+def test_version(options):
+    """ Tests that the version changes with every write, from any writer. """
+
+    database = PupDB(TEST_DB_PATH, cache=True, **options)
+    database.set('key', 1)
+    version = database.version()
+    calls = count_loads(database)
+    assert database.version() == version
+    assert calls == []
+
+    versions = {version}
+    database.set('key', 2)
+    versions.add(database.version())
+    PupDB(TEST_DB_PATH, **options).set('other', 3)
+    versions.add(database.version())
+    database.remove('other')
+    versions.add(database.version())
+    assert len(versions) == 4
+    assert PupDB(TEST_DB_PATH, **options).version() == database.version()
@@ -0,0 +1,247 @@
+"""
+    Tests for the HTTP clients of PupDB.
+"""
+
+import asyncio
+import json
+import logging
+import os
+import threading
+from http.server import BaseHTTPRequestHandler, HTTPServer
+from socketserver import ThreadingMixIn
+from urllib.parse import parse_qs, urlparse
+
+import pytest
+from werkzeug.serving import make_server
+
+from pupdb.aio_client import AsyncPupDBClient
+from pupdb.client import PupDBClient
+
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s | %(process)d | %(levelname)s | %(message)s'
+)
+
+TEST_DB_PATH = 'testdb.json'
+TEST_DB_LOCK_PATH = '{}.lock'.format(TEST_DB_PATH)
+TEST_DB_GENERATION_PATH = '{}.gen'.format(TEST_DB_PATH)
+TEST_DB_EXPIRY_PATH = '{}.expiry'.format(TEST_DB_PATH)
+
+
+@pytest.fixture()
+def server_url():
+    """ Fixture function to serve pupdb.rest on a local port. """
+
+    os.environ['PUPDB_FILE_PATH'] = TEST_DB_PATH
+
+    # Lazy import for Lazy Initialization of APP instance.
+    # pylint: disable=import-outside-toplevel
+    from pupdb.rest import APP, DB
+
+    DB.init_db()
+    server = make_server('127.0.0.1', 0, APP, threaded=True)
+    thread = threading.Thread(target=server.serve_forever)
+    thread.start()
+
+    yield 'http://127.0.0.1:{}'.format(server.server_port)
+
+    server.shutdown()
+    thread.join()
+    server.server_close()
+    for path in (
+            TEST_DB_PATH, TEST_DB_LOCK_PATH, TEST_DB_GENERATION_PATH,
+            TEST_DB_EXPIRY_PATH):
+        if os.path.exists(path):
+            os.remove(path)
+
+
+# pylint: disable=redefined-outer-name
+def test_get_set_remove(server_url):
+    """ Test the get(), set() and remove() methods of PupDBClient. """
+
+    client = PupDBClient(server_url)
+    assert client.get('test') is None
+    assert client.set('test', 'value')
+    assert client.set(1, [1, 2], ttl=100)
+    assert client.get('test') == 'value'
+    assert client.get(1) == [1, 2]
+    assert len(client) == 2
+
+    assert client.remove('test')
+    assert client.get('test') is None
+    with pytest.raises(KeyError):
+        client.remove('test')
+    client.close()
+
+
+# pylint: disable=redefined-outer-name
+def test_multi_keys(server_url):
+    """ Test the multi-key methods and the pipelines of PupDBClient. """
+
+    client = PupDBClient(server_url)
+    assert client.set_many({'a': 1, 'b': 2})
+    client.update([('c', 3)], d=4)
+    assert client.get_many(['a', 'd', 'missing']) == {
+        'a': 1, 'd': 4, 'missing': None
+    }
+
+    with client.pipeline() as pipeline:
+        pipeline.get('a').set('a', 10).set('e', 5).get('a').remove('b')
+    assert pipeline.results == [1, True, True, 10, True]
+    assert client.get_many(['a', 'b', 'e']) == {'a': 10, 'b': None, 'e': 5}
+
+    with pytest.raises(KeyError):
+        client.remove_many(['a', 'missing'])
+    assert client.get('a') == 10
+    assert client.remove_many(['a', 'c'])
+    assert client.keys() == ['d', 'e']
+    client.close()
+
+
+# pylint: disable=redefined-outer-name
+def test_listings(server_url):
+    """ Test the listing methods of PupDBClient. """
+
+    client = PupDBClient(server_url)
+    client.set_many({key: key.upper() for key in ('a1', 'a2', 'b1', 'b2')})
+
+    assert client.iter_keys(prefix='a') == ['a1', 'a2']
+    assert client.iter_values(start='a2', stop='b2') == ['A2', 'B1']
+    assert client.items() == [
+        ('a1', 'A1'), ('a2', 'A2'), ('b1', 'B1'), ('b2', 'B2')
+    ]
+    assert client.range('a2', 'b2') == [('a2', 'A2'), ('b1', 'B1')]
+    assert client.prefix('b') == [('b1', 'B1'), ('b2', 'B2')]
+
+    items, cursor = client.scan(limit=3)
+    assert len(items) == 3
+    assert client.scan(cursor) == ([('b2', 'B2')], None)
+    with pytest.raises(ValueError):
+        client.scan(limit=0)
+
+    assert client.dumps() == (
+        '{"a1": "A1", "a2": "A2", "b1": "B1", "b2": "B2"}'
+    )
+    assert client.truncate_db()
+    assert client.values() == []
+    client.close()
+
+
+class ThreadingHTTPServer(ThreadingMixIn, HTTPServer):
+    """ HTTP server with a thread per connection (in http.server in 3.7+). """
+
+    daemon_threads = True
+
+
+class LegacyHandler(BaseHTTPRequestHandler):
+    """
+        Keep-alive HTTP/1.1 handler serving only /get, like a server
+        without the multi-key endpoints.
+    """
+
+    protocol_version = 'HTTP/1.1'
+    connections = set()
+
+    def do_GET(self):  # pylint: disable=invalid-name
+        """ Serves /get with the value of int(key) + 1. """
+
+        self.connections.add(self.client_address)
+        key = parse_qs(urlparse(self.path).query)['key'][0]
+        self._send(200, {'key': key, 'value': int(key) + 1})
+
+    def do_POST(self):  # pylint: disable=invalid-name
+        """ Answers 404 to the multi-key endpoints. """
+
+        self.rfile.read(int(self.headers['Content-Length']))
+        self._send(404, None)
+
+    def _send(self, status, payload):
+        """ Sends a json response, or an html one if payload is None. """
+
+        if payload is None:
+            body, content_type = b'<h1>Not Found</h1>', 'text/html'
+        else:
+            body = json.dumps(payload).encode('utf-8')
+            content_type = 'application/json'
+        self.send_response(status)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):  # pylint: disable=arguments-differ
+        """ Silences the request logs. """
+
+
+def test_connection_reuse():
+    """
+        Test that PupDBClient keeps its connections alive, and falls back
+        to single-key requests without the multi-key endpoints.
+    """
+
+    server = ThreadingHTTPServer(('127.0.0.1', 0), LegacyHandler)
+    thread = threading.Thread(target=server.serve_forever)
+    thread.start()
+    try:
+        client = PupDBClient(
+            'http://127.0.0.1:{}'.format(server.server_port), pool_size=1
+        )
+        assert client.get_many(range(10)) == {
+            str(i): i + 1 for i in range(10)
+        }
+        assert client.get(20) == 21
+        # pylint: disable=protected-access
+        assert client._batch_endpoints is False
+        assert len(LegacyHandler.connections) == 1
+        client.close()
+    finally:
+        server.shutdown()
+        thread.join()
+        server.server_close()
+
+
+# pylint: disable=redefined-outer-name
+def test_async_client(server_url):
+    """ Test AsyncPupDBClient, with merged concurrent calls. """
+
+    async def requests():
+        """ Sends the requests concurrently. """
+
+        async with AsyncPupDBClient(server_url) as client:
+            sent = []
+            request = client.request
+
+            async def record(method, path, payload=None):
+                """ Records the paths of the requests sent. """
+
+                sent.append(path)
+                return await request(method, path, payload)
+
+            client.request = record
+
+            await asyncio.gather(*[
+                client.set(str(i), i + 1) for i in range(50)
+            ])
+            values = await asyncio.gather(*[
+                client.get(str(i)) for i in range(51)
+            ])
+            assert sent == ['/mset', '/mget']
+
+            assert await client.remove('0')
+            with pytest.raises(KeyError):
+                await client.remove('0')
+            assert await client.length() == 49
+            assert (await client.scan(limit=2))[0] == [('1', 2), ('10', 11)]
+            assert await client.prefix('4') == [
+                ('4', 5), ('40', 41), ('41', 42), ('42', 43), ('43', 44),
+                ('44', 45), ('45', 46), ('46', 47), ('47', 48), ('48', 49),
+                ('49', 50)
+            ]
+            return values
+
+    loop = asyncio.new_event_loop()
+    try:
+        values = loop.run_until_complete(requests())
+    finally:
+        loop.close()
+    assert values == [i + 1 for i in range(50)] + [None]
@@ -5,6 +5,7 @@
 import logging
 import os
 import json
+import zlib
 
 import pytest
 
@@ -15,6 +16,8 @@ logging.basicConfig(
 
 TEST_DB_PATH = 'testdb.json'
 TEST_DB_LOCK_PATH = '{}.lock'.format(TEST_DB_PATH)
+TEST_DB_GENERATION_PATH = '{}.gen'.format(TEST_DB_PATH)
+TEST_DB_EXPIRY_PATH = '{}.expiry'.format(TEST_DB_PATH)
 
 
 @pytest.fixture()
@@ -45,6 +48,12 @@ def test_client():
     if os.path.exists(TEST_DB_LOCK_PATH):
         os.remove(TEST_DB_LOCK_PATH)
 
+    if os.path.exists(TEST_DB_GENERATION_PATH):
+        os.remove(TEST_DB_GENERATION_PATH)
+
+    if os.path.exists(TEST_DB_EXPIRY_PATH):
+        os.remove(TEST_DB_EXPIRY_PATH)
+
 
 # pylint: disable=redefined-outer-name
 def test_db_get_set(test_client):
@@ -69,6 +78,48 @@ def test_db_get_set(test_client):
     assert data['value'] == 'test'
 
 
+# pylint: disable=redefined-outer-name
+def test_db_set_ttl(test_client):
+    """ Test the ttl parameter of the HTTP db_set() interface method. """
+
+    # pylint: disable=import-outside-toplevel
+    from pupdb.rest import DB
+
+    res = test_client.post(
+        '/set',
+        headers={'Content-Type': 'application/json'},
+        data=json.dumps({'key': 'test', 'value': 'test', 'ttl': 100})
+    )
+    assert res.status_code == 200
+    assert 99 < DB.ttl('test') <= 100
+
+
+# pylint: disable=redefined-outer-name
+def test_db_batches(test_client):
+    """ Test the HTTP db_mget(), db_mset() and db_mremove() methods. """
+
+    res = test_client.post('/mset', json={'items': {'a': 1, 'b': 2}})
+    assert res.status_code == 200
+    res = test_client.post('/mset', json={'items': [['c', 3]], 'ttl': 100})
+    assert res.status_code == 200
+
+    res = test_client.post('/mget', json={'keys': ['a', 'c', 'missing']})
+    assert res.json == {'values': {'a': 1, 'c': 3, 'missing': None}}
+
+    res = test_client.post('/mremove', json={'keys': ['a', 'missing']})
+    assert res.status_code == 404
+    res = test_client.post('/mremove', json={'keys': ['a', 'b']})
+    assert res.status_code == 200
+    res = test_client.post('/mget', json={'keys': ['a', 'b', 'c']})
+    assert res.json == {'values': {'a': None, 'b': None, 'c': 3}}
+
+    assert test_client.post('/mget', json={}).status_code == 400
+    assert test_client.post('/mget', data='keys').status_code == 400
+    assert test_client.post(
+        '/mset', json={'items': [['a']]}
+    ).status_code == 400
+
+
 # pylint: disable=redefined-outer-name
 def test_db_remove(test_client):
     """ Test the HTTP db_remove() interface method. """
@@ -201,6 +252,223 @@ def test_db_dumps(test_client):
         json.dumps(db_dict, sort_keys=True)
 
 
+# pylint: disable=redefined-outer-name
+def test_db_etag(test_client):
+    """ Test the ETags and the response cache of the listing endpoints. """
+
+    # pylint: disable=import-outside-toplevel
+    from pupdb.rest import DB
+
+    DB.set_many({'a': 1, 'b': 2})
+    res = test_client.get('/dumps')
+    etag = res.headers['ETag']
+    assert res.json == {'database': {'a': 1, 'b': 2}}
+
+    res = test_client.get('/dumps', headers={'If-None-Match': etag})
+    assert res.status_code == 304
+    assert res.headers['ETag'] == etag
+    assert not res.data
+    res = test_client.get(
+        '/dumps', headers={'If-None-Match': '"other", ' + etag}
+    )
+    assert res.status_code == 304
+
+    # Served from the response cache, without iterating the database.
+    iter_items = DB.iter_items
+    DB.iter_items = None
+    try:
+        res = test_client.get('/dumps')
+        assert res.headers['ETag'] == etag
+        assert int(res.headers['Content-Length']) == len(res.data)
+        assert res.json == {'database': {'a': 1, 'b': 2}}
+    finally:
+        DB.iter_items = iter_items
+
+    res = test_client.get('/keys?prefix=a')
+    assert res.headers['ETag'] == etag
+    assert res.json == {'keys': ['a']}
+
+    DB.set('c', 3)
+    res = test_client.get('/dumps', headers={'If-None-Match': etag})
+    assert res.status_code == 200
+    assert res.headers['ETag'] != etag
+    assert res.json == {'database': {'a': 1, 'b': 2, 'c': 3}}
+
+
+def test_choose_encoding():
+    """ Test the negotiation of the content encoding of the responses. """
+
+    # pylint: disable=import-outside-toplevel
+    from pupdb.http_utils import CONTENT_ENCODINGS, choose_encoding
+
+    assert choose_encoding(None) is None
+    assert choose_encoding('identity') is None
+    assert choose_encoding('gzip, deflate') == 'gzip'
+    assert choose_encoding('GZIP;q=0.5') == 'gzip'
+    assert choose_encoding('gzip;q=0') is None
+    assert choose_encoding('*') is not None
+    assert choose_encoding('*, gzip;q=0, zstd;q=0') is None
+
+    # The highest quality wins, and else the order of CONTENT_ENCODINGS.
+    assert choose_encoding('gzip;q=1, zstd;q=0.1') == 'gzip'
+    assert choose_encoding('zstd, gzip') == CONTENT_ENCODINGS[0]
+    if 'zstd' in CONTENT_ENCODINGS:
+        assert choose_encoding('gzip;q=0.5, zstd;q=0.8') == 'zstd'
+        assert choose_encoding('*;q=0.5, gzip;q=0.2') == 'zstd'
+
+
+# pylint: disable=redefined-outer-name
+def test_db_compression(test_client):
+    """ Test the compressed responses of the listing endpoints. """
+
+    # pylint: disable=import-outside-toplevel
+    from pupdb.rest import DB
+
+    value = 'x' * 1024
+    DB.set_many({'test{:03}'.format(i): value for i in range(200)})
+    expected = {'database': {
+        'test{:03}'.format(i): value for i in range(200)
+    }}
+
+    res = test_client.get('/dumps', headers={'Accept-Encoding': 'gzip'})
+    assert res.headers['Content-Encoding'] == 'gzip'
+    assert res.headers['Vary'] == 'Accept-Encoding'
+    assert len(res.data) < 10 * 1024
+    assert json.loads(
+        zlib.decompress(res.data, 16 + zlib.MAX_WBITS).decode('utf-8')
+    ) == expected
+    etag = res.headers['ETag']
+
+    res = test_client.get('/dumps', headers={'Accept-Encoding': 'gzip'})
+    assert res.headers['ETag'] == etag
+    assert zlib.decompress(res.data, 16 + zlib.MAX_WBITS)
+    res = test_client.get(
+        '/dumps', headers={'Accept-Encoding': 'gzip', 'If-None-Match': etag}
+    )
+    assert res.status_code == 304
+
+    # The uncompressed response has another ETag.
+    res = test_client.get('/dumps', headers={'If-None-Match': etag})
+    assert res.status_code == 200
+    assert 'Content-Encoding' not in res.headers
+    assert res.headers['ETag'] != etag
+    assert res.json == expected
+
+
+def test_db_compression_zstd(test_client):
+    """ Test the zstd compressed responses of the listing endpoints. """
+
+    zstandard = pytest.importorskip('zstandard')
+    # pylint: disable=import-outside-toplevel
+    from pupdb.rest import DB
+
+    DB.set_many({'a': 1, 'b': 2})
+    res = test_client.get(
+        '/items', headers={'Accept-Encoding': 'gzip, zstd'}
+    )
+    assert res.headers['Content-Encoding'] == 'zstd'
+    assert json.loads(
+        zstandard.ZstdDecompressor().decompressobj().decompress(res.data)
+    ) == {'items': [['a', 1], ['b', 2]]}
+
+
+# pylint: disable=redefined-outer-name
+def test_db_iter_filters(test_client):
+    """ Test the prefix/start/stop filters of the iterating endpoints. """
+
+    for key in ('a1', 'a2', 'b1', 'b2'):
+        res = test_client.post(
+            '/set',
+            headers={'Content-Type': 'application/json'},
+            data=json.dumps({'key': key, 'value': key.upper()})
+        )
+        assert res.status_code == 200
+
+    res = test_client.get('/keys?prefix=a')
+    assert res.json['keys'] == ['a1', 'a2']
+
+    res = test_client.get('/values?start=a2&stop=b2')
+    assert res.json['values'] == ['A2', 'B1']
+
+    res = test_client.get('/items?prefix=b')
+    assert res.json['items'] == [['b1', 'B1'], ['b2', 'B2']]
+
+
+# pylint: disable=redefined-outer-name
+def test_db_streaming(test_client):
+    """ Test that large listings are streamed in several chunks. """
+
+    # pylint: disable=import-outside-toplevel
+    from pupdb.http_utils import STREAM_CHUNK_SIZE
+    from pupdb.rest import DB
+
+    value = 'x' * 1024
+    DB.set_many({'test{:03}'.format(i): value for i in range(200)})
+
+    res = test_client.get('/dumps', buffered=False)
+    assert res.is_streamed
+    chunks = list(res.response)
+    assert len(chunks) > 1
+    assert all(len(chunk) < 2 * STREAM_CHUNK_SIZE for chunk in chunks)
+
+    data = json.loads(b''.join(chunks).decode('utf-8'))
+    assert list(data['database']) == sorted(data['database'])
+    assert data['database'] == {
+        'test{:03}'.format(i): value for i in range(200)
+    }
+
+
+# pylint: disable=redefined-outer-name
+def test_db_range_and_prefix(test_client):
+    """ Test the HTTP db_range() and db_prefix() interface methods. """
+
+    # pylint: disable=import-outside-toplevel
+    from pupdb.rest import DB
+
+    DB.set_many({'user:1': 1, 'user:2': 2, 'group:1': 3})
+
+    res = test_client.get('/range?start=group:1&stop=user:2')
+    assert res.json == {'items': [['group:1', 3], ['user:1', 1]]}
+
+    res = test_client.get('/prefix?prefix=user:')
+    assert res.json == {'items': [['user:1', 1], ['user:2', 2]]}
+
+    res = test_client.get('/prefix')
+    assert res.status_code == 400
+
+
+# pylint: disable=redefined-outer-name
+def test_db_scan(test_client):
+    """ Test the HTTP db_scan() interface method. """
+
+    # pylint: disable=import-outside-toplevel
+    from pupdb.rest import DB
+
+    DB.set_many({'test{}'.format(i): i for i in range(5)})
+
+    res = test_client.get('/scan?limit=2')
+    assert res.status_code == 200
+    keys = [key for key, _ in res.json['items']]
+
+    while res.json['cursor'] is not None:
+        res = test_client.get(
+            '/scan?limit=2&cursor={}'.format(res.json['cursor'])
+        )
+        assert len(res.json['items']) <= 2
+        keys.extend(key for key, _ in res.json['items'])
+
+    assert keys == ['test{}'.format(i) for i in range(5)]
+
+    res = test_client.get('/scan?prefix=test3')
+    assert res.json == {'items': [['test3', 3]], 'cursor': None}
+
+    res = test_client.get('/scan?limit=0')
+    assert res.status_code == 400
+
+    res = test_client.get('/scan?cursor=@@@')
+    assert res.status_code == 400
+
+
 # pylint: disable=redefined-outer-name
 def test_db_truncate(test_client):
     """ Test the HTTP db_truncate() interface methods. """
@@ -0,0 +1,154 @@
+"""
+    Tests for the indexed file format of PupDB.
+"""
+
+import logging
+import os
+import json
+
+import pytest
+
+from pupdb.core import PupDB
+from pupdb.indexed import IndexedMapping
+from pupdb.serializers import HEADER_PREFIX
+
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s | %(process)d | %(levelname)s | %(message)s'
+)
+
+
+TEST_DB_PATH = 'testdb.json'
+TEST_DB_LOCK_PATH = '{}.lock'.format(TEST_DB_PATH)
+TEST_DB_GENERATION_PATH = '{}.gen'.format(TEST_DB_PATH)
+TEST_DB_LOG_PATH = '{}.log'.format(TEST_DB_PATH)
+TEST_DB_COMPACTION_LOCK_PATH = '{}.compact.lock'.format(TEST_DB_PATH)
+TEST_EXPORT_PATH = 'testexport.json'
+
+
+@pytest.fixture(autouse=True)
+def run_around_tests():
+    """ Function is invoked around each test run. """
+
+    logging.debug('Test started.')
+    yield
+    logging.debug('Test ended.')
+
+    for path in (
+            TEST_DB_PATH, TEST_DB_LOCK_PATH, TEST_DB_GENERATION_PATH,
+            TEST_DB_LOG_PATH, TEST_DB_COMPACTION_LOCK_PATH,
+            TEST_EXPORT_PATH):
+        if os.path.exists(path):
+            os.remove(path)
+
+
+@pytest.mark.parametrize('append_log', [False, True])
+@pytest.mark.parametrize('cache', [False, True])
+def test_indexed_get_and_set(append_log, cache):
+    """ Tests the get(), set() and remove() methods with indexed files. """
+
+    database = PupDB(
+        TEST_DB_PATH, serializer='indexed', append_log=append_log,
+        cache=cache
+    )
+    database.set_many({i: {'value': i} for i in range(100)})
+    database.remove(0)
+    database.set('key', u'\u00e9t\u00e9')
+
+    database = PupDB(TEST_DB_PATH, append_log=append_log, cache=cache)
+    assert len(database) == 100
+    assert database.get(0) is None
+    assert database.get(1) == {'value': 1}
+    assert database.get('key') == u'\u00e9t\u00e9'
+    assert database.get('missing') is None
+    assert sorted(database.keys()) == sorted(
+        [str(i) for i in range(1, 100)] + ['key']
+    )
+
+    with pytest.raises(KeyError):
+        database.remove(0)
+
+
+def test_indexed_lazy_reads():
+    """ Tests that reading a key only decodes its own value. """
+
+    database = PupDB(TEST_DB_PATH, serializer='indexed')
+    database.set_many({i: i for i in range(100)})
+
+    # pylint: disable=protected-access
+    mapping = database._get_database()
+    assert isinstance(mapping, IndexedMapping)
+
+    decoded = []
+    value_serializer = mapping._value_serializer
+    loads = value_serializer.loads
+
+    def counting_loads(data):
+        """ Wrapper around loads() recording the call. """
+
+        decoded.append(data)
+        return loads(data)
+
+    value_serializer.loads = counting_loads
+    assert mapping['42'] == 42
+    assert '43' in mapping
+    assert len(mapping) == 100
+    assert decoded == [b'42']
+
+
+def test_indexed_migration_and_export():
+    """ Tests migrating a json database to the indexed format and back. """
+
+    database = PupDB(TEST_DB_PATH)
+    database.set_many({i: [i] for i in range(10)})
+
+    database.migrate('indexed')
+    with open(TEST_DB_PATH, 'rb') as db_file:
+        assert db_file.read().startswith(HEADER_PREFIX + b'indexed\n')
+    assert json.loads(PupDB(TEST_DB_PATH).dumps()) == {
+        str(i): [i] for i in range(10)
+    }
+
+    database.export(TEST_EXPORT_PATH)
+    with open(TEST_EXPORT_PATH, 'r') as export_file:
+        assert json.loads(export_file.read()) == {
+            str(i): [i] for i in range(10)
+        }
+
+    database.migrate('json')
+    with open(TEST_DB_PATH, 'r') as db_file:
+        assert json.loads(db_file.read()) == {str(i): [i] for i in range(10)}
+
+
+def test_indexed_compaction():
+    """ Tests compacting the append log into an indexed snapshot. """
+
+    database = PupDB(
+        TEST_DB_PATH, serializer='indexed', append_log=True,
+        auto_compact=False
+    )
+    database.set_many({i: i for i in range(10)})
+    database.truncate_db()
+    database.set_many({i: -i for i in range(5)})
+    database.compact()
+
+    assert json.loads(database.dumps()) == {str(i): -i for i in range(5)}
+
+
+def test_indexed_rewrite_with_open_mapping():
+    """
+        Tests that rewriting an indexed database, even with durability
+        'none', leaves the mappings read by other instances readable.
+    """
+
+    database = PupDB(TEST_DB_PATH, serializer='indexed', durability='none')
+    database.set_many({i: i for i in range(100)})
+
+    # pylint: disable=protected-access
+    mapping = database._get_database()
+    inode = os.stat(TEST_DB_PATH).st_ino
+    PupDB(TEST_DB_PATH, durability='none').truncate_db()
+    # A new file is renamed into place instead of truncating the mapped one.
+    assert os.stat(TEST_DB_PATH).st_ino != inode
+    assert mapping['42'] == 42
+    assert len(database) == 0
@@ -0,0 +1,147 @@
+"""
+    Tests for the shared lock mode of PupDB.
+"""
+
+import logging
+import os
+from threading import Event, Thread
+
+import pytest
+from filelock import FileLock, Timeout
+
+from pupdb.core import PupDB
+from pupdb.locks import ReadWriteFileLock, ReadWriteLock
+
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s | %(process)d | %(levelname)s | %(message)s'
+)
+
+
+TEST_DB_PATH = 'testdb.json'
+TEST_DB_LOCK_PATH = '{}.lock'.format(TEST_DB_PATH)
+TEST_DB_GENERATION_PATH = '{}.gen'.format(TEST_DB_PATH)
+
+
+@pytest.fixture(autouse=True)
+def run_around_tests():
+    """ Function is invoked around each test run. """
+
+    logging.debug('Test started.')
+    yield
+    logging.debug('Test ended.')
+
+    for path in (TEST_DB_PATH, TEST_DB_LOCK_PATH, TEST_DB_GENERATION_PATH):
+        if os.path.exists(path):
+            os.remove(path)
+
+
+def test_concurrent_readers():
+    """ Tests that several threads can hold the lock for reading. """
+
+    lock = ReadWriteLock()
+    lock.acquire_read()
+    acquired = Event()
+
+    def read():
+        """ Acquires and releases the lock for reading. """
+
+        lock.acquire_read()
+        acquired.set()
+        lock.release_read()
+
+    thread = Thread(target=read)
+    thread.start()
+    assert acquired.wait(5)
+    thread.join()
+    lock.release_read()
+
+
+def test_writer_excludes_readers():
+    """ Tests that a writing thread blocks the readers. """
+
+    lock = ReadWriteLock()
+    lock.acquire_write()
+    # Reentrant, and the writer can read too.
+    lock.acquire_write()
+    lock.acquire_read()
+    lock.release_read()
+    acquired = Event()
+
+    def read():
+        """ Acquires and releases the lock for reading. """
+
+        lock.acquire_read()
+        acquired.set()
+        lock.release_read()
+
+    thread = Thread(target=read)
+    thread.start()
+    assert not acquired.wait(0.2)
+    lock.release_write()
+    assert not acquired.wait(0.2)
+    lock.release_write()
+    assert acquired.wait(5)
+    thread.join()
+
+    lock.acquire_read()
+    with pytest.raises(RuntimeError):
+        lock.acquire_write()
+    lock.release_read()
+
+
+def test_file_lock_compatibility():
+    """ Tests the shared file lock against other processes' locks. """
+
+    lock = ReadWriteFileLock(TEST_DB_LOCK_PATH)
+    other_lock = ReadWriteFileLock(TEST_DB_LOCK_PATH)
+
+    with lock.read_lock:
+        # Other readers get the lock, exclusive lockers don't.
+        with other_lock.read_lock:
+            pass
+        with pytest.raises(Timeout):
+            FileLock(TEST_DB_LOCK_PATH, timeout=0.1).acquire()
+
+    with lock.write_lock:
+        with pytest.raises(Timeout):
+            FileLock(TEST_DB_LOCK_PATH, timeout=0.1).acquire()
+
+    with FileLock(TEST_DB_LOCK_PATH):
+        pass
+
+
+@pytest.mark.parametrize('cache', [False, True])
+def test_shared_lock_mode(cache):
+    """ Tests PupDB with the shared lock mode from multiple threads. """
+
+    database = PupDB(TEST_DB_PATH, lock_mode='shared', cache=cache)
+
+    def write(data_range):
+        """ Writes to the database from a separate instance. """
+
+        thread_database = PupDB(TEST_DB_PATH, lock_mode='shared')
+        for i in data_range:
+            thread_database.set(i, i)
+            assert database.get(i) == i
+
+    threads = [
+        Thread(target=write, args=(range(start, start + 25),))
+        for start in range(0, 100, 25)
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert len(database) == 100
+    with database.transaction() as txn:
+        txn.remove(0)
+    assert database.get(0) is None
+
+
+def test_invalid_lock_mode():
+    """ Tests that unknown lock modes are rejected. """
+
+    with pytest.raises(ValueError):
+        PupDB(TEST_DB_PATH, lock_mode='optimistic')
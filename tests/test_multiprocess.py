@@ -19,6 +19,7 @@ logging.basicConfig(
 
 TEST_DB_PATH = 'testdb.json'
 TEST_DB_LOCK_PATH = '{}.lock'.format(TEST_DB_PATH)
+TEST_DB_GENERATION_PATH = '{}.gen'.format(TEST_DB_PATH)
 
 
 @pytest.fixture(autouse=True)
@@ -35,6 +36,9 @@ def run_around_tests():
     if os.path.exists(TEST_DB_LOCK_PATH):
         os.remove(TEST_DB_LOCK_PATH)
 
+    if os.path.exists(TEST_DB_GENERATION_PATH):
+        os.remove(TEST_DB_GENERATION_PATH)
+
 
 def test_mp_get_and_set():
     """
@@ -6,8 +6,6 @@
 import logging
 import os
 from threading import Thread
-import json
-import sys
 
 import pytest
 
@@ -21,6 +19,7 @@ logging.basicConfig(
 
 TEST_DB_PATH = 'testdb.json'
 TEST_DB_LOCK_PATH = '{}.lock'.format(TEST_DB_PATH)
+TEST_DB_GENERATION_PATH = '{}.gen'.format(TEST_DB_PATH)
 
 
 class PupDBWriterThread(Thread):
@@ -60,6 +59,9 @@ def run_around_tests():
     if os.path.exists(TEST_DB_LOCK_PATH):
         os.remove(TEST_DB_LOCK_PATH)
 
+    if os.path.exists(TEST_DB_GENERATION_PATH):
+        os.remove(TEST_DB_GENERATION_PATH)
+
 
 def test_mt_get_and_set_mi():
     """
@@ -97,37 +99,79 @@ def test_mt_get_and_set_si():
         single instance (object) of PupDB.
 
         PupDB currently does not support multiple threads using the same
-        PupDB instance, so the database file will get corrupted due to
-        race condition.
+        PupDB instance, so the writes of the threads can overwrite each
+        other due to race condition. As the database file is written to a
+        temporary file that is renamed over it, it does not get corrupted
+        though.
 
         If you want to use PupDB with multiple threads, maintain separate
         PupDB instance for each thread.
     """
 
-    v_major, v_minor, _, _, _ = sys.version_info
-    if v_major < 3 or (v_major == 3 and v_minor <= 4):
-        error_cls = ValueError
-    else:
-        error_cls = json.decoder.JSONDecodeError
-
-    with pytest.raises(error_cls):
-        data_ranges = [
-            range(1, 50),
-            range(50, 100),
-            range(100, 150),
-            range(150, 201)
-        ]
-        writers = []
-        database = PupDB(TEST_DB_PATH)
-
-        # Write from multiple threads.
-        for data_range in data_ranges:
-            writer = PupDBWriterThread(data_range, database)
-            writers.append(writer)
-            writer.start()
-
-        for writer in writers:
-            writer.join()
-
-        # Verify if all keys have been written properly.
-        assert len(database) == 200
+    data_ranges = [
+        range(1, 50),
+        range(50, 100),
+        range(100, 150),
+        range(150, 201)
+    ]
+    writers = []
+    database = PupDB(TEST_DB_PATH)
+
+    # Write from multiple threads.
+    for data_range in data_ranges:
+        writer = PupDBWriterThread(data_range, database)
+        writers.append(writer)
+        writer.start()
+
+    for writer in writers:
+        writer.join()
+
+    # The database file can still be read.
+    assert 0 < len(PupDB(TEST_DB_PATH)) <= 200
+
+
+def test_mt_group_commit():
+    """
+        Tests the set() and remove() methods of PupDB in group commit mode,
+        in a multi-threaded scenario, where all threads share a single
+        instance (object) of PupDB, whose writes are merged.
+    """
+
+    data_ranges = [
+        range(1, 50),
+        range(50, 100),
+        range(100, 150),
+        range(150, 201)
+    ]
+    writers = []
+    database = PupDB(TEST_DB_PATH, group_commit=True)
+
+    # pylint: disable=protected-access
+    write_records = database._write_records
+    writes = []
+
+    def counting_write_records(records, *args):
+        """ Wrapper around _write_records() recording the call. """
+
+        writes.append(records)
+        return write_records(records, *args)
+
+    database._write_records = counting_write_records
+
+    # Write from multiple threads.
+    for data_range in data_ranges:
+        writer = PupDBWriterThread(data_range, database)
+        writers.append(writer)
+        writer.start()
+
+    for writer in writers:
+        writer.join()
+
+    # Verify if all keys have been written properly.
+    assert len(PupDB(TEST_DB_PATH)) == 200
+    assert sum(len(records) for records in writes) == 200
+
+    with pytest.raises(KeyError):
+        database.remove('missing')
+    assert database.remove('1')
+    assert len(database) == 199
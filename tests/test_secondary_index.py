@@ -0,0 +1,176 @@
+"""
+    Tests for the secondary indexes of PupDB.
+"""
+
+import logging
+import os
+import json
+
+import pytest
+
+from pupdb.core import PupDB
+
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s | %(process)d | %(levelname)s | %(message)s'
+)
+
+
+TEST_DB_PATH = 'testdb.json'
+TEST_DB_LOCK_PATH = '{}.lock'.format(TEST_DB_PATH)
+TEST_DB_GENERATION_PATH = '{}.gen'.format(TEST_DB_PATH)
+TEST_DB_LOG_PATH = '{}.log'.format(TEST_DB_PATH)
+TEST_DB_COMPACTION_LOCK_PATH = '{}.compact.lock'.format(TEST_DB_PATH)
+TEST_DB_INDEX_PATH = '{}.indexes'.format(TEST_DB_PATH)
+
+USERS = {
+    'alice': {'age': 31, 'address': {'city': 'Paris'}, 'role': 'admin'},
+    'bob': {'age': 25, 'address': {'city': 'Berlin'}, 'role': 'user'},
+    'carol': {'age': 42, 'address': {'city': 'Paris'}, 'role': 'user'},
+    'dave': {'age': 25.0, 'role': 'user'},
+    'eve': 'not an object',
+}
+
+
+@pytest.fixture(autouse=True)
+def run_around_tests():
+    """ Function is invoked around each test run. """
+
+    logging.debug('Test started.')
+    yield
+    logging.debug('Test ended.')
+
+    for path in (
+            TEST_DB_PATH, TEST_DB_LOCK_PATH, TEST_DB_GENERATION_PATH,
+            TEST_DB_LOG_PATH, TEST_DB_COMPACTION_LOCK_PATH,
+            TEST_DB_INDEX_PATH):
+        if os.path.exists(path):
+            os.remove(path)
+
+
+def test_find():
+    """ Tests finding values by indexed fields. """
+
+    database = PupDB(TEST_DB_PATH)
+    database.set_many(USERS)
+
+    assert database.create_index('role')
+    assert database.create_index('address.city')
+    assert not database.create_index('role')
+    assert database.indexes() == ['address.city', 'role']
+
+    assert [key for key, _ in database.find(role='user')] == \
+        ['bob', 'carol', 'dave']
+    assert database.find({'address.city': 'Paris', 'role': 'user'}) == \
+        [('carol', USERS['carol'])]
+    assert database.find(role='nobody') == []
+
+    with pytest.raises(ValueError):
+        database.find(age=25)
+    with pytest.raises(ValueError):
+        database.find()
+
+
+def test_find_range():
+    """ Tests range queries on an indexed field. """
+
+    database = PupDB(TEST_DB_PATH)
+    database.set_many(USERS)
+    database.create_index('age')
+
+    assert [key for key, _ in database.find_range('age', 25, 40)] == \
+        ['bob', 'dave', 'alice']
+    assert [key for key, _ in database.find_range('age', start=40)] == \
+        ['carol']
+    assert [key for key, _ in database.find(age=25)] == ['bob', 'dave']
+
+    # Strings are only compared to strings.
+    assert database.find_range('age', 'a', 'z') == []
+    with pytest.raises(ValueError):
+        database.find_range('age', 'a', 40)
+    with pytest.raises(ValueError):
+        database.find_range('age')
+
+
+def test_index_updates():
+    """ Tests that the indexes follow set(), remove() and truncate_db(). """
+
+    database = PupDB(TEST_DB_PATH)
+    database.create_index('role')
+    database.set_many(USERS)
+
+    database.set('bob', {'role': 'admin'})
+    database.remove('alice')
+    assert [key for key, _ in database.find(role='admin')] == ['bob']
+
+    with database.transaction() as txn:
+        txn.set('frank', {'role': 'admin'})
+        txn.remove('bob')
+    assert [key for key, _ in database.find(role='admin')] == ['frank']
+
+    database.truncate_db()
+    assert database.find(role='admin') == []
+
+
+def test_index_persistence():
+    """ Tests that the indexes are shared by instances and persisted. """
+
+    database = PupDB(TEST_DB_PATH)
+    database.set_many(USERS)
+    database.create_index('role')
+
+    other_database = PupDB(TEST_DB_PATH)
+    assert len(other_database.find(role='user')) == 3
+
+    # Writes of instances that never queried the indexes update them too.
+    other_database.set('bob', {'role': 'admin'})
+    with open(TEST_DB_INDEX_PATH, 'r') as index_file:
+        state = json.loads(index_file.read())
+    assert state['indexes']['role']['bob'] == 'admin'
+
+    assert [key for key, _ in database.find(role='admin')] == \
+        ['alice', 'bob']
+
+    database.drop_index('role')
+    assert not os.path.exists(TEST_DB_INDEX_PATH)
+    with pytest.raises(ValueError):
+        other_database.find(role='admin')
+    with pytest.raises(KeyError):
+        database.drop_index('role')
+
+
+def test_index_rebuild():
+    """ Tests that stale persisted indexes are rebuilt. """
+
+    database = PupDB(TEST_DB_PATH)
+    database.set_many(USERS)
+    database.create_index('role')
+
+    # Rewritten without updating the indexes.
+    with open(TEST_DB_PATH, 'w') as db_file:
+        db_file.write(json.dumps({'zed': {'role': 'user'}}))
+
+    assert PupDB(TEST_DB_PATH).find(role='user') == \
+        [('zed', {'role': 'user'})]
+
+
+def test_index_append_log():
+    """ Tests the indexes in append log mode, across compactions. """
+
+    database = PupDB(TEST_DB_PATH, append_log=True, auto_compact=False)
+    database.set_many(USERS)
+    database.create_index('role')
+
+    database.remove('bob')
+    database.set('frank', {'role': 'user'})
+    assert [key for key, _ in database.find(role='user')] == \
+        ['carol', 'dave', 'frank']
+
+    assert database.compact()
+    database.set('carol', {'role': 'admin'})
+    assert [key for key, _ in database.find(role='user')] == \
+        ['dave', 'frank']
+
+    other_database = PupDB(TEST_DB_PATH, append_log=True)
+    assert [key for key, _ in other_database.find(role='admin')] == \
+        ['alice', 'carol']
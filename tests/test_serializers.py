@@ -0,0 +1,127 @@
+"""
+    Tests for the serializers of the PupDB database files.
+"""
+
+import logging
+import os
+import json
+
+import pytest
+
+from pupdb.core import PupDB
+from pupdb.serializers import HEADER_PREFIX, get_serializer
+
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s | %(process)d | %(levelname)s | %(message)s'
+)
+
+
+TEST_DB_PATH = 'testdb.json'
+TEST_DB_LOCK_PATH = '{}.lock'.format(TEST_DB_PATH)
+TEST_DB_GENERATION_PATH = '{}.gen'.format(TEST_DB_PATH)
+TEST_DB_LOG_PATH = '{}.log'.format(TEST_DB_PATH)
+TEST_DB_COMPACTION_LOCK_PATH = '{}.compact.lock'.format(TEST_DB_PATH)
+
+
+@pytest.fixture(autouse=True)
+def run_around_tests():
+    """ Function is invoked around each test run. """
+
+    logging.debug('Test started.')
+    yield
+    logging.debug('Test ended.')
+
+    for path in (
+            TEST_DB_PATH, TEST_DB_LOCK_PATH, TEST_DB_GENERATION_PATH,
+            TEST_DB_LOG_PATH, TEST_DB_COMPACTION_LOCK_PATH):
+        if os.path.exists(path):
+            os.remove(path)
+
+
+def available_serializer(name):
+    """ Returns the serializer name, skipping the test if not installed. """
+
+    try:
+        get_serializer(name)
+    except ImportError:
+        pytest.skip('Serializer {} is not installed.'.format(name))
+    return name
+
+
+@pytest.mark.parametrize(
+    'name', ['json', 'orjson', 'ujson', 'msgpack', 'pickle']
+)
+@pytest.mark.parametrize('append_log', [False, True])
+def test_serializer_round_trip(name, append_log):
+    """ Tests writing and reading the database with each serializer. """
+
+    serializer = available_serializer(name)
+    database = PupDB(
+        TEST_DB_PATH, serializer=serializer, append_log=append_log
+    )
+    database.set_many({i: {'value': [i, str(i)]} for i in range(10)})
+    database.remove(0)
+
+    database = PupDB(
+        TEST_DB_PATH, serializer=serializer, append_log=append_log
+    )
+    assert len(database) == 9
+    assert database.get(1) == {'value': [1, '1']}
+
+
+@pytest.mark.parametrize('name', ['orjson', 'ujson'])
+def test_json_compatible_serializer(name):
+    """ Tests that fast json serializers write plain json files. """
+
+    database = PupDB(TEST_DB_PATH, serializer=available_serializer(name))
+    database.set('key', 'val')
+
+    with open(TEST_DB_PATH, 'r') as db_file:
+        assert json.loads(db_file.read()) == {'key': 'val'}
+
+
+def test_serializer_detection():
+    """ Tests that the format of a database file is detected. """
+
+    database = PupDB(TEST_DB_PATH, serializer=available_serializer('msgpack'))
+    database.set('key', 'val')
+
+    with open(TEST_DB_PATH, 'rb') as db_file:
+        assert db_file.read().startswith(HEADER_PREFIX + b'msgpack\n')
+
+    # The format is detected and kept when no serializer is given.
+    database = PupDB(TEST_DB_PATH)
+    assert database.get('key') == 'val'
+    database.set('other_key', 'other_val')
+
+    with open(TEST_DB_PATH, 'rb') as db_file:
+        assert db_file.read().startswith(HEADER_PREFIX + b'msgpack\n')
+
+    # And converted when another one is given.
+    database = PupDB(TEST_DB_PATH, serializer='json')
+    database.set('key', 'new_val')
+
+    with open(TEST_DB_PATH, 'r') as db_file:
+        assert json.loads(db_file.read()) == {
+            'key': 'new_val', 'other_key': 'other_val'
+        }
+
+
+def test_pickle_serializer_trusted_only():
+    """ Tests that pickle files are only read when chosen explicitly. """
+
+    database = PupDB(TEST_DB_PATH, serializer='pickle')
+    database.set('key', ('tuple', 1))
+
+    assert PupDB(TEST_DB_PATH, serializer='pickle').get('key') == ('tuple', 1)
+
+    with pytest.raises(ValueError):
+        PupDB(TEST_DB_PATH).get('key')
+
+
+def test_unknown_serializer():
+    """ Tests that unknown serializers are rejected. """
+
+    with pytest.raises(ValueError):
+        PupDB(TEST_DB_PATH, serializer='yaml')
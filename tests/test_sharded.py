@@ -0,0 +1,147 @@
+"""
+    Tests for the sharded variant of the PupDB database.
+"""
+
+import logging
+import glob
+import os
+import json
+
+import pytest
+
+from pupdb.sharded import ShardedPupDB
+
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s | %(process)d | %(levelname)s | %(message)s'
+)
+
+
+TEST_DB_PATH = 'testdb.json'
+
+
+@pytest.fixture(autouse=True)
+def run_around_tests():
+    """ Function is invoked around each test run. """
+
+    logging.debug('Test started.')
+    yield
+    logging.debug('Test ended.')
+
+    for path in glob.glob('testdb*'):
+        os.remove(path)
+
+
+def test_sharded_get_and_set():
+    """ Tests the get() and set() methods of ShardedPupDB. """
+
+    database = ShardedPupDB(TEST_DB_PATH, num_shards=4)
+    for i in range(100):
+        database.set(i, i)
+
+    for i in range(100):
+        assert database.get(i) == i
+    assert len(database) == 100
+
+    # Each shard only holds its part of the keys.
+    for index, shard in enumerate(database.shards):
+        assert os.path.exists('testdb.{}.json'.format(index))
+        assert 0 < len(shard) < 100
+
+
+def test_sharded_batches():
+    """ Tests the batch writes of ShardedPupDB. """
+
+    database = ShardedPupDB(TEST_DB_PATH, num_shards=4)
+    database.set_many({i: i for i in range(10)})
+    database.update(key='val')
+    database.remove_many(range(5))
+    database.remove('key')
+
+    assert sorted(database.keys()) == [str(i) for i in range(5, 10)]
+    assert sorted(database.values()) == list(range(5, 10))
+    assert sorted(database.items()) == [(str(i), i) for i in range(5, 10)]
+
+    assert database.get_many([5, 9, 0]) == {'5': 5, '9': 9, '0': None}
+
+    with pytest.raises(KeyError):
+        database.remove(0)
+
+
+def test_sharded_remove_many_missing_key():
+    """
+        Tests that ShardedPupDB.remove_many() removes no key if one of the
+        keys is missing, whatever its shard.
+    """
+
+    database = ShardedPupDB(TEST_DB_PATH, num_shards=4)
+    database.set_many({i: i for i in range(20)})
+    # A missing key of another shard than the first keys removed.
+    missing = next(
+        key for key in ('missing{}'.format(i) for i in range(100))
+        if database.shard_for(key) is not database.shard_for(0)
+    )
+
+    with pytest.raises(KeyError):
+        database.remove_many(list(range(20)) + [missing])
+    with pytest.raises(KeyError):
+        database.remove_many([0, 0])
+    assert sorted(database.items()) == sorted(
+        (str(i), i) for i in range(20)
+    )
+
+    assert database.remove_many(range(10))
+    assert sorted(database.keys()) == sorted(str(i) for i in range(10, 20))
+
+
+def test_sharded_iterators():
+    """ Tests that the iterators of ShardedPupDB merge the shards by key. """
+
+    database = ShardedPupDB(TEST_DB_PATH, num_shards=4)
+    database.set_many({str(i): i for i in range(10)})
+
+    assert list(database.iter_keys()) == [str(i) for i in range(10)]
+    assert list(database.iter_values(start='5')) == list(range(5, 10))
+    assert list(database.iter_items(stop='2')) == [('0', 0), ('1', 1)]
+
+
+def test_sharded_find():
+    """ Tests the secondary indexes of ShardedPupDB. """
+
+    database = ShardedPupDB(TEST_DB_PATH, num_shards=4)
+    database.set_many({
+        str(i): {'even': i % 2 == 0, 'i': i} for i in range(10)
+    })
+    assert database.create_index('even')
+    assert database.create_index('i')
+
+    assert [key for key, _ in database.find(even=True)] == \
+        ['0', '2', '4', '6', '8']
+    assert [key for key, _ in database.find_range('i', 7)] == ['7', '8', '9']
+
+
+def test_sharded_dumps_and_truncate():
+    """ Tests the dumps() and truncate_db() methods of ShardedPupDB. """
+
+    database = ShardedPupDB(TEST_DB_PATH, num_shards=4, append_log=True)
+    database.set_many({i: i for i in range(10)})
+
+    assert database.dumps() == json.dumps(
+        {str(i): i for i in range(10)}, sort_keys=True
+    )
+
+    database.truncate_db()
+    assert database.dumps() == json.dumps({})
+
+
+def test_sharded_manifest():
+    """ Tests that the number of shards is kept for existing databases. """
+
+    ShardedPupDB(TEST_DB_PATH, num_shards=3).set('key', 'val')
+
+    database = ShardedPupDB(TEST_DB_PATH)
+    assert database.num_shards == 3
+    assert database.get('key') == 'val'
+
+    with pytest.raises(ValueError):
+        ShardedPupDB(TEST_DB_PATH, num_shards=4)
@@ -0,0 +1,106 @@
+"""
+    Tests for the sorted key index and the range queries of PupDB.
+"""
+
+import logging
+import os
+
+import pytest
+
+from pupdb.core import PupDB
+from pupdb.sorted_keys import SortedKeyDict, prefix_range
+
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s | %(process)d | %(levelname)s | %(message)s'
+)
+
+
+TEST_DB_PATH = 'testdb.json'
+TEST_DB_LOCK_PATH = '{}.lock'.format(TEST_DB_PATH)
+TEST_DB_GENERATION_PATH = '{}.gen'.format(TEST_DB_PATH)
+TEST_DB_LOG_PATH = '{}.log'.format(TEST_DB_PATH)
+TEST_DB_COMPACTION_LOCK_PATH = '{}.compact.lock'.format(TEST_DB_PATH)
+
+DB_OPTIONS = [
+    {},
+    {'cache': True},
+    {'cache': True, 'append_log': True},
+    {'serializer': 'indexed'},
+    {'serializer': 'indexed', 'cache': True},
+]
+
+
+@pytest.fixture(autouse=True)
+def run_around_tests():
+    """ Function is invoked around each test run. """
+
+    logging.debug('Test started.')
+    yield
+    logging.debug('Test ended.')
+
+    for path in (
+            TEST_DB_PATH, TEST_DB_LOCK_PATH, TEST_DB_GENERATION_PATH,
+            TEST_DB_LOG_PATH, TEST_DB_COMPACTION_LOCK_PATH):
+        if os.path.exists(path):
+            os.remove(path)
+
+
+def test_sorted_key_dict():
+    """ Tests that SortedKeyDict keeps its keys sorted as it changes. """
+
+    database = SortedKeyDict({'b': 1, 'd': 2})
+    assert database.sorted_keys() == ['b', 'd']
+
+    database['c'] = 3
+    database['a'] = 4
+    del database['d']
+    database.pop('b')
+    database.pop('missing', None)
+    assert database.sorted_keys() == ['a', 'c']
+
+    database.update({str(i): i for i in range(20)})
+    assert database.sorted_keys() == sorted(database)
+    assert database.irange('1', '3') == \
+        ['1'] + [str(i) for i in range(10, 20)] + ['2']
+
+    database.clear()
+    database['z'] = 1
+    assert database.irange() == ['z']
+
+
+def test_prefix_range():
+    """ Tests the key ranges of prefixes. """
+
+    assert prefix_range('user:') == ('user:', 'user;')
+    assert prefix_range('') == ('', None)
+
+
+@pytest.mark.parametrize('options', DB_OPTIONS)
+def test_range_and_prefix(options):
+    """ Tests the range() and prefix() methods of PupDB. """
+
+    database = PupDB(TEST_DB_PATH, **options)
+    database.set_many({'user:{}:name'.format(i): i for i in range(3)})
+    database.set_many({'group:{}'.format(i): i for i in range(3)})
+
+    assert list(database.prefix('user:1:')) == [('user:1:name', 1)]
+    assert [key for key, _ in database.prefix('group:')] == \
+        ['group:0', 'group:1', 'group:2']
+    assert list(database.range('group:1', 'user:1')) == [
+        ('group:1', 1), ('group:2', 2), ('user:0:name', 0)
+    ]
+    assert list(database.range(stop='group:1')) == [('group:0', 0)]
+    assert list(database.range('user:3')) == []
+
+    # The sorted keys follow the changes of the database.
+    database.remove('group:0')
+    database.set('group:10', 10)
+    database.set('aaa', 'first')
+    assert list(database.iter_keys(stop='group:2')) == \
+        ['aaa', 'group:1', 'group:10']
+    assert list(database.iter_keys(start='user:2')) == ['user:2:name']
+
+    database.truncate_db()
+    database.set('key', 'val')
+    assert list(database.range()) == [('key', 'val')]
@@ -0,0 +1,135 @@
+"""
+    Tests for the transaction API of PupDB.
+"""
+
+import logging
+import os
+from threading import Thread
+import json
+
+import pytest
+
+from pupdb.core import PupDB
+
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s | %(process)d | %(levelname)s | %(message)s'
+)
+
+
+TEST_DB_PATH = 'testdb.json'
+TEST_DB_LOCK_PATH = '{}.lock'.format(TEST_DB_PATH)
+TEST_DB_GENERATION_PATH = '{}.gen'.format(TEST_DB_PATH)
+TEST_DB_LOG_PATH = '{}.log'.format(TEST_DB_PATH)
+
+
+@pytest.fixture(autouse=True)
+def run_around_tests():
+    """ Function is invoked around each test run. """
+
+    logging.debug('Test started.')
+    yield
+    logging.debug('Test ended.')
+
+    for path in (
+            TEST_DB_PATH, TEST_DB_LOCK_PATH, TEST_DB_GENERATION_PATH,
+            TEST_DB_LOG_PATH):
+        if os.path.exists(path):
+            os.remove(path)
+
+
+def increment_counter(times, append_log):
+    """ Increments the counter key in separate transactions. """
+
+    database = PupDB(TEST_DB_PATH, append_log=append_log)
+    for _ in range(times):
+        with database.transaction() as txn:
+            txn['counter'] = txn.get('counter', 0) + 1
+
+
+@pytest.mark.parametrize('append_log', [False, True])
+def test_transaction_no_lost_updates(append_log):
+    """ Tests that concurrent read-modify-write transactions are isolated. """
+
+    PupDB(TEST_DB_PATH, append_log=append_log).set('counter', 0)
+
+    threads = [
+        Thread(target=increment_counter, args=(25, append_log))
+        for _ in range(4)
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert PupDB(TEST_DB_PATH, append_log=append_log).get('counter') == 100
+
+
+def test_transaction_reads_once():
+    """ Tests that a transaction reads the database once. """
+
+    database = PupDB(TEST_DB_PATH)
+    database.set_many({'key1': 1, 'key2': 2})
+
+    # pylint: disable=protected-access
+    load_database = database._load_database
+    calls = []
+
+    def counting_load_database(*args):
+        """ Wrapper around _load_database() recording the call. """
+
+        calls.append(1)
+        return load_database(*args)
+
+    database._load_database = counting_load_database
+    with database.transaction() as txn:
+        txn['key3'] = txn['key1'] + txn['key2']
+        del txn['key1']
+    assert len(calls) == 1
+
+    with database.transaction() as txn:
+        txn['key4'] = 4
+        txn.commit()
+        txn['key5'] = txn['key4'] + 1
+    assert len(calls) == 2
+    assert json.loads(database.dumps()) == {
+        'key2': 2, 'key3': 3, 'key4': 4, 'key5': 5
+    }
+
+
+def test_transaction_changes():
+    """ Tests that changes are visible in and written by the transaction. """
+
+    database = PupDB(TEST_DB_PATH)
+    database.set_many({'key1': 1, 'key2': 2})
+
+    with database.transaction() as txn:
+        txn.set('key3', 3)
+        del txn['key1']
+        assert 'key1' not in txn
+        assert txn['key3'] == 3
+        assert sorted(txn.keys()) == ['key2', 'key3']
+        with pytest.raises(KeyError):
+            txn.remove('key1')
+
+        # Not written until the transaction ends.
+        with open(TEST_DB_PATH, 'r') as db_file:
+            assert json.loads(db_file.read()) == {'key1': 1, 'key2': 2}
+
+    assert json.loads(database.dumps()) == {'key2': 2, 'key3': 3}
+
+
+def test_transaction_rollback():
+    """ Tests that an exception discards the changes. """
+
+    database = PupDB(TEST_DB_PATH, cache=True)
+    database.set('key', 'val')
+
+    with pytest.raises(ValueError):
+        with database.transaction() as txn:
+            txn.truncate_db()
+            txn.set('other_key', 'other_val')
+            assert len(txn) == 1
+            raise ValueError('Rolling back.')
+
+    assert json.loads(database.dumps()) == {'key': 'val'}
@@ -0,0 +1,207 @@
+"""
+    Tests for the expiring keys of PupDB.
+"""
+
+import logging
+import os
+import json
+import time
+
+import pytest
+
+import pupdb.core
+from pupdb.core import PupDB
+
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s | %(process)d | %(levelname)s | %(message)s'
+)
+
+
+TEST_DB_PATH = 'testdb.json'
+TEST_DB_LOCK_PATH = '{}.lock'.format(TEST_DB_PATH)
+TEST_DB_GENERATION_PATH = '{}.gen'.format(TEST_DB_PATH)
+TEST_DB_LOG_PATH = '{}.log'.format(TEST_DB_PATH)
+TEST_DB_COMPACTION_LOCK_PATH = '{}.compact.lock'.format(TEST_DB_PATH)
+TEST_DB_EXPIRY_PATH = '{}.expiry'.format(TEST_DB_PATH)
+
+
+# pylint: disable=useless-object-inheritance,too-few-public-methods
+class FakeClock(object):
+    """ Replaces the time module of pupdb.core, to move time forward. """
+
+    sleep = staticmethod(time.sleep)
+
+    def __init__(self):
+        """ Initializes the clock at the current time. """
+
+        self.now = time.time()
+
+    def time(self):
+        """ Returns the current fake time. """
+
+        return self.now
+
+
+@pytest.fixture(autouse=True)
+def run_around_tests():
+    """ Function is invoked around each test run. """
+
+    logging.debug('Test started.')
+    yield
+    logging.debug('Test ended.')
+
+    for path in (
+            TEST_DB_PATH, TEST_DB_LOCK_PATH, TEST_DB_GENERATION_PATH,
+            TEST_DB_LOG_PATH, TEST_DB_COMPACTION_LOCK_PATH,
+            TEST_DB_EXPIRY_PATH):
+        if os.path.exists(path):
+            os.remove(path)
+
+
+@pytest.fixture()
+def clock(monkeypatch):
+    """ Fixture function to control the time seen by PupDB. """
+
+    fake_clock = FakeClock()
+    monkeypatch.setattr(pupdb.core, 'time', fake_clock)
+    return fake_clock
+
+
+def read_db_file():
+    """ Returns the contents of the json database file. """
+
+    with open(TEST_DB_PATH, 'r') as db_file:
+        return json.loads(db_file.read())
+
+
+# pylint: disable=redefined-outer-name
+@pytest.mark.parametrize('options', [{}, {'cache': True}])
+def test_ttl(clock, options):
+    """ Tests that keys set with a ttl are hidden once expired. """
+
+    database = PupDB(TEST_DB_PATH, **options)
+    database.set('short', 1, ttl=10)
+    database.set_many({'long': 2, 'other': 3}, ttl=100)
+    database.set('forever', 4)
+
+    assert database.ttl('short') == 10
+    assert database.ttl('forever') is None
+    with pytest.raises(KeyError):
+        database.ttl('missing')
+
+    clock.now += 10
+    assert database.get('short') is None
+    assert database.get('long') == 2
+    assert sorted(database.keys()) == ['forever', 'long', 'other']
+    assert len(database) == 3
+    assert json.loads(database.dumps()) == \
+        {'forever': 4, 'long': 2, 'other': 3}
+
+    # Setting a key again without ttl makes it persistent.
+    database.set('other', 5)
+    clock.now += 100
+    assert json.loads(database.dumps()) == {'forever': 4, 'other': 5}
+
+    # Keys expiring after the last write are left in the file until swept.
+    assert read_db_file() == {'forever': 4, 'long': 2, 'other': 5}
+    assert database.sweep() == 1
+    assert read_db_file() == {'forever': 4, 'other': 5}
+    assert not os.path.exists(TEST_DB_EXPIRY_PATH)
+
+
+# pylint: disable=redefined-outer-name
+def test_version_expiry(clock):
+    """ Tests that the version of the database changes as keys expire. """
+
+    database = PupDB(TEST_DB_PATH, cache=True)
+    database.set('short', 1, ttl=10)
+    database.set('forever', 2)
+    version = database.version()
+
+    clock.now += 5
+    assert database.version() == version
+    clock.now += 5
+    assert database.version() != version
+
+
+# pylint: disable=redefined-outer-name
+def test_expire(clock):
+    """ Tests the expire() method of PupDB. """
+
+    database = PupDB(TEST_DB_PATH)
+    database.set_many({'key': 1, 'other': 2})
+
+    assert database.expire('key', 10)
+    assert PupDB(TEST_DB_PATH).ttl('key') == 10
+
+    database.expire('other', 10)
+    database.expire('other', None)
+
+    with pytest.raises(KeyError):
+        database.expire('missing', 10)
+
+    clock.now += 10
+    assert json.loads(database.dumps()) == {'other': 2}
+    with pytest.raises(KeyError):
+        database.expire('key', 10)
+
+
+# pylint: disable=redefined-outer-name
+@pytest.mark.parametrize('options', [{}, {'cache': True}])
+def test_log_ttl(clock, options):
+    """ Tests the expiring keys in append log mode, across compactions. """
+
+    database = PupDB(
+        TEST_DB_PATH, append_log=True, auto_compact=False, **options
+    )
+    database.set('key', 1, ttl=10)
+    database.set('other', 2, ttl=20)
+
+    assert database.compact()
+    with open(TEST_DB_EXPIRY_PATH, 'r') as expiry_file:
+        assert sorted(json.loads(expiry_file.read())) == ['key', 'other']
+    assert database.ttl('key') == 10
+
+    clock.now += 10
+    database.expire('other', 100)
+    assert database.get('key') is None
+
+    # Compaction removes the expired keys from the snapshot.
+    assert database.compact()
+    assert read_db_file() == {'other': 2}
+
+    other_database = PupDB(TEST_DB_PATH, append_log=True)
+    assert other_database.ttl('other') == 100
+
+
+# pylint: disable=redefined-outer-name
+def test_sweep(clock):
+    """ Tests that sweep() removes the expired keys from the files. """
+
+    database = PupDB(TEST_DB_PATH, append_log=True, auto_compact=False)
+    database.set_many({i: i for i in range(10)}, ttl=10)
+    database.set('forever', 1)
+
+    assert database.sweep() == 0
+    clock.now += 10
+    assert database.sweep() == 10
+
+    with open(TEST_DB_LOG_PATH, 'r') as log_file:
+        records = [json.loads(line) for line in log_file]
+    assert [record['op'] for record in records[-10:]] == ['remove'] * 10
+    assert database.sweep() == 0
+
+
+def test_background_sweep():
+    """ Tests that the expired keys are swept by a background thread. """
+
+    database = PupDB(TEST_DB_PATH, sweep_interval=0.05)
+    database.set('key', 1, ttl=0.05)
+    database.set('other', 2)
+
+    deadline = time.time() + 5
+    while 'key' in read_db_file() and time.time() < deadline:
+        time.sleep(0.05)
+
+    assert read_db_file() == {'other': 2}
@@ -0,0 +1,228 @@
+"""
+    Tests for the bounded value cache of PupDB.
+"""
+
+import logging
+import os
+import time
+
+import pytest
+
+import pupdb.core
+from pupdb.core import PupDB
+from pupdb.sharded import ShardedPupDB
+from pupdb.value_cache import ValueCache
+
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s | %(process)d | %(levelname)s | %(message)s'
+)
+
+
+TEST_DB_PATH = 'testdb.json'
+TEST_DB_LOCK_PATH = '{}.lock'.format(TEST_DB_PATH)
+TEST_DB_GENERATION_PATH = '{}.gen'.format(TEST_DB_PATH)
+TEST_DB_LOG_PATH = '{}.log'.format(TEST_DB_PATH)
+TEST_DB_COMPACTION_LOCK_PATH = '{}.compact.lock'.format(TEST_DB_PATH)
+TEST_DB_EXPIRY_PATH = '{}.expiry'.format(TEST_DB_PATH)
+
+
+@pytest.fixture(autouse=True)
+def run_around_tests():
+    """ Function is invoked around each test run. """
+
+    logging.debug('Test started.')
+    yield
+    logging.debug('Test ended.')
+
+    paths = [
+        TEST_DB_PATH, TEST_DB_LOCK_PATH, TEST_DB_GENERATION_PATH,
+        TEST_DB_LOG_PATH, TEST_DB_COMPACTION_LOCK_PATH, TEST_DB_EXPIRY_PATH,
+        '{}.shards'.format(TEST_DB_PATH),
+        '{}.shards.lock'.format(TEST_DB_PATH),
+    ]
+    for index in range(2):
+        shard_path = 'testdb.{}.json'.format(index)
+        paths.extend([
+            shard_path, '{}.lock'.format(shard_path),
+            '{}.gen'.format(shard_path),
+        ])
+    for path in paths:
+        if os.path.exists(path):
+            os.remove(path)
+
+
+def count_loads(database):
+    """ Counts the calls to _load_database() of the PupDB instance. """
+
+    # pylint: disable=protected-access
+    load_database = database._load_database
+    calls = []
+
+    def counting_load_database(*args):
+        """ Wrapper around _load_database() recording the call. """
+
+        calls.append(1)
+        return load_database(*args)
+
+    database._load_database = counting_load_database
+    return calls
+
+
+def test_lru_eviction():
+    """ Tests that the least recently used values are evicted first. """
+
+    cache = ValueCache(max_entries=2)
+    cache.put('a', 1)
+    cache.put('b', 2)
+    assert cache.get('a', 0) == (True, 1)
+    cache.put('c', 3)
+
+    assert 'b' not in cache
+    assert cache.get('a', 0) == (True, 1)
+    assert cache.get('b', 0) == (False, None)
+    assert cache.stats() == {
+        'hits': 2, 'misses': 1, 'evictions': 1, 'invalidations': 0,
+        'entries': 2, 'bytes': cache.size,
+    }
+
+
+def test_lfu_eviction():
+    """ Tests that the least frequently used values are evicted first. """
+
+    cache = ValueCache(max_entries=2, policy='lfu')
+    cache.put('a', 1)
+    cache.put('b', 2)
+    for _ in range(3):
+        cache.get('a', 0)
+    cache.get('b', 0)
+    cache.put('c', 3)
+    assert 'b' not in cache
+
+    cache.put('d', 4)
+    assert 'c' not in cache
+    assert sorted(['a', 'd']) == sorted(
+        key for key in 'abcd' if key in cache
+    )
+
+
+def test_byte_limit():
+    """ Tests that the approximate size of the values is bounded. """
+
+    cache = ValueCache(max_bytes=2000)
+    for i in range(100):
+        cache.put(str(i), 'x' * 100)
+        assert cache.size <= 2000
+    assert 0 < len(cache) < 100
+    assert cache.evictions == 100 - len(cache)
+
+    # Values larger than the cache are not cached.
+    cache.put('large', 'x' * 4000)
+    assert 'large' not in cache
+
+    with pytest.raises(ValueError):
+        ValueCache()
+    with pytest.raises(ValueError):
+        ValueCache(max_entries=1, policy='random')
+
+
+def test_cached_get():
+    """ Tests that hot keys are read from the value cache. """
+
+    database = PupDB(TEST_DB_PATH, value_cache=ValueCache(max_entries=10))
+    database.set_many({'key': 1, 'other': 2})
+    loads = count_loads(database)
+
+    for _ in range(10):
+        assert database.get('key') == 1
+        assert database.get('missing') is None
+    assert len(loads) == 2
+
+    # Own writes only drop the written values.
+    database.set('other', 3)
+    assert database.get('other') == 3
+    assert database.get('key') == 1
+    # One read for the write, one for the written value.
+    assert len(loads) == 4
+
+    stats = database.value_cache_stats()
+    assert stats['hits'] == 19
+    assert stats['misses'] == 3
+    assert stats['entries'] == 3
+    assert PupDB(TEST_DB_PATH).value_cache_stats() is None
+
+    # A single read for all the missed keys.
+    assert database.get_many(['key', 'a', 'b']) == {
+        'key': 1, 'a': None, 'b': None
+    }
+    assert len(loads) == 5
+
+
+@pytest.mark.parametrize('options', [{}, {'append_log': True}])
+def test_cross_process_writes(options):
+    """ Tests that writes of other instances invalidate the values. """
+
+    reader = PupDB(
+        TEST_DB_PATH, value_cache=ValueCache(max_entries=10), **options
+    )
+    writer = PupDB(TEST_DB_PATH, auto_compact=False, **options)
+    writer.set('unchanged', 0)
+
+    for i in range(10):
+        writer.set('key', i)
+        assert reader.get('key') == i
+        assert reader.get('unchanged') == 0
+
+    writer.remove('key')
+    assert reader.get('key') is None
+    writer.truncate_db()
+    assert reader.get('unchanged') is None
+
+    if options:
+        # Appended records only drop the values of their keys.
+        writer.set_many({'key': 1, 'unchanged': 0})
+        assert reader.get('unchanged') == 0
+        writer.set('key', 2)
+        loads = count_loads(reader)
+        assert reader.get('unchanged') == 0
+        assert not loads
+        assert reader.get('key') == 2
+
+
+def test_expiring_values(monkeypatch):
+    """ Tests that cached values of expiring keys expire too. """
+
+    clock = type('FakeClock', (object,), {})()
+    clock.now = time.time()
+    clock.time = lambda: clock.now
+    monkeypatch.setattr(pupdb.core, 'time', clock)
+
+    database = PupDB(TEST_DB_PATH, value_cache=ValueCache(max_entries=10))
+    database.set('key', 1, ttl=10)
+    assert database.get('key') == 1
+    clock.now += 10
+    assert database.get('key') is None
+
+    database.set('key', 2)
+    assert database.get('key') == 2
+    database.expire('key', 5)
+    assert database.get('key') == 2
+    clock.now += 5
+    assert database.get('key') is None
+
+
+def test_sharded_value_cache():
+    """ Tests that the limits of the value cache are split by shard. """
+
+    database = ShardedPupDB(
+        TEST_DB_PATH, num_shards=2, value_cache=ValueCache(max_entries=10)
+    )
+    assert [shard.value_cache.max_entries for shard in database.shards] == \
+        [5, 5]
+
+    database.set_many({str(i): i for i in range(20)})
+    for i in range(20):
+        assert database.get(i) == i
+    stats = database.value_cache_stats()
+    assert stats['misses'] == 20
+    assert stats['entries'] <= 10
@@ -0,0 +1,206 @@
+"""
+    Tests for the wire protocol server of PupDB.
+"""
+
+import asyncio
+import logging
+import os
+import socket
+import threading
+
+import pytest
+
+from pupdb.wire import MAX_FRAME_SIZE, WireClient, WireServer
+
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s | %(process)d | %(levelname)s | %(message)s'
+)
+
+TEST_DB_PATH = 'testdb.json'
+TEST_DB_LOCK_PATH = '{}.lock'.format(TEST_DB_PATH)
+TEST_DB_GENERATION_PATH = '{}.gen'.format(TEST_DB_PATH)
+TEST_DB_EXPIRY_PATH = '{}.expiry'.format(TEST_DB_PATH)
+TEST_SOCKET_PATH = 'testdb.sock'
+
+
+# pylint: disable=useless-object-inheritance
+class ServerThread(object):
+    """ WireServer run by an event loop in a thread. """
+
+    def __init__(self, serializer='json', path=None):
+        """ Starts the server on a free local port, or at path. """
+
+        self.loop = asyncio.new_event_loop()
+        self.server = WireServer(TEST_DB_PATH, serializer)
+        server = self.loop.run_until_complete(
+            self.server.start('127.0.0.1', 0, path)
+        )
+        self.port = None if path else server.sockets[0].getsockname()[1]
+        self.thread = threading.Thread(target=self.loop.run_forever)
+        self.thread.start()
+
+    def stop(self):
+        """ Stops the server and the event loop. """
+
+        asyncio.run_coroutine_threadsafe(
+            self.server.close(), self.loop
+        ).result()
+        self.loop.call_soon_threadsafe(self.loop.stop)
+        self.thread.join()
+        self.loop.close()
+
+
+@pytest.fixture()
+def server():
+    """ Fixture function to run a WireServer on a local port. """
+
+    server_thread = ServerThread()
+
+    yield server_thread
+
+    server_thread.stop()
+    for path in (
+            TEST_DB_PATH, TEST_DB_LOCK_PATH, TEST_DB_GENERATION_PATH,
+            TEST_DB_EXPIRY_PATH, TEST_SOCKET_PATH):
+        if os.path.exists(path):
+            os.remove(path)
+
+
+# pylint: disable=redefined-outer-name
+def test_get_set_remove(server):
+    """ Test the get(), set() and remove() requests. """
+
+    with WireClient(port=server.port) as client:
+        assert client.ping() == 'pong'
+        assert client.get('test') is None
+        assert client.set('test', {'a': [1, 2]})
+        assert client.set(1, 'one', ttl=100)
+        assert client.get('test') == {'a': [1, 2]}
+        assert client.get(1) == 'one'
+        assert len(client) == 2
+
+        assert client.remove('test')
+        with pytest.raises(KeyError):
+            client.remove('test')
+        assert client.get('test') is None
+
+
+# pylint: disable=redefined-outer-name
+def test_batches_and_scan(server):
+    """ Test the multi-key and scan requests. """
+
+    with WireClient(port=server.port) as client:
+        assert client.set_many({'a1': 1, 'a2': 2, 'b1': 3})
+        assert client.get_many(['a1', 'b1', 'missing']) == {
+            'a1': 1, 'b1': 3, 'missing': None
+        }
+        with pytest.raises(KeyError):
+            client.remove_many(['a1', 'missing'])
+        assert client.get('a1') == 1
+
+        items, cursor = client.scan(limit=2)
+        assert items == [('a1', 1), ('a2', 2)]
+        assert client.scan(cursor) == ([('b1', 3)], None)
+        assert client.scan(prefix='b') == ([('b1', 3)], None)
+        with pytest.raises(ValueError):
+            client.scan(limit=0)
+
+        assert client.remove_many(['a1', 'a2'])
+        assert client.truncate_db()
+        assert len(client) == 0
+
+
+# pylint: disable=redefined-outer-name
+def test_pipeline(server):
+    """ Test that pipelined requests are answered in order. """
+
+    with WireClient(port=server.port) as client:
+        with client.pipeline() as pipeline:
+            for i in range(100):
+                pipeline.set(i, i + 1)
+            for i in range(100):
+                pipeline.get(i)
+        assert pipeline.results == [True] * 100 + [
+            i + 1 for i in range(100)
+        ]
+
+        pipeline = client.pipeline().remove(0).remove(0).get(1)
+        with pytest.raises(KeyError):
+            pipeline.execute()
+        # The connection is still usable after a failed request.
+        assert client.get(1) == 2
+
+
+# pylint: disable=redefined-outer-name
+def test_pipeline_reads_own_writes(server):
+    """
+        Test that the pipelined reads of concurrent connections return the
+        writes pipelined before them on the same connection.
+    """
+
+    errors = []
+
+    def run_client(name):
+        """ Pipelines alternate writes and reads of a key. """
+
+        try:
+            with WireClient(port=server.port) as client:
+                with client.pipeline() as pipeline:
+                    for i in range(20):
+                        pipeline.set(name, i).get(name)
+                        pipeline.remove(name).get(name)
+                assert pipeline.results == [
+                    result for i in range(20)
+                    for result in (True, i, True, None)
+                ]
+        except Exception as err:  # pylint: disable=broad-except
+            errors.append(err)
+
+    threads = [
+        threading.Thread(target=run_client, args=('key{}'.format(i),))
+        for i in range(4)
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert not errors
+
+
+# pylint: disable=redefined-outer-name
+def test_invalid_requests(server):
+    """ Test the responses to invalid requests. """
+
+    with WireClient(port=server.port) as client:
+        with pytest.raises(ValueError):
+            client.request('unknown')
+        with pytest.raises(ValueError):
+            client.request('get')
+        assert client.ping() == 'pong'
+
+    connection = socket.create_connection(('127.0.0.1', server.port))
+    connection.sendall((MAX_FRAME_SIZE + 1).to_bytes(4, 'big'))
+    assert connection.recv(1) == b''
+    connection.close()
+
+    with pytest.raises(ValueError):
+        WireClient(port=server.port, serializer='pickle')
+
+
+def test_unix_socket_msgpack():
+    """ Test a server on a Unix socket, with msgpack messages. """
+
+    pytest.importorskip('msgpack')
+    server_thread = ServerThread('msgpack', TEST_SOCKET_PATH)
+    try:
+        with WireClient(path=TEST_SOCKET_PATH, serializer='msgpack') as client:
+            assert client.set('test', [1, 'two'])
+            assert client.get('test') == [1, 'two']
+    finally:
+        server_thread.stop()
+        for path in (
+                TEST_DB_PATH, TEST_DB_LOCK_PATH, TEST_DB_GENERATION_PATH,
+                TEST_DB_EXPIRY_PATH, TEST_SOCKET_PATH):
+            if os.path.exists(path):
+                os.remove(path)